@@ -7,62 +7,67 @@
 from flask import Flask, jsonify, request, Response, send_from_directory,current_app
 from flask_cors import CORS
 from dotenv import load_dotenv
-import config.DataVisualization as DataVisualization
+from config.anomaly_detection import (
+    ANOMALY_SOURCES, PARAMETER_COLUMNS, SOURCE_LIVE, SOURCE_MATERIALIZED,
+    build_anomaly_query, build_count_query, build_window_count_query, detect_anomalies,
+    group_anomalies_by_window, iter_anomalies, parse_windows
+)
+from config.anomaly_store import recompute_parameter
+from config.threshold_cache import ThresholdCache
+from config.parallel_scan import ParallelAnomalyScanner, ScanTimeout, plan_partitions
+from config.process_pool import start_process_pool
+from config.anomaly_summary import SUMMARY_BUCKETS, parse_group_by, summarize_anomalies
+from config.chart_payload import FORMAT_JSON, PAYLOAD_FORMATS, compress_response, precompressed_response
+from config.chart_rendering import RenderQueueFull
+from config.downsampling import DOWNSAMPLE_LTTB, DOWNSAMPLE_METHODS, MIN_DOWNSAMPLE_POINTS
+from config.fish_dataset import FishDatasetService
+from config.fish_length_batch import parse_csv_batch, parse_json_batch, predict_lengths, stream_predictions
+from config.model_registry import ModelNotFound, ModelRegistry
+from config.water_aggregation import AGGREGATE_BUCKETS, aggregate_water_quality, parse_aggregates, parse_parameters
+from config.statistical_detection import (
+    DEFAULT_SCORE_THRESHOLD, DEFAULT_WINDOW, DETECTION_METHODS, METHOD_SEASONAL, METHOD_THRESHOLD,
+    build_baseline_query, build_history_query, detect_statistical_anomalies, lookback_days
+)
 from datetime import datetime
 import os
-import joblib
 import mysql.connector
 from mysql.connector import pooling
 import json
 import time
-import requests
 import sys
 import io
-import pandas as pd
-import numpy as np
-from sqlalchemy import create_engine
-import pkg_resources
 import subprocess
 import platform
 import socket
-import logging
-from logging.handlers import RotatingFileHandler
+from config.log_config import sampled, setup_logging
 
 
 # 加载环境变量
 load_dotenv()
 
+# 异常扫描、水质文件读取和图表渲染共用的进程池：在启动日志线程和创建数据库连接池之前
+# fork 出全部工作进程，工作进程不会继承其他线程持有的锁
+start_process_pool()
+
+# 日志经队列由后台线程写入 logs/app.log，需在首次访问 app.logger 之前初始化
+setup_logging()
+
 # 创建Flask应用实例
 # app = Flask(__name__)
 app = Flask(__name__, static_folder='../frontend/build', static_url_path='')
 PORT = int(os.environ.get('PORT', 3001))  # 设置端口，优先使用环境变量中的PORT，否则默认为3001
-# 立即初始化模型
-try:
-    model = joblib.load('fish_length_model.pkl')
-except Exception as e:
-    print(f"模型加载失败: {e}")
-    model = None
+app.logger.info('Application startup')
+# 体长预测模型由注册表管理：第一次预测时加载（内存映射），ACTIVE 版本变化后在后台热加载
+length_models = ModelRegistry()
 
+def get_length_model():
+    """返回当前版本的体长预测模型（LoadedModel），没有可用模型时返回 None"""
+    return length_models.current()
 
-    
-# 在创建 app 后添加日志配置
-if not app.debug:
-    # 生产环境日志配置
-    if not os.path.exists('logs'):
-        os.mkdir('logs')
-    
-    file_handler = RotatingFileHandler(
-        'logs/app.log', 
-        maxBytes=1024 * 1024 * 10,  # 10MB
-        backupCount=10
-    )
-    file_handler.setFormatter(logging.Formatter(
-        '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
-    ))
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.setLevel(logging.INFO)
-    app.logger.info('Application startup')
+def get_data_visualization():
+    """绘图模块依赖 pandas / matplotlib / seaborn，第一次请求图表时才导入"""
+    import config.DataVisualization as DataVisualization
+    return DataVisualization
 
 # 配置中间件
 # 配置更宽松的CORS规则
@@ -113,10 +118,16 @@ def execute_query(query, params=None, fetch=True):
         cursor.close()
         conn.close()
 
-# 初始化数据库引擎用于 pandas 操作
+# 初始化数据库引擎用于 pandas 操作（进程内只创建一次，复用其连接池）
+_db_engine = None
+
 def get_db_engine():
-    conn_str = f"mysql+mysqlconnector://{DB_CONFIG['user']}:{DB_CONFIG['password']}@{DB_CONFIG['host']}/{DB_CONFIG['database']}"
-    return create_engine(conn_str)
+    global _db_engine
+    if _db_engine is None:
+        conn_str = f"mysql+mysqlconnector://{DB_CONFIG['user']}:{DB_CONFIG['password']}@{DB_CONFIG['host']}/{DB_CONFIG['database']}"
+        from sqlalchemy import create_engine
+        _db_engine = create_engine(conn_str)
+    return _db_engine
 
 # 导入鱼类识别模块
 # 注册鱼类识别蓝图
@@ -124,7 +135,7 @@ from routes.fish_recognition import fish_recognition_bp
 app.register_blueprint(fish_recognition_bp, url_prefix='/fish')
 
 # 导入路由和初始化函数
-from routes.auth import auth_bp  # 改为MySQL版本的认证路由
+from routes.auth import auth_bp, admin_required  # 改为MySQL版本的认证路由
 
 # 注册蓝图(Blueprint)路由
 app.register_blueprint(auth_bp, url_prefix='/api')  # 所有认证相关的路由都以/api为前缀
@@ -135,6 +146,7 @@ def serve():
 
 # 智能问答API功能
 def ai_communicate(message, max_retries=3, timeout=300):
+    import requests
     url = "https://api.siliconflow.cn/v1/chat/completions"
 
     headers = {
@@ -162,27 +174,27 @@ def ai_communicate(message, max_retries=3, timeout=300):
     
     for attempt in range(max_retries):
         try:
-            print(f"尝试请求 {attempt + 1}/{max_retries}...")
+            app.logger.debug("尝试请求 %d/%d...", attempt + 1, max_retries)
             response = requests.post(url, json=payload, headers=headers, timeout=timeout, stream=True)
             response.raise_for_status()
             
             return response
             
         except requests.exceptions.Timeout:
-            print(f"请求超时，尝试 {attempt + 1}/{max_retries}")
+            app.logger.warning("请求超时，尝试 %d/%d", attempt + 1, max_retries)
             if attempt < max_retries - 1:
                 time.sleep(2)
             else:
-                print("超过最大重试次数，请求失败")
+                app.logger.error("超过最大重试次数，请求失败")
                 raise
         except requests.exceptions.RequestException as e:
-            print(f"网络请求异常: {str(e)}")
+            app.logger.warning("网络请求异常: %s", e)
             if attempt < max_retries - 1:
                 time.sleep(2)
             else:
                 raise
         except Exception as e:
-            print(f"未处理异常: {str(e)}")
+            app.logger.error("未处理异常: %s", e, exc_info=True)
             raise
 
 @app.route('/api/chat', methods=['POST'])
@@ -218,11 +230,11 @@ def chat():
                                     if content:
                                         yield f"data: {json.dumps({'content': content})}\n\n"
                         except json.JSONDecodeError:
-                            print(f"无法解析响应行: {line_text}")
+                            app.logger.warning("无法解析响应行: %s", line_text, extra=sampled(100))
                 
                 yield f"data: {json.dumps({'content': '', 'finished': True})}\n\n"
             except Exception as e:
-                print(f"流处理中发生错误: {str(e)}")
+                app.logger.error("流处理中发生错误: %s", e, exc_info=True)
                 yield f"data: {json.dumps({'error': str(e)})}\n\n"
         
         return Response(generate(), mimetype='text/event-stream')
@@ -230,74 +242,132 @@ def chat():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+MAX_WATER_RANGE_DAYS = int(os.environ.get('MAX_WATER_RANGE_DAYS', 366))  # 日期范围模式最多覆盖的天数
+
 @app.route('/visualize-water', methods=['POST'])
 def handle_water_visualization():
     try:
         file_path = request.json.get('file_path')
         target_column = request.json.get('target_column')
+        start_date = request.json.get('start_date')
+        end_date = request.json.get('end_date')
+        if not file_path and not (start_date and end_date):
+            return jsonify({"error": "请提供文件路径，或 start_date 和 end_date"}), 400
+
+        # 日期范围模式：start_date / end_date（YYYY-MM-DD）和可选的 section_name（字符串或列表）
+        section_names = None
         if not file_path:
-            return jsonify({"error": "未提供文件路径"}), 400
+            try:
+                start_date = datetime.strptime(str(start_date), '%Y-%m-%d').date()
+                end_date = datetime.strptime(str(end_date), '%Y-%m-%d').date()
+            except ValueError:
+                return jsonify({"error": "日期格式应为 YYYY-MM-DD"}), 400
+            if start_date > end_date:
+                return jsonify({"error": "start_date 不能晚于 end_date"}), 400
+            if (end_date - start_date).days >= MAX_WATER_RANGE_DAYS:
+                return jsonify({"error": f"日期范围不能超过 {MAX_WATER_RANGE_DAYS} 天"}), 400
+            section_names = request.json.get('section_name')
+            if isinstance(section_names, str):
+                section_names = [section_names]
+            if section_names is not None and (
+                    not isinstance(section_names, list) or not all(isinstance(name, str) for name in section_names)):
+                return jsonify({"error": "section_name 必须是字符串或字符串列表"}), 400
 
-        line_chart_data, pie_chart_data = DataVisualization.visualize_water_quality(file_path, target_column)
-        # 添加日志输出
-        print("后端返回的折线图数据:", line_chart_data)
-        print("后端返回的饼图数据:", pie_chart_data)
+        # 可选的服务端降采样：折线图最多返回 max_points 个点
+        max_points = request.json.get('max_points')
+        downsample = request.json.get('downsample', DOWNSAMPLE_LTTB)
+        if max_points is not None:
+            try:
+                max_points = int(max_points)
+            except (TypeError, ValueError):
+                return jsonify({"error": "max_points 必须是整数"}), 400
+            if max_points < MIN_DOWNSAMPLE_POINTS:
+                return jsonify({"error": f"max_points 不能小于 {MIN_DOWNSAMPLE_POINTS}"}), 400
+        if downsample not in DOWNSAMPLE_METHODS:
+            return jsonify({"error": f"downsample 只支持: {', '.join(DOWNSAMPLE_METHODS)}"}), 400
+        payload_format = request.json.get('format') or request.args.get('format', FORMAT_JSON)
+        if payload_format not in PAYLOAD_FORMATS:
+            return jsonify({"error": f"format 只支持: {', '.join(PAYLOAD_FORMATS)}"}), 400
 
-        return jsonify({
+        if file_path:
+            line_chart_data, pie_chart_data = get_data_visualization().visualize_water_quality(
+                file_path, target_column, max_points=max_points, downsample=downsample,
+                payload_format=payload_format
+            )
+        else:
+            line_chart_data, pie_chart_data = get_data_visualization().visualize_water_range(
+                start_date, end_date, section_names, target_column, max_points=max_points,
+                downsample=downsample, payload_format=payload_format
+            )
+            if line_chart_data is None:
+                return jsonify({"error": "所选日期范围和断面内没有水质数据"}), 404
+        app.logger.debug("后端返回的折线图数据: %s", line_chart_data)
+        app.logger.debug("后端返回的饼图数据: %s", pie_chart_data)
+
+        return compress_response(jsonify({
             "line_chart_data": line_chart_data,
             "pie_chart_data": pie_chart_data
-        })
+        }), request.accept_encodings)
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/visualize-water/chart.png', methods=['GET'])
+def handle_water_chart():
+    """按需渲染水质指标折线图 PNG（渲染结果在 DataVisualization 中缓存）"""
+    try:
+        file_path = request.args.get('file_path')
+        target_column = request.args.get('target_column')
+        if not file_path:
+            return jsonify({"error": "未提供文件路径"}), 400
+        if not os.path.exists(file_path):
+            return jsonify({"error": f"文件不存在: {file_path}"}), 404
+
+        try:
+            png, etag = get_data_visualization().render_water_chart(file_path, target_column)
+        except RenderQueueFull as e:
+            # 渲染队列已满时立即返回，不让请求线程排队等待
+            return jsonify({"error": str(e)}), 503, {'Retry-After': '1'}
+        except TimeoutError as e:
+            # 渲染超时的任务仍在工作进程中执行，占用的名额在它结束后归还
+            return jsonify({"error": str(e)}), 504
+        if png is None:
+            return jsonify({"error": "数据中未找到数值列，无法绘制图表"}), 422
+
+        # 图表内容只取决于数据文件和图表参数，浏览器可用 ETag 重新验证
+        if request.if_none_match.contains(etag):
+            return Response(status=304, headers={'ETag': f'"{etag}"'})
+
+        response = Response(png, mimetype='image/png')
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# 鱼类数据来自 fish_observations，鱼种汇总表每 FISH_DATASET_TTL 秒最多读取一次，有新观测导入时才重新预计算全部响应
+fish_dataset = FishDatasetService(execute_query, ttl=float(os.environ.get('FISH_DATASET_TTL', 30)))
+
 # 添加鱼类数据路由
 @app.route('/visualize-fish', methods=['POST'])
 def handle_fish_visualization():
     try:
-        fixed_path = 'config/软件工程大作业数据/Fish.csv'
+        payload_format = request.form.get('format') or request.args.get('format', FORMAT_JSON)
+        if payload_format not in PAYLOAD_FORMATS:
+            return jsonify({"error": f"format 只支持: {', '.join(PAYLOAD_FORMATS)}"}), 400
 
-        # 读取数据
-        df = DataVisualization.read_fish_data(fixed_path)
-        if df is None:
-            return jsonify({"error": "数据文件不存在"}), 404
+        snapshot = fish_dataset.snapshot()
+        if snapshot is None:
+            return jsonify({"error": "暂无鱼类观测数据"}), 404
 
-        # 处理单个鱼种请求
+        # 柱状图、散点图和单个鱼种的统计信息都已预先序列化，这里只按键查找
         species_name = request.form.get('species')
-        single_species_data = None
-        if species_name:
-            # 筛选特定鱼种数据
-            species_df = df[df['Species'] == species_name]
-            if species_df.empty:
-                return jsonify({"error": f"未找到鱼种 '{species_name}' 的数据"}), 400
-
-            # 计算相关系数和统计信息
-            correlation = species_df['Length1(cm)'].corr(species_df['Width(cm)'])
-            stats = {
-                'sample_size': len(species_df),
-                'avg_length': species_df['Length1(cm)'].mean(),
-                'avg_width': species_df['Width(cm)'].mean(),
-                'correlation': correlation
-            }
-
-            # 准备散点图数据
-            single_species_data = {
-                'species': species_name,
-                'data': species_df[['Length1(cm)', 'Width(cm)']].to_dict('records'),
-                'stats': stats
-            }
-
-        # 准备柱状图数据：每种鱼类的平均重量
-        bar_chart_data = df.groupby('Species')['Weight(g)'].mean().reset_index()
-
-        # 准备散点图数据：所有鱼类的长度和宽度关系
-        scatter_chart_data = df[['Species', 'Length1(cm)', 'Width(cm)']].to_dict('records')
+        variants = snapshot.response_variants(payload_format, species_name)
+        if variants is None:
+            return jsonify({"error": f"未找到鱼种 '{species_name}' 的数据"}), 400
 
-        return jsonify({
-            "bar_chart_data": bar_chart_data.to_dict('records'),
-            "scatter_chart_data": scatter_chart_data,
-            "single_species_data": single_species_data
-        })
+        return precompressed_response(variants, request.accept_encodings)
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -305,6 +375,7 @@ def handle_fish_visualization():
 @app.route('/predict-fish-length', methods=['POST'])
 def handle_fish_length_prediction():
     try:
+        model = get_length_model()
         if model is None:
             raise Exception("模型未初始化")
 
@@ -313,20 +384,77 @@ def handle_fish_length_prediction():
         height = float(request.json.get('height'))
         width = float(request.json.get('width'))
 
-        # 进行体长预测
-        length_prediction = model.predict([[weight, height, width]])[0]
+        # 进行体长预测（线性模型走编译后的点积，不经过 scikit-learn 的输入校验）
+        length_prediction = model.predict_one(weight, height, width)
 
         return jsonify({
-            "length_prediction": length_prediction
+            "length_prediction": length_prediction,
+            "model_version": model.version
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/predict-fish-length/batch', methods=['POST'])
+def handle_fish_length_batch_prediction():
+    """
+    批量预测体长：JSON 数组或上传的 CSV（file 字段），整体校验后一次性预测，
+    结果以 {"count": n, "length_predictions": [...], "model_version": ..} 流式返回，顺序与输入一致
+    """
+    try:
+        model = get_length_model()
+        if model is None:
+            raise Exception("模型未初始化")
+
+        try:
+            if 'file' in request.files:
+                features = parse_csv_batch(request.files['file'].stream)
+            else:
+                features = parse_json_batch(request.get_json(silent=True))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        predictions = predict_lengths(model, features)
+        return Response(stream_predictions(predictions, model.version), mimetype='application/json')
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/models/fish-length', methods=['GET'])
+def get_length_model_versions():
+    """体长预测模型的全部版本（含元数据）和当前版本"""
+    try:
+        get_length_model()
+        return jsonify(length_models.versions())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/models/fish-length/reload', methods=['POST'])
+@admin_required
+def reload_length_model():
+    """
+    立即切换体长预测模型：version 为空时重新加载 ACTIVE 指定的版本，
+    否则加载指定版本，成功后才更新 ACTIVE；加载期间其他请求继续使用旧版本
+    """
+    try:
+        version = (request.get_json(silent=True) or {}).get('version')
+        try:
+            loaded = length_models.reload(version)
+        except ModelNotFound as e:
+            return jsonify({"error": str(e)}), 404
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify({
+            "message": "模型已切换",
+            "model_version": loaded.version,
+            "metadata": loaded.metadata,
+            "fast_path": loaded.fast_path is not None
         })
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
 VIDEO_FOLDER = os.path.join(os.path.dirname(__file__), 'config', 'videos')
-print("当前工作目录:", os.getcwd())
-print("视频目录绝对路径:", os.path.abspath(VIDEO_FOLDER))
-print("视频目录是否存在:", os.path.exists(VIDEO_FOLDER))
+app.logger.info("视频目录: %s (存在: %s)", os.path.abspath(VIDEO_FOLDER), os.path.exists(VIDEO_FOLDER))
 @app.route('/api/videos', methods=['GET'])
 def get_video_list():
     try:
@@ -415,90 +543,130 @@ def stream_video(filename):
 
 # === 水质数据异常检测相关接口（基于数据库读取）===
 
+MAX_ANOMALY_PAGE_SIZE = 5000  # 分页模式下单页最大条数
+ANOMALY_STREAM_BATCH_SIZE = 1000  # 流式模式下每次从服务端游标读取的条数
+MAX_BATCH_WINDOWS = 200  # 批量检测单次请求的最大窗口数
+
+# 跨月份 / 全部监测点的扫描在共享进程池中按分区并行执行，超过截止时间返回 504
+ANOMALY_SCAN_WORKERS = int(os.environ.get('ANOMALY_SCAN_WORKERS', min(4, os.cpu_count() or 1)))
+ANOMALY_SCAN_TIMEOUT = float(os.environ.get('ANOMALY_SCAN_TIMEOUT', 30))
+anomaly_scanner = ParallelAnomalyScanner(DB_CONFIG, ANOMALY_SCAN_WORKERS)
+
+# 进程内阈值缓存：本进程修改阈值后立即失效，其他工作进程的修改在 TTL 内感知
+threshold_cache = ThresholdCache(
+    lambda: execute_query("SELECT * FROM anomaly_thresholds"),
+    ttl=float(os.environ.get('THRESHOLD_CACHE_TTL', 60))
+)
+
 @app.route('/api/water-quality/thresholds', methods=['GET'])
 def get_anomaly_thresholds():
     """获取所有水质指标的异常阈值"""
     try:
-        query = "SELECT * FROM anomaly_thresholds"
-        thresholds = execute_query(query)
+        _, thresholds = threshold_cache.get()
         return jsonify(thresholds)
     except Exception as e:
         return jsonify({"error": f"获取阈值失败: {str(e)}"}), 500
 
 @app.route('/api/water-quality/thresholds', methods=['PUT'])
 def update_anomaly_thresholds():
-    """更新水质指标的异常阈值"""
+    """更新水质指标的异常阈值（全部参数在同一事务中更新）"""
     try:
         data = request.json
         if not data or not isinstance(data, list):
             return jsonify({"error": "请提供有效的阈值数据"}), 400
         
-        engine = get_db_engine()
+        updates = {}
         for threshold in data:
             parameter = threshold.get('parameter')
             if not parameter:
                 continue
-                
-            lower_threshold = threshold.get('lower_threshold')
-            upper_threshold = threshold.get('upper_threshold')
+            updates[parameter] = (threshold.get('lower_threshold'), threshold.get('upper_threshold'))
+        if not updates:
+            return jsonify({"message": "阈值更新成功"})
+        
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+        try:
+            # 一次查询锁定并读取所有待更新参数的当前阈值
+            placeholders = ", ".join(["%s"] * len(updates))
+            cursor.execute(
+                f"SELECT parameter, lower_threshold, upper_threshold FROM anomaly_thresholds "
+                f"WHERE parameter IN ({placeholders}) FOR UPDATE",
+                list(updates)
+            )
+            current = {row['parameter']: row for row in cursor.fetchall()}
+            missing = [p for p in updates if p not in current]
+            if missing:
+                conn.rollback()
+                return jsonify({"error": f"未找到参数: {missing[0]} 的阈值"}), 404
             
-            # 检查参数是否存在
-            check_query = "SELECT id FROM anomaly_thresholds WHERE parameter = %s"
-            result = execute_query(check_query, (parameter,))
-            if not result:
-                return jsonify({"error": f"未找到参数: {parameter} 的阈值"}), 404
-                
-            # 更新阈值
-            update_query = """
-            UPDATE anomaly_thresholds 
-            SET lower_threshold = %s, upper_threshold = %s 
-            WHERE parameter = %s
-            """
-            execute_query(update_query, (lower_threshold, upper_threshold, parameter), fetch=False)
-        
-        return jsonify({"message": "阈值更新成功"})
+            cursor.executemany(
+                "UPDATE anomaly_thresholds SET lower_threshold = %s, upper_threshold = %s WHERE parameter = %s",
+                [(lower, upper, parameter) for parameter, (lower, upper) in updates.items()]
+            )
+            
+            # 只重算阈值发生变化的参数在物化表中的异常条目，与阈值更新一起提交
+            for parameter, (lower, upper) in updates.items():
+                if parameter in PARAMETER_COLUMNS and threshold_changed(current[parameter], lower, upper):
+                    recompute_parameter(cursor, parameter)
+            
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+        
+        threshold_cache.invalidate()
+        return jsonify({"message": "阈值更新成功", "version": threshold_cache.version})
     except Exception as e:
         return jsonify({"error": f"更新阈值失败: {str(e)}"}), 500
 
+def threshold_changed(current, lower_threshold, upper_threshold):
+    """判断提交的上下限与数据库中的当前值是否不同"""
+    def as_float(value):
+        return None if value is None or value == '' else float(value)
+    return (as_float(current['lower_threshold']) != as_float(lower_threshold)
+            or as_float(current['upper_threshold']) != as_float(upper_threshold))
+
 @app.route('/api/water-quality/detect-anomalies', methods=['GET'])
 def detect_water_quality_anomalies():
     """从数据库读取水质数据并检测异常（优化数据格式）"""
     try:
-        print("===== 开始处理水质异常检测请求 =====")
-        
         # 获取查询参数
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
         site_id = request.args.get('site_id')
         
-        print(f"请求参数 - start_date: {start_date}, end_date: {end_date}, site_id: {site_id}")
+        app.logger.debug("异常检测请求参数 - start_date: %s, end_date: %s, site_id: %s",
+                         start_date, end_date, site_id)
         
-        # 构建查询语句
-        query = "SELECT * FROM water_quality"
-        params = []
-        conditions = []
+        # source=live（默认）按当前阈值实时筛选；source=materialized 从物化表按索引查找，
+        # 需要先执行 python -m config.anomaly_store 回填历史数据
+        source = request.args.get('source', SOURCE_LIVE)
+        if source not in ANOMALY_SOURCES:
+            return jsonify({"error": f"不支持的数据来源: {source}"}), 400
         
-        if start_date:
-            conditions.append("monitoring_date >= %s")
-            params.append(start_date)
-        if end_date:
-            conditions.append("monitoring_date <= %s")
-            params.append(end_date)
-        if site_id:
-            conditions.append("site_id = %s")
-            params.append(site_id)
+        # method=threshold（默认）按固定阈值检测，zscore / mad / seasonal 按监测点统计量检测
+        method = request.args.get('method', METHOD_THRESHOLD)
+        if method not in DETECTION_METHODS:
+            return jsonify({"error": f"不支持的检测方法: {method}"}), 400
         
-        if conditions:
-            query += " WHERE " + " AND ".join(conditions)
-        
-        print(f"执行查询: {query}, 参数: {params}")
+        # 分页参数：cursor 为上一页返回的 next_cursor（record_id），limit 为每页条数
+        response_format = request.args.get('format', 'json')
+        try:
+            after_record_id = request.args.get('cursor', type=int)
+            limit = parse_page_limit(request.args.get('limit'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
-        # 读取数据库数据
-        water_quality_data = execute_query(query, params)
-        print(f"数据库查询结果 - 数据条数: {len(water_quality_data)}")
+        # 先用 COUNT(*) 统计时间窗口内的记录总数
+        count_query, count_params = build_count_query(start_date, end_date, site_id)
+        total_records = execute_query(count_query, count_params)[0]['total_records']
+        app.logger.debug("数据库查询结果 - 数据条数: %d", total_records)
         
-        if not water_quality_data:
-            print("未找到水质数据，返回空结果")
+        if not total_records and response_format != 'ndjson':
             return jsonify({
                 "message": "未找到水质数据",
                 "anomalies": [],
@@ -506,104 +674,316 @@ def detect_water_quality_anomalies():
                 "anomaly_count": 0
             })
         
+        if method != METHOD_THRESHOLD:
+            return detect_statistical_response(
+                method, start_date, end_date, site_id, total_records,
+                response_format, after_record_id, limit
+            )
+        
         # 加载阈值
-        thresholds = execute_query("SELECT * FROM anomaly_thresholds")
-        threshold_map = {t['parameter']: t for t in thresholds}
-        print(f"加载阈值 - 阈值数量: {len(thresholds)}")
-        
-        # 定义参数映射（数据库字段到前端显示名称的映射）
-        param_mapping = {
-            'water_temp': 'water_temp',
-            'ph': 'ph',
-            'dissolved_oxygen': 'dissolved_oxygen',
-            'conductivity': 'conductivity',
-            'turbidity': 'turbidity',
-            'cod_mn': 'cod_mn',
-            'ammonia_nitrogen': 'ammonia_nitrogen',
-            'total_phosphorus': 'total_phosphorus',
-            'total_nitrogen': 'total_nitrogen',
-            'chla': 'chla',
-            'algae_density': 'algae_density'
-        }
+        thresholds_version, thresholds = threshold_cache.get()
+        app.logger.debug("加载阈值 - 版本: %s, 阈值数量: %d", thresholds_version, len(thresholds))
         
-        # 检测异常
-        anomalies = []
-        anomaly_count = 0
+        # 流式模式：服务端游标分批读取，每检测到一条异常立即输出一行 JSON
+        if response_format == 'ndjson':
+            query, params = build_anomaly_query(
+                thresholds, start_date, end_date, site_id,
+                after_record_id=after_record_id, source=source
+            )
+            return Response(
+                stream_anomalies(query, params, thresholds, total_records),
+                mimetype='application/x-ndjson'
+            )
         
-        for record in water_quality_data:
-            is_anomalous = False
-            anomaly_reasons = []
-            parameters = {}  # 用于存储格式化后的参数值
+        # 跨多个月或全部监测点时按分区并行扫描，结果已按 record_id 归并
+        partitions = plan_scan_partitions(start_date, end_date, site_id, after_record_id)
+        next_cursor = None
+        if len(partitions) > 1:
+            app.logger.info("并行扫描 - 分区数: %d, 工作进程数: %d", len(partitions), ANOMALY_SCAN_WORKERS)
+            try:
+                anomalies = anomaly_scanner.scan(
+                    partitions, thresholds, source,
+                    timeout=ANOMALY_SCAN_TIMEOUT,
+                    limit=limit + 1 if limit else None
+                )
+            except ScanTimeout as e:
+                return jsonify({"error": str(e)}), 504
+            if limit and len(anomalies) > limit:
+                anomalies = anomalies[:limit]
+                next_cursor = anomalies[-1]['record_id']
+        else:
+            # 数据库只返回异常记录（实时阈值谓词或物化表查找）；分页模式多取一条用于判断是否还有下一页
+            query, params = build_anomaly_query(
+                thresholds, start_date, end_date, site_id,
+                after_record_id=after_record_id,
+                limit=limit + 1 if limit else None,
+                source=source
+            )
+            app.logger.debug("执行查询: %s, 参数: %s", query, params)
+            violating_records = execute_query(query, params) if query else []
             
-            # 检查每个参数是否超出阈值
-            for db_param, threshold_param in param_mapping.items():
-                if threshold_param in threshold_map:
-                    threshold = threshold_map[threshold_param]
-                    lower = threshold['lower_threshold']
-                    upper = threshold['upper_threshold']
-                    value = record.get(db_param)
-                    
-                    # 格式化参数值并存储到parameters对象
-                    formatted_value = format_water_quality_value(value)
-                    parameters[db_param] = formatted_value
-                    
-                    if formatted_value is not None:
-                        try:
-                            float_value = float(formatted_value)
-                            if float_value < lower or float_value > upper:
-                                is_anomalous = True
-                                anomaly_reasons.append(f"{threshold_param}值{float_value}超出阈值[{lower}, {upper}]")
-                                print(f"检测到异常 - 记录ID: {record['record_id']}, 参数: {threshold_param}, 值: {float_value}, 阈值: [{lower}, {upper}]")
-                        except (ValueError, TypeError) as e:
-                            print(f"参数转换错误 - 参数: {threshold_param}, 值: {value}, 错误: {str(e)}")
+            if limit and len(violating_records) > limit:
+                violating_records = violating_records[:limit]
+                next_cursor = violating_records[-1]['record_id']
             
-            # 记录异常数据
-            if is_anomalous:
-                anomaly_count += 1
-                anomalies.append({
-                    "record_id": record["record_id"],
-                    "site_id": record["site_id"],
-                    "monitoring_date": str(record["monitoring_date"]),
-                    "monitoring_time": str(record["monitoring_time"]) if record["monitoring_time"] else "",
-                    "section_name": record["section_name"],
-                    "anomaly_reasons": anomaly_reasons,
-                    "parameters": parameters  # 使用格式化后的参数值
-                })
-        
-        print(f"异常检测完成 - 总数据量: {len(water_quality_data)}, 异常数量: {anomaly_count}")
-        
-        # 打印第一条异常数据的parameters（用于调试）
-        if anomalies:
-            print(f"第一条异常数据的parameters: {anomalies[0]['parameters']}")
+            # 按列向量化生成异常原因，只为异常记录构建返回结构
+            anomalies = detect_anomalies(violating_records, thresholds)
+        anomaly_count = len(anomalies)
+        
+        app.logger.info("异常检测完成 - 总数据量: %d, 异常数量: %d", total_records, anomaly_count)
         
         response_data = {
-            "message": f"检测完成，共{len(water_quality_data)}条数据，{anomaly_count}条异常",
+            "message": f"检测完成，共{total_records}条数据，{anomaly_count}条异常",
             "anomalies": anomalies,
-            "total_records": len(water_quality_data),
+            "total_records": total_records,
             "anomaly_count": anomaly_count
         }
+        if limit:
+            # 分页模式下 anomaly_count 为当前页的异常条数
+            response_data["next_cursor"] = next_cursor
+            response_data["has_more"] = next_cursor is not None
         
         return jsonify(response_data)
         
     except Exception as e:
-        print(f"数据检测异常: {str(e)}", exc_info=True)
+        app.logger.error("数据检测异常: %s", e, exc_info=True)
         return jsonify({"error": f"数据检测失败: {str(e)}"}), 500
-    finally:
-        print("===== 水质异常检测请求处理完成 =====")
 
-def format_water_quality_value(value):
-    """优化后的水质参数值格式化函数"""
-    if value is None:
+@app.route('/api/water-quality/detect-anomalies/batch', methods=['POST'])
+def detect_water_quality_anomalies_batch():
+    """
+    一次请求检测多个 {site_id, start_date, end_date} 窗口的异常
+
+    所有窗口合并为一条 site_id IN (...) 查询，阈值只评估一次，
+    结果按请求中的窗口顺序返回
+    """
+    try:
+        data = request.json or {}
+        try:
+            windows = parse_windows(data.get('windows'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if len(windows) > MAX_BATCH_WINDOWS:
+            return jsonify({"error": f"单次最多检测 {MAX_BATCH_WINDOWS} 个窗口"}), 400
+        
+        source = data.get('source', SOURCE_LIVE)
+        if source not in ANOMALY_SOURCES:
+            return jsonify({"error": f"不支持的数据来源: {source}"}), 400
+        
+        # 一次扫描统计每个窗口的记录数
+        count_query, count_params = build_window_count_query(windows)
+        counts = execute_query(count_query, count_params)[0]
+        
+        _, thresholds = threshold_cache.get()
+        query, params = build_anomaly_query(thresholds, windows=windows, source=source)
+        anomalies = detect_anomalies(execute_query(query, params), thresholds) if query else []
+        grouped = group_anomalies_by_window(anomalies, windows)
+        
+        results = []
+        for i, (window, window_anomalies) in enumerate(zip(windows, grouped)):
+            results.append({
+                **window,
+                "total_records": int(counts[f"window_{i}"] or 0),
+                "anomaly_count": len(window_anomalies),
+                "anomalies": window_anomalies
+            })
+        
+        app.logger.info("批量异常检测完成 - 窗口数: %d, 异常数量: %d", len(windows), len(anomalies))
+        return jsonify({
+            "message": f"检测完成，共{len(windows)}个窗口，{len(anomalies)}条异常",
+            "windows": results,
+            "anomaly_count": len(anomalies)
+        })
+    except Exception as e:
+        app.logger.error("批量异常检测失败: %s", e, exc_info=True)
+        return jsonify({"error": f"批量检测失败: {str(e)}"}), 500
+
+def plan_scan_partitions(start_date, end_date, site_id, after_record_id):
+    """划分并行扫描的分区，只有一个分区或未启用进程池时按原方式在请求线程中扫描"""
+    if not anomaly_scanner.enabled:
+        return [None]
+    site_bounds = None
+    if not site_id and not (start_date and end_date):
+        bounds = execute_query("SELECT MIN(site_id) AS low, MAX(site_id) AS high FROM monitoring_site")[0]
+        site_bounds = (bounds['low'], bounds['high'])
+    try:
+        partitions = plan_partitions(start_date, end_date, site_id, site_bounds, ANOMALY_SCAN_WORKERS)
+    except ValueError:
+        # 日期不是 YYYY-MM-DD 格式时无法按月划分，交给数据库按原条件查询
+        return [None]
+    for partition in partitions:
+        partition['after_record_id'] = after_record_id
+    return partitions
+
+def detect_statistical_response(method, start_date, end_date, site_id, total_records,
+                                response_format, after_record_id, limit):
+    """按统计方法检测异常，返回格式与阈值检测相同（含分页和流式输出）"""
+    window = request.args.get('window', DEFAULT_WINDOW, type=int)
+    score_threshold = request.args.get('z', DEFAULT_SCORE_THRESHOLD, type=float)
+    if window < 2 or score_threshold <= 0:
+        return jsonify({"error": "window 必须不小于 2，z 必须为正数"}), 400
+    
+    # 滚动方法向前多读若干天作为窗口历史；季节方法的历史已汇总在基线表中
+    lookback = 0 if method == METHOD_SEASONAL else lookback_days(window)
+    try:
+        query, params = build_history_query(start_date, end_date, site_id, lookback)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    records = execute_query(query, params)
+    
+    baselines = None
+    if method == METHOD_SEASONAL and records:
+        baseline_query, baseline_params = build_baseline_query(
+            [r['site_id'] for r in records], [r['monitoring_date'].month for r in records]
+        )
+        baselines = execute_query(baseline_query, baseline_params)
+    
+    anomalies = detect_statistical_anomalies(
+        records, method, baselines, window=window,
+        score_threshold=score_threshold, start_date=start_date
+    )
+    del records
+    
+    if after_record_id is not None:
+        anomalies = [a for a in anomalies if a['record_id'] > after_record_id]
+    
+    if response_format == 'ndjson':
+        def generate():
+            for anomaly in anomalies:
+                yield json.dumps(anomaly) + "\n"
+            yield json.dumps({
+                "finished": True,
+                "total_records": total_records,
+                "anomaly_count": len(anomalies)
+            }) + "\n"
+        return Response(generate(), mimetype='application/x-ndjson')
+    
+    next_cursor = None
+    if limit and len(anomalies) > limit:
+        anomalies = anomalies[:limit]
+        next_cursor = anomalies[-1]['record_id']
+    anomaly_count = len(anomalies)
+    
+    response_data = {
+        "message": f"检测完成，共{total_records}条数据，{anomaly_count}条异常",
+        "method": method,
+        "anomalies": anomalies,
+        "total_records": total_records,
+        "anomaly_count": anomaly_count
+    }
+    if limit:
+        response_data["next_cursor"] = next_cursor
+        response_data["has_more"] = next_cursor is not None
+    return jsonify(response_data)
+
+def parse_page_limit(value):
+    """解析分页大小，未提供时返回 None（不分页）"""
+    if value is None or value == '':
         return None
-    if isinstance(value, str):
-        stripped = value.strip()
-        if not stripped:
-            return None
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError("limit 参数必须为正整数")
+    if limit <= 0:
+        raise ValueError("limit 参数必须为正整数")
+    return min(limit, MAX_ANOMALY_PAGE_SIZE)
+
+def stream_anomalies(query, params, thresholds, total_records):
+    """以 NDJSON 格式逐条输出异常记录，最后一行为汇总信息"""
+    anomaly_count = 0
+    if query:
+        conn = get_db_connection()
+        # 非缓冲游标：结果集留在服务端，通过 fetchmany 分批读取
+        cursor = conn.cursor(dictionary=True, buffered=False)
         try:
-            return float(stripped)
-        except ValueError:
-            return stripped  # 保留原始字符串（如"异常"等描述）
-    return float(value) if not isinstance(value, bool) else None
+            cursor.execute(query, params)
+            for anomaly in iter_anomalies(cursor, thresholds, ANOMALY_STREAM_BATCH_SIZE):
+                anomaly_count += 1
+                yield json.dumps(anomaly) + "\n"
+        finally:
+            # 客户端提前断开时读完剩余结果，保证连接能干净地归还连接池
+            try:
+                while cursor.fetchmany(ANOMALY_STREAM_BATCH_SIZE):
+                    pass
+            except Exception:
+                pass
+            cursor.close()
+            conn.close()
+    
+    yield json.dumps({
+        "finished": True,
+        "total_records": total_records,
+        "anomaly_count": anomaly_count
+    }) + "\n"
+
+@app.route('/api/water-quality/anomaly-summary', methods=['GET'])
+def get_anomaly_summary():
+    """按监测点 / 参数 / 时间段汇总异常数量（只返回分组计数）"""
+    try:
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        site_id = request.args.get('site_id')
+        
+        # group_by 为 site / parameter / date 的任意组合，bucket 决定 date 维度的粒度
+        try:
+            group_by = parse_group_by(request.args.get('group_by', 'site,parameter,date'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        bucket = request.args.get('bucket', 'day')
+        if bucket not in SUMMARY_BUCKETS:
+            return jsonify({"error": f"不支持的时间粒度: {bucket}"}), 400
+        source = request.args.get('source', SOURCE_LIVE)
+        if source not in ANOMALY_SOURCES:
+            return jsonify({"error": f"不支持的数据来源: {source}"}), 400
+        
+        thresholds = None if source == SOURCE_MATERIALIZED else threshold_cache.get()[1]
+        groups = summarize_anomalies(
+            execute_query, thresholds, group_by, bucket, source,
+            start_date, end_date, site_id
+        )
+        
+        return jsonify({
+            "group_by": group_by,
+            "bucket": bucket,
+            "source": source,
+            "total_anomalies": sum(g['anomaly_count'] for g in groups),
+            "groups": groups
+        })
+    except Exception as e:
+        return jsonify({"error": f"异常汇总失败: {str(e)}"}), 500
+
+@app.route('/api/water-quality/aggregate', methods=['GET'])
+def get_water_quality_aggregate():
+    """按小时 / 天 / 周聚合水质参数，返回与 /visualize-water 相同结构的折线图数据"""
+    try:
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        site_id = request.args.get('site_id')
+        
+        bucket = request.args.get('bucket', '1d')
+        if bucket not in AGGREGATE_BUCKETS:
+            return jsonify({"error": f"bucket 只支持: {', '.join(AGGREGATE_BUCKETS)}"}), 400
+        try:
+            aggregates = parse_aggregates(request.args.get('aggregates'))
+            parameters = parse_parameters(request.args.get('parameters'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        payload_format = request.args.get('format', FORMAT_JSON)
+        if payload_format not in PAYLOAD_FORMATS:
+            return jsonify({"error": f"format 只支持: {', '.join(PAYLOAD_FORMATS)}"}), 400
+        
+        line_chart_data = aggregate_water_quality(
+            execute_query, bucket, aggregates, parameters,
+            start_date, end_date, site_id, payload_format
+        )
+        return compress_response(jsonify({
+            "bucket": bucket,
+            "aggregates": aggregates,
+            "parameters": parameters,
+            "line_chart_data": line_chart_data
+        }), request.accept_encodings)
+    except Exception as e:
+        return jsonify({"error": f"水质数据聚合失败: {str(e)}"}), 500
 
 def collect_environment():
     """收集测试环境信息"""
@@ -657,6 +1037,7 @@ def collect_environment():
         "psutil": "psutil"
     }
     
+    import pkg_resources
     installed_packages = {pkg.key.lower(): pkg for pkg in pkg_resources.working_set}
     
     for display_name, module_name in packages_to_collect.items():
@@ -754,7 +1135,7 @@ def get_test_environment():
             return jsonify({"error": "不支持的格式"}), 400
             
     except Exception as e:
-        current_app.logger.error(f"生成环境报告失败: {str(e)}")
+        current_app.logger.error("生成环境报告失败: %s", e)
         return jsonify({"error": str(e)}), 500
 
 # 当直接运行此文件时执行
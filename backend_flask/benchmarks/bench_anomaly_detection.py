@@ -0,0 +1,170 @@
+"""
+水质异常检测性能基准
+对比原逐行逐参数循环与按列向量化引擎在 10 万 / 100 万条记录下的耗时，
+并校验两者输出一致
+
+异常检测的主要收益来自 SQL 下推：build_anomaly_query 把阈值条件（或物化表查找）
+交给数据库，只有超出阈值的记录才会被读取、传输和转换为 Python 对象，
+原实现则要把时间窗口内的全部记录取回再逐行判断。这里测量的是下推之后剩余的
+Python 部分，即对同样一批记录两种实现的耗时，向量化引擎只带来数倍的常数级提升：
+
+- 默认模拟查询以 DOUBLE 返回参数列（select_parameter_columns），记录中为 float
+- --decimal 模拟直接读取 DECIMAL 列，此时逐个转换 Decimal 占了大部分耗时，
+  两种实现的差距明显缩小
+- “构建矩阵”列单独给出 load_parameter_matrix 的耗时
+
+运行方式（在 backend_flask 目录下）:
+    python -m benchmarks.bench_anomaly_detection
+    python -m benchmarks.bench_anomaly_detection --sizes 100000 1000000 --repeat 3
+    python -m benchmarks.bench_anomaly_detection --decimal
+
+向量化引擎的其余耗时主要取决于异常记录数（需要逐条构建返回结构），
+可用 --spread 调高异常比例观察最坏情况
+"""
+
+import argparse
+import datetime
+import time
+from decimal import Decimal
+
+import numpy as np
+
+from config.anomaly_detection import (
+    PARAMETER_COLUMNS, build_threshold_vectors, detect_anomalies, format_water_quality_value,
+    load_parameter_matrix
+)
+
+# 与 water_quality_monitoring.sql 中初始化的阈值一致
+DEFAULT_THRESHOLDS = [
+    {'parameter': 'water_temp', 'lower_threshold': 15.0, 'upper_threshold': 30.0},
+    {'parameter': 'ph', 'lower_threshold': 6.5, 'upper_threshold': 8.5},
+    {'parameter': 'dissolved_oxygen', 'lower_threshold': 4.0, 'upper_threshold': 10.0},
+    {'parameter': 'turbidity', 'lower_threshold': 0.0, 'upper_threshold': 50.0},
+    {'parameter': 'ammonia_nitrogen', 'lower_threshold': 0.0, 'upper_threshold': 0.2},
+]
+
+# 各参数的模拟分布 (均值, 标准差)，大部分记录落在默认阈值内
+PARAMETER_DISTRIBUTIONS = {
+    'water_temp': (22, 2.5),
+    'ph': (7.5, 0.35),
+    'dissolved_oxygen': (7, 1.1),
+    'conductivity': (600, 250),
+    'turbidity': (15, 10),
+    'cod_mn': (4, 1.5),
+    'ammonia_nitrogen': (0.08, 0.04),
+    'total_phosphorus': (0.08, 0.04),
+    'total_nitrogen': (2, 1),
+    'chla': (0.01, 0.005),
+    'algae_density': (1e6, 5e5),
+}
+
+
+def legacy_detect(records, thresholds):
+    """原 detect_water_quality_anomalies 中的逐行检测循环（去除 print）"""
+    threshold_map = {t['parameter']: t for t in thresholds}
+    anomalies = []
+    for record in records:
+        is_anomalous = False
+        anomaly_reasons = []
+        parameters = {}
+        for db_param in PARAMETER_COLUMNS:
+            if db_param in threshold_map:
+                threshold = threshold_map[db_param]
+                lower = threshold['lower_threshold']
+                upper = threshold['upper_threshold']
+                formatted_value = format_water_quality_value(record.get(db_param))
+                parameters[db_param] = formatted_value
+                if formatted_value is not None:
+                    try:
+                        float_value = float(formatted_value)
+                        if float_value < lower or float_value > upper:
+                            is_anomalous = True
+                            anomaly_reasons.append(f"{db_param}值{float_value}超出阈值[{lower}, {upper}]")
+                    except (ValueError, TypeError):
+                        pass
+        if is_anomalous:
+            anomalies.append({
+                "record_id": record["record_id"],
+                "site_id": record["site_id"],
+                "monitoring_date": str(record["monitoring_date"]),
+                "monitoring_time": str(record["monitoring_time"]) if record["monitoring_time"] else "",
+                "section_name": record["section_name"],
+                "anomaly_reasons": anomaly_reasons,
+                "parameters": parameters
+            })
+    return anomalies
+
+
+def generate_records(n, spread=1.0, missing_rate=0.05, seed=42, decimal=False):
+    """
+    生成与 water_quality 查询结果结构相同的模拟记录
+
+    spread 用于放大各参数的标准差，从而提高异常记录的比例；
+    decimal 为 True 时参数值为两位小数的 Decimal（与直接读取 DECIMAL 列的结果一致）
+    """
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for col, (mean, std) in PARAMETER_DISTRIBUTIONS.items():
+        values = np.round(rng.normal(mean, std * spread, n), 2 if decimal else 3).tolist()
+        if decimal:
+            values = [Decimal(f"{value:.2f}") for value in values]
+        for i in np.flatnonzero(rng.random(n) < missing_rate):
+            values[i] = None
+        columns[col] = values
+
+    base_date = datetime.date(2020, 5, 8)
+    site_ids = rng.integers(1, 2104, n).tolist()
+    records = []
+    for i in range(n):
+        record = {
+            'record_id': i + 1,
+            'site_id': site_ids[i],
+            'monitoring_date': base_date + datetime.timedelta(days=i // 12000),
+            'monitoring_time': datetime.timedelta(hours=(i % 6) * 4),
+            'section_name': f"断面{site_ids[i]}",
+        }
+        for col in PARAMETER_COLUMNS:
+            record[col] = columns[col][i]
+        records.append(record)
+    return records
+
+
+def time_call(func, repeat):
+    """返回多次运行中的最短耗时及最后一次结果"""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="水质异常检测性能基准")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--spread', type=float, default=1.0,
+                        help="参数标准差放大倍数，越大异常比例越高（如 2.0）")
+    parser.add_argument('--decimal', action='store_true',
+                        help="参数值使用 Decimal，模拟不经 select_parameter_columns 直接读取 DECIMAL 列")
+    args = parser.parse_args()
+
+    active_columns = build_threshold_vectors(DEFAULT_THRESHOLDS)[0]
+    print(f"参数值类型: {'Decimal' if args.decimal else 'float'}")
+    print(f"{'记录数':>10} {'异常数':>10} {'原循环(s)':>12} {'向量化(s)':>12} {'构建矩阵(s)':>12} {'加速比':>8}")
+    for n in args.sizes:
+        records = generate_records(n, spread=args.spread, decimal=args.decimal)
+        legacy_time, legacy_result = time_call(lambda: legacy_detect(records, DEFAULT_THRESHOLDS), args.repeat)
+        engine_time, engine_result = time_call(lambda: detect_anomalies(records, DEFAULT_THRESHOLDS), args.repeat)
+        matrix_time, _ = time_call(lambda: load_parameter_matrix(records, active_columns), args.repeat)
+
+        if legacy_result != engine_result:
+            raise AssertionError(f"{n} 条记录时两种实现的输出不一致")
+
+        print(f"{n:>10} {len(engine_result):>10} {legacy_time:>12.3f} {engine_time:>12.3f} "
+              f"{matrix_time:>12.3f} {legacy_time / engine_time:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
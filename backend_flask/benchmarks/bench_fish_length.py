@@ -0,0 +1,127 @@
+"""
+鱼类体长批量预测吞吐量基准
+对比逐条请求 /predict-fish-length 与一次请求 /predict-fish-length/batch（JSON / CSV）
+预测同样 n 条记录的耗时，并校验两者结果一致
+
+两个接口都挂在一个只包含这两个路由的 Flask 应用上，通过测试客户端调用
+（包含请求解析、路由和响应序列化，不含网络传输），不需要连接数据库。
+单条接口的处理逻辑与 app.py 中的原实现相同
+
+运行方式（在 backend_flask 目录下，需要 scikit-learn 和 fish_length_model.pkl）:
+    python -m benchmarks.bench_fish_length
+    python -m benchmarks.bench_fish_length --sizes 100 1000 10000 --repeat 3
+"""
+
+import argparse
+import io
+import json
+import time
+
+import numpy as np
+from flask import Flask, Response, jsonify, request
+
+from config.fish_length_batch import parse_csv_batch, parse_json_batch, predict_lengths, stream_predictions
+
+FISH_CSV_PATH = 'config/软件工程大作业数据/Fish.csv'
+
+
+def create_app(model):
+    app = Flask(__name__)
+
+    @app.route('/predict-fish-length', methods=['POST'])
+    def single():
+        # 与 app.py 中 handle_fish_length_prediction 的原实现相同
+        weight = float(request.json.get('weight'))
+        height = float(request.json.get('height'))
+        width = float(request.json.get('width'))
+        length_prediction = model.predict([[weight, height, width]])[0]
+        return jsonify({"length_prediction": length_prediction})
+
+    @app.route('/predict-fish-length/batch', methods=['POST'])
+    def batch():
+        try:
+            if 'file' in request.files:
+                features = parse_csv_batch(request.files['file'].stream)
+            else:
+                features = parse_json_batch(request.get_json(silent=True))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return Response(stream_predictions(predict_lengths(model, features)), mimetype='application/json')
+
+    return app
+
+
+def generate_features(n, seed=42):
+    """在 Fish.csv 的真实样本上加入小幅扰动，生成 n 条 (体重, 高度, 宽度)"""
+    import pandas as pd
+
+    df = pd.read_csv(FISH_CSV_PATH).dropna(subset=['Weight(g)', 'Height(cm)', 'Width(cm)'])
+    base = df[['Weight(g)', 'Height(cm)', 'Width(cm)']].to_numpy(dtype=np.float64)
+    rng = np.random.default_rng(seed)
+    rows = base[rng.integers(0, len(base), n)]
+    return np.round(rows * rng.normal(1.0, 0.05, rows.shape), 2)
+
+
+def run_single(client, features):
+    predictions = []
+    for weight, height, width in features.tolist():
+        response = client.post('/predict-fish-length', json={'weight': weight, 'height': height, 'width': width})
+        predictions.append(response.get_json()['length_prediction'])
+    return np.array(predictions)
+
+
+def run_batch_json(client, features):
+    items = [dict(zip(('weight', 'height', 'width'), row)) for row in features.tolist()]
+    response = client.post('/predict-fish-length/batch', json=items)
+    return np.array(json.loads(response.get_data())['length_predictions'])
+
+
+def run_batch_csv(client, features):
+    lines = ['Weight(g),Height(cm),Width(cm)'] + [','.join(map(repr, row)) for row in features.tolist()]
+    data = {'file': (io.BytesIO('\n'.join(lines).encode('utf-8')), 'survey.csv')}
+    response = client.post('/predict-fish-length/batch', data=data, content_type='multipart/form-data')
+    return np.array(json.loads(response.get_data())['length_predictions'])
+
+
+def time_call(func, repeat):
+    """返回多次运行中的最短耗时及最后一次结果"""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="鱼类体长批量预测吞吐量基准")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--model', default='fish_length_model.pkl')
+    args = parser.parse_args()
+
+    import joblib
+    import warnings
+
+    # 模型用带列名的 DataFrame 训练，两个接口都传入数组，忽略 scikit-learn 的列名提示
+    warnings.filterwarnings('ignore', message='X does not have valid feature names')
+    client = create_app(joblib.load(args.model)).test_client()
+
+    print(f"{'记录数':>8} {'逐条(s)':>10} {'逐条(条/s)':>12} {'批量JSON(s)':>12} {'批量JSON(条/s)':>15} "
+          f"{'批量CSV(s)':>11} {'批量CSV(条/s)':>14} {'加速比':>8}")
+    for n in args.sizes:
+        features = generate_features(n)
+        single_time, single_result = time_call(lambda: run_single(client, features), args.repeat)
+        json_time, json_result = time_call(lambda: run_batch_json(client, features), args.repeat)
+        csv_time, csv_result = time_call(lambda: run_batch_csv(client, features), args.repeat)
+
+        if not (np.allclose(single_result, json_result) and np.allclose(single_result, csv_result)):
+            raise AssertionError(f"{n} 条记录时逐条与批量预测的结果不一致")
+
+        print(f"{n:>8} {single_time:>10.3f} {n / single_time:>12.0f} {json_time:>12.4f} {n / json_time:>15.0f} "
+              f"{csv_time:>11.4f} {n / csv_time:>14.0f} {single_time / json_time:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
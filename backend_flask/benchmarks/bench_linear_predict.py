@@ -0,0 +1,110 @@
+"""
+线性模型快速预测微基准
+对比体长预测模型的 scikit-learn predict 与编译后的 LinearPredictor：
+
+- 单条：model.predict([[w, h, x]])[0]（原 /predict-fish-length 的写法）对比 predict_one
+- 批量：model.predict(X) 对比 LinearPredictor.predict(X)
+
+并在全部样本上校验两条路径的结果一致。浮点乘加的顺序不同会带来最后一位的差异
+（scikit-learn 自身单条和批量调用的结果也不总是逐位相同），因此按 ULP 比较：
+批量路径与 scikit-learn 的计算方式相同，单条路径的差异不超过 --max-ulps
+
+运行方式（在 backend_flask 目录下，需要 scikit-learn）:
+    python -m benchmarks.bench_linear_predict
+    python -m benchmarks.bench_linear_predict --model fish_length_model.pkl --rows 100000
+"""
+
+import argparse
+import timeit
+import warnings
+
+import numpy as np
+
+from config.linear_predictor import compile_linear
+
+FISH_CSV_PATH = 'config/软件工程大作业数据/Fish.csv'
+
+
+def load_model(path):
+    import joblib
+
+    if path:
+        return joblib.load(path, mmap_mode='r')
+    from config.model_registry import ModelRegistry
+
+    loaded = ModelRegistry().current()
+    if loaded is None:
+        raise SystemExit("没有可用的体长预测模型")
+    print(f"模型版本: {loaded.version}")
+    return loaded.model
+
+
+def generate_features(n, seed=42):
+    """在 Fish.csv 的真实样本上加入小幅扰动，生成 n 条 (体重, 高度, 宽度)"""
+    import pandas as pd
+
+    df = pd.read_csv(FISH_CSV_PATH).dropna(subset=['Weight(g)', 'Height(cm)', 'Width(cm)'])
+    base = df[['Weight(g)', 'Height(cm)', 'Width(cm)']].to_numpy(dtype=np.float64)
+    rng = np.random.default_rng(seed)
+    rows = base[rng.integers(0, len(base), n)]
+    return rows * rng.normal(1.0, 0.05, rows.shape)
+
+
+def ulp_distance(a, b):
+    """两组 float64 之间相差的 ULP 数（逐元素）"""
+    return np.abs(a - b) / np.spacing(np.maximum(np.abs(a), np.abs(b)))
+
+
+def per_call_us(func, number):
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="线性模型快速预测微基准")
+    parser.add_argument('--model', default=None, help="模型文件路径，默认使用注册表中的当前版本")
+    parser.add_argument('--rows', type=int, default=100000, help="一致性校验和批量预测的样本数")
+    parser.add_argument('--number', type=int, default=2000, help="单条预测每轮计时的调用次数")
+    parser.add_argument('--max-ulps', type=float, default=4)
+    args = parser.parse_args()
+
+    # 模型用带列名的 DataFrame 训练，两条路径都传入数组，忽略 scikit-learn 的列名提示
+    warnings.filterwarnings('ignore', message='X does not have valid feature names')
+    model = load_model(args.model)
+    predictor = compile_linear(model)
+    if predictor is None:
+        raise SystemExit(f"{type(model).__name__} 不是可编译的线性模型，只能使用 scikit-learn 的 predict")
+
+    features = generate_features(args.rows)
+    rows = features.tolist()
+
+    # 一致性：单条路径逐条对比 scikit-learn 单条调用，批量路径对比 scikit-learn 批量调用
+    sample = rows[:min(len(rows), 5000)]
+    sklearn_single = np.array([model.predict([row])[0] for row in sample])
+    fast_single = np.array([predictor.predict_one(*row) for row in sample])
+    sklearn_batch = np.asarray(model.predict(features), dtype=np.float64)
+    fast_batch = predictor.predict(features)
+
+    single_ulps = ulp_distance(sklearn_single, fast_single)
+    batch_ulps = ulp_distance(sklearn_batch, fast_batch)
+    print(f"单条: {len(sample)} 条，逐位相同 {np.mean(sklearn_single == fast_single):.1%}，"
+          f"最大差异 {single_ulps.max():.0f} ULP / {np.abs(sklearn_single - fast_single).max():.3g}")
+    print(f"批量: {len(rows)} 条，逐位相同 {np.mean(sklearn_batch == fast_batch):.1%}，"
+          f"最大差异 {batch_ulps.max():.0f} ULP / {np.abs(sklearn_batch - fast_batch).max():.3g}")
+    if single_ulps.max() > args.max_ulps or batch_ulps.max() > args.max_ulps:
+        raise AssertionError(f"两条路径的结果差异超过 {args.max_ulps} ULP")
+
+    weight, height, width = rows[0]
+    sklearn_us = per_call_us(lambda: model.predict([[weight, height, width]])[0], args.number)
+    fast_us = per_call_us(lambda: predictor.predict_one(weight, height, width), args.number * 100)
+    print(f"\n{'路径':<24} {'单条(微秒)':>12}")
+    print(f"{'scikit-learn predict':<24} {sklearn_us:>12.2f}")
+    print(f"{'LinearPredictor':<24} {fast_us:>12.3f}   ({sklearn_us / fast_us:.0f}x)")
+
+    sklearn_batch_ms = per_call_us(lambda: model.predict(features), 3) / 1000
+    fast_batch_ms = per_call_us(lambda: predictor.predict(features), 3) / 1000
+    print(f"\n批量 {len(rows)} 条: scikit-learn {sklearn_batch_ms:.2f} ms，"
+          f"LinearPredictor {fast_batch_ms:.2f} ms ({sklearn_batch_ms / fast_batch_ms:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+"""
+应用启动耗时和内存基准
+每个模块在全新的解释器中导入（冷启动），记录：
+
+- 导入耗时（墙钟时间，取多次运行的中位数）
+- 导入后进程的 RSS 峰值，以及相对空解释器的增量
+- python -X importtime 的逐模块累计耗时，列出最慢的依赖
+
+默认测量 app 以及几个重量级依赖，便于对比延迟导入前后的差异。导入 app 会创建
+MySQL 连接池，数据库不可用时该项记录为失败并给出错误信息
+
+运行方式（在 backend_flask 目录下）:
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --modules app routes.fish_recognition --repeat 5
+    python -m benchmarks.bench_startup --output startup.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MODULES = [
+    'app',
+    'routes.fish_recognition',
+    'routes.auth',
+    'config.DataVisualization',
+    'config.chart_payload',
+    'pandas',
+    'matplotlib.pyplot',
+    'seaborn',
+    'sqlalchemy',
+    'pkg_resources',
+    'torch',
+]
+
+# 子进程导入模块后输出耗时和 RSS 峰值（ru_maxrss 在 Linux 上单位为 KB，macOS 上为字节）
+_PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+error = None
+try:
+    if sys.argv[1]:
+        __import__(sys.argv[1])
+except BaseException as e:
+    error = f"{type(e).__name__}: {e}"
+elapsed = time.perf_counter() - start
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+if sys.platform == 'darwin':
+    rss //= 1024
+print(json.dumps({'seconds': elapsed, 'rss_kb': rss, 'error': error}))
+"""
+
+
+def probe(module):
+    """在全新的解释器中导入 module，返回 {'seconds', 'rss_kb', 'error'}"""
+    result = subprocess.run(
+        [sys.executable, '-c', _PROBE, module],
+        cwd=BACKEND_DIR, capture_output=True, text=True
+    )
+    lines = result.stdout.strip().splitlines()
+    if result.returncode != 0 or not lines:
+        return {'seconds': None, 'rss_kb': None, 'error': (result.stderr.strip().splitlines() or ['exit'])[-1]}
+    return json.loads(lines[-1])
+
+
+def import_time_breakdown(module, top):
+    """
+    用 python -X importtime 导入 module，返回 module 本身及其累计耗时最长的直接依赖
+
+    Returns:
+        list[dict]: [{'module', 'self_us', 'cumulative_us'}]，第一项为 module，其余按累计耗时降序
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+        cwd=BACKEND_DIR, capture_output=True, text=True
+    )
+    entries = []
+    for line in result.stderr.splitlines():
+        # 格式: "import time: self [us] | cumulative | imported package"，子模块按嵌套层级缩进 2 格
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        except ValueError:
+            continue
+        entries.append({
+            'module': name.strip(),
+            'depth': len(name) - len(name.lstrip()),
+            'self_us': int(self_us),
+            'cumulative_us': int(cumulative_us),
+        })
+    if not entries:
+        return []
+
+    # 子模块先于父模块输出：目标模块是最后一个顶层条目，它之前到上一个顶层条目之间
+    # 缩进多一级的条目就是它直接导入的依赖（不含解释器启动时的 site 等模块）
+    top_depth = min(entry['depth'] for entry in entries)
+    top_levels = [i for i, entry in enumerate(entries) if entry['depth'] == top_depth]
+    target = top_levels[-1]
+    previous = top_levels[-2] if len(top_levels) > 1 else -1
+    children = [
+        entry for entry in entries[previous + 1:target]
+        if entry['depth'] == top_depth + 2
+    ]
+    ranked = [entries[target]] + sorted(children, key=lambda e: e['cumulative_us'], reverse=True)
+    return [
+        {key: entry[key] for key in ('module', 'self_us', 'cumulative_us')}
+        for entry in ranked[:top]
+    ]
+
+
+def measure(module, repeat, baseline_rss):
+    runs = [probe(module) for _ in range(repeat)]
+    ok = [run for run in runs if run['error'] is None]
+    if not ok:
+        return {'module': module, 'error': runs[-1]['error']}
+    rss = max(run['rss_kb'] for run in ok)
+    return {
+        'module': module,
+        'seconds': statistics.median(run['seconds'] for run in ok),
+        'rss_mb': rss / 1024,
+        'rss_delta_mb': (rss - baseline_rss) / 1024,
+        'error': None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="应用启动耗时和内存基准")
+    parser.add_argument('--modules', nargs='+', default=DEFAULT_MODULES)
+    parser.add_argument('--repeat', type=int, default=3, help="每个模块的冷启动次数（取中位数）")
+    parser.add_argument('--top', type=int, default=15, help="-X importtime 列出的最慢依赖数")
+    parser.add_argument('--output', default=None, help="把结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    baseline = probe('')
+    print(f"Python {sys.version.split()[0]}，空解释器 RSS: {baseline['rss_kb'] / 1024:.1f} MB")
+    print(f"{'模块':<28} {'导入耗时(秒)':>12} {'RSS(MB)':>10} {'增量(MB)':>10}")
+
+    results = []
+    for module in args.modules:
+        result = measure(module, args.repeat, baseline['rss_kb'])
+        results.append(result)
+        if result['error']:
+            print(f"{module:<28} 导入失败: {result['error']}")
+        else:
+            print(f"{module:<28} {result['seconds']:>12.3f} {result['rss_mb']:>10.1f} {result['rss_delta_mb']:>10.1f}")
+
+    breakdown = {}
+    for result in results:
+        if result['error'] is None:
+            breakdown[result['module']] = import_time_breakdown(result['module'], args.top)
+    if breakdown:
+        first = next(iter(breakdown))
+        print(f"\n{first} 累计导入耗时最长的依赖 (-X importtime):")
+        for entry in breakdown[first]:
+            print(f"  {entry['cumulative_us'] / 1000:>9.1f} ms  {entry['module']}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({
+                'python': sys.version,
+                'baseline_rss_mb': baseline['rss_kb'] / 1024,
+                'modules': results,
+                'importtime': breakdown,
+            }, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已写入 {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,256 +1,356 @@
 import pandas as pd
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
+import hashlib
 import json
+import logging
 import os
-import re
+import threading
+from collections import namedtuple
 from flask import Flask, render_template_string, request
 import base64
-from io import BytesIO  # 从 io 模块导入 BytesIO
-import seaborn as sns
 import numpy as np
 
-# 设置中文字体支持
-plt.rcParams["font.family"] = ["SimHei"]
-plt.rcParams["axes.unicode_minus"] = False  # 解决负号显示问题
+from config.anomaly_detection import PARAMETER_COLUMNS
+from config.chart_payload import FORMAT_COLUMNAR, FORMAT_JSON, encode_epochs, encode_float32
+from config.chart_rendering import (
+    render_bar_chart, render_dissolved_oxygen_trend, render_ph_histogram, render_pool,
+    render_scatter_chart, render_single_species_scatter, render_time_series, render_water_quality_pie_chart
+)
+from config.downsampling import DOWNSAMPLE_LTTB, MIN_DOWNSAMPLE_POINTS, downsample_indices, thin_indices
+from config.lru_cache import SizedLRUCache
+from config.water_cleaning import clean_column_name, extract_numeric, infer_year, parse_monitoring_times
+from config.water_range import ParallelWaterLoader
+from config.water_store import MONITORING_AT_COLUMN, list_water_files, load_water_frame
+
+# 图表在 config.chart_rendering 的渲染进程中用 Figure API 绘制，中文字体在渲染进程初始化时设置
 
 app = Flask(__name__)
+logger = logging.getLogger(__name__)
 
-def clean_column_name(name):
-    """清理列名，移除 HTML 标签和单位信息"""
-    return re.sub(r'<[^>]*>', '', name).strip()
+# 解析后的水质数据集缓存，按内存大小淘汰（默认 256MB）
+WATER_DATASET_CACHE_BYTES = int(os.environ.get('WATER_DATASET_CACHE_MB', 256)) * 1024 * 1024
 
+# 清洗后的 DataFrame 及绘图所需的列信息；缓存中的 DataFrame 为只读，调用方不得修改
+WaterDataset = namedtuple('WaterDataset', ['df', 'x_column', 'x_label', 'numerical_columns', 'nbytes'])
 
-def visualize_water_quality(file_path, target_column=None):
-    try:
-        # 检查文件是否存在
-        if not os.path.exists(file_path):
-            raise FileNotFoundError(f"文件不存在: {file_path}")
+_dataset_cache = SizedLRUCache(WATER_DATASET_CACHE_BYTES, sizeof=lambda dataset: dataset.nbytes)
+_dataset_keys = {}  # 文件绝对路径 -> 当前缓存键，文件更新后移除旧版本
+_dataset_keys_lock = threading.Lock()
 
-        # 读取 JSON 文件，显式指定编码为 utf-8
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+# 渲染好的 PNG 图表缓存（默认 64MB），键为数据集指纹 + 图表参数
+WATER_CHART_CACHE_BYTES = int(os.environ.get('WATER_CHART_CACHE_MB', 64)) * 1024 * 1024
+_chart_cache = SizedLRUCache(WATER_CHART_CACHE_BYTES, sizeof=len)
 
-        # 调试信息：打印 JSON 根级键
-        print(f"JSON 根级键: {list(data.keys())}")
+# 按日期范围可视化时在共享进程池中并行读取每日文件，设为 1 时在请求线程中读取
+WATER_RANGE_WORKERS = int(os.environ.get('WATER_RANGE_WORKERS', min(4, os.cpu_count() or 1)))
+_range_loader = ParallelWaterLoader(WATER_RANGE_WORKERS)
 
-        # 提取表头并清理列名
-        if 'thead' in data and isinstance(data['thead'], list):
-            columns = [clean_column_name(col) for col in data['thead']]
-            print(f"使用提供的表头: {columns[:5]}...")
-        else:
-            raise ValueError("JSON 中未找到 'thead' 列表")
 
-        # 提取数据记录
-        if 'tbody' in data and isinstance(data['tbody'], list):
-            records = data['tbody']
-            print(f"从键 'tbody' 中提取到 {len(records)} 条记录")
-        else:
-            raise ValueError("JSON 中未找到 'tbody' 列表")
+def dataset_fingerprint(file_path):
+    """数据文件指纹 (绝对路径, 修改时间, 大小)，文件内容变化后随之变化"""
+    stat = os.stat(file_path)
+    return os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size
 
-        # 创建 DataFrame
-        df = pd.DataFrame(records, columns=columns)
-        print(f"DataFrame 创建成功，形状: {df.shape}")
 
-        # 显示数据基本信息
-        print("数据基本信息:")
-        df.info()
+def load_water_dataset(file_path):
+    """
+    读取并清洗水质数据文件，结果按 (路径, 修改时间, 大小) 缓存
 
-        # 显示数据集行数和列数
-        rows, columns = df.shape
+    文件未变化时重复查看图表或切换 target_column 直接复用缓存，不再重新解析
 
-        if rows == 0:
-            raise ValueError("数据记录行数为0，无法进行可视化")
+    Raises:
+        FileNotFoundError: 文件不存在
+        json.JSONDecodeError / ValueError: 文件格式不正确
+    """
+    key = dataset_fingerprint(file_path)
+    path = key[0]
 
-        # 显示数据前几行信息
-        print("数据前几行信息:")
-        print(df.head().to_string())
+    dataset = _dataset_cache.get(key)
+    if dataset is not None:
+        return dataset
 
-        # 寻找日期/时间列
-        date_columns = []
-        for col in df.columns:
-            if any(keyword in col.lower() for keyword in ['date', 'time', '监测时间']):
-                date_columns.append(col)
+    dataset = _parse_water_dataset(file_path)
+    with _dataset_keys_lock:
+        old_key = _dataset_keys.get(path)
+        if old_key is not None and old_key != key:
+            _dataset_cache.pop(old_key)
+        _dataset_keys[path] = key
+    _dataset_cache.put(key, dataset)
+    return dataset
 
-        if not date_columns:
-            print("警告: 未找到日期/时间列，无法按时间序列展示数据")
-            x_column = df.index
-            x_label = "数据点索引"
-        else:
-            x_column = date_columns[0]
-            x_label = x_column
-
-            # 特殊处理监测时间列
-            if x_column == '监测时间':
-                print(f"检测到 '监测时间' 列，尝试特殊格式解析")
-
-                # 获取当前年份作为默认年份
-                current_year = pd.Timestamp.now().year
-
-                # 处理 None 值并添加年份信息
-                def parse_date(date_str):
-                    if pd.isna(date_str) or date_str is None or not isinstance(date_str, str):
-                        return None
-                    try:
-                        # 尝试解析 'MM-DD HH:MM' 格式
-                        return pd.Timestamp(f"{current_year}-{date_str}")
-                    except:
-                        return None
-
-                # 应用日期解析函数
-                df[x_column] = df[x_column].apply(parse_date)
-
-                # 检查转换后的有效日期数量
-                valid_dates = df[x_column].count()
-                if valid_dates > 0:
-                    print(f"成功转换 {valid_dates} 个日期值")
-                    # 按日期排序
-                    df = df.sort_values(x_column)
-                else:
-                    print("警告: 转换后无有效日期值，使用索引作为 x 轴")
-                    x_column = df.index
-                    x_label = "数据点索引"
+
+def _convert_numeric_columns(df, x_column):
+    """
+    把除 x 轴以外能识别出数值的列转换为 float（原地修改），返回这些列名
+
+    列式存储和 JSON 两种读取方式都用这一规则决定绘图列：存储中的参数列已是数值，
+    文本列与 JSON 单元格一样逐个按 extract_numeric 识别
+    """
+    numerical_columns = []
+
+    # 每列一次正则提取：优先 title 中的原始值，"--"、"*" 等无法识别的单元格为 NaN
+    for col in df.columns:
+        # 修正条件判断：比较列名而非整个Series
+        if col == x_column and isinstance(x_column, str):
+            continue
+
+        try:
+            converted = extract_numeric(df[col])
+
+            # 检查转换后是否有有效数值
+            valid_count = converted.count()
+            if valid_count > 0:
+                df[col] = converted
+                numerical_columns.append(col)
+                logger.debug("成功将列 '%s' 转换为数值类型，有效数值: %d/%d", col, valid_count, len(df))
             else:
-                # 尝试自动解析其他日期列
-                try:
-                    df[x_column] = pd.to_datetime(df[x_column])
-                    print(f"成功将列 '{x_column}' 转换为 datetime 类型")
-                    # 按日期排序
-                    df = df.sort_values(x_column)
-                except:
-                    print(f"警告: 无法将列 '{x_column}' 转换为 datetime 类型，保留原始格式")
-                    x_column = df.index
-                    x_label = "数据点索引"
-
-        # 提取数值列用于绘图
-        numerical_columns = []
-
-        # 特殊字符列表，遇到这些字符将被视为缺失值
-        special_chars = ['*', '-', 'nan', 'NaN', 'N/A', '无数据', '正常', '异常', '---']
-
-        # 打印数值列转换前的样本值
-        print("\n数据类型转换前的样本值:")
-        for col in df.columns:
-            sample = df[col].dropna().head(5).tolist()
-            print(f"{col}: {sample}")
-
-        # 特殊处理可能包含数值的列
-        for col in df.columns:
-            # 修正条件判断：比较列名而非整个Series
-            if col == x_column and isinstance(x_column, str):
-                continue
+                logger.debug("列 '%s' 转换后无有效数值，跳过", col)
+        except Exception as e:
+            logger.warning("列 '%s' 转换失败: %s", col, e)
 
-            try:
-                # 替换特殊字符为 NaN
-                cleaned = df[col].replace(special_chars, float('nan'))
-
-                # 移除 HTML 标签
-                cleaned = cleaned.astype(str).str.replace(r'<[^>]*>', '', regex=True)
-
-                # 移除常见的非数字字符，保留小数点和负号
-                cleaned = cleaned.str.replace(r'[^\d.-]', '', regex=True)
-
-                # 移除多余的小数点（只保留第一个）
-                def clean_decimal(s):
-                    if '.' in s:
-                        first_dot = s.index('.')
-                        return s[:first_dot] + s[first_dot:].replace('.', '', 1)
-                    return s
-
-                cleaned = cleaned.apply(clean_decimal)
-
-                # 尝试转换为数值类型
-                converted = pd.to_numeric(cleaned, errors='coerce')
-
-                # 检查转换后是否有有效数值
-                valid_count = converted.count()
-                if valid_count > 0:
-                    df[col] = converted
-                    numerical_columns.append(col)
-                    print(f"成功将列 '{col}' 转换为数值类型，有效数值: {valid_count}/{len(df)}")
-                else:
-                    print(f"列 '{col}' 转换后无有效数值，跳过")
-            except Exception as e:
-                print(f"列 '{col}' 转换失败: {str(e)}")
-
-        # 打印数值列转换后的类型
-        print("\n数据类型转换后:")
-        for col in numerical_columns:
-            print(f"{col}: {df[col].dtype}")
+    return numerical_columns
 
-        if not numerical_columns:
-            print("错误: 数据中未找到数值列，无法进行可视化")
-            print("提示: 请检查数据格式是否符合预期，特别是数值列是否包含非数字字符")
-            return None, None  # 不抛出异常，优雅地退出函数
 
+def _dataset_from_store(df, names):
+    """由列式存储读出的 DataFrame 构建数据集：列名还原为表头，数值和监测时间已是目标类型"""
+    if df.empty:
+        raise ValueError("数据记录行数为0，无法进行可视化")
 
-        # 绘制所有指标图表（默认）
-        if target_column:
-            print(target_column)
-            single_line_chart = plot_time_series(df, x_column, x_label, numerical_columns, target_column=target_column)
-        else:
-            print("NO!!!!!!!!!!!")
-            line_chart_base64 = plot_time_series(df, x_column, x_label, numerical_columns)
+    df = df.rename(columns=names)
+    x_column = names[MONITORING_AT_COLUMN]
+    if df[x_column].count() > 0:
+        df = df.sort_values(x_column)
+    else:
+        x_column = df.index
+
+    numerical_columns = _convert_numeric_columns(df, x_column)
+    return WaterDataset(
+        df=df,
+        x_column=x_column,
+        x_label=x_column if isinstance(x_column, str) else "数据点索引",
+        numerical_columns=numerical_columns,
+        nbytes=int(df.memory_usage(index=True, deep=True).sum())
+    )
+
+
+def _parse_water_dataset(file_path):
+    """解析水质 JSON 文件：清理表头、解析监测时间并把各参数列转换为数值"""
+    # 优先内存映射读取列式存储；未安装 pyarrow、尚未编译或源文件已更新时解析 JSON
+    stored, names = load_water_frame(file_path)
+    if stored is not None:
+        return _dataset_from_store(stored, names)
+
+    # 读取 JSON 文件，显式指定编码为 utf-8
+    with open(file_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    # 提取表头并清理列名
+    if 'thead' in data and isinstance(data['thead'], list):
+        columns = [clean_column_name(col) for col in data['thead']]
+    else:
+        raise ValueError("JSON 中未找到 'thead' 列表")
 
-        ##################
-        # 生成折线图数据（优化NaN处理并统一格式）
+    # 提取数据记录
+    if 'tbody' in data and isinstance(data['tbody'], list):
+        records = data['tbody']
+    else:
+        raise ValueError("JSON 中未找到 'tbody' 列表")
+
+    # 创建 DataFrame
+    df = pd.DataFrame(records, columns=columns)
+    # 显示数据集行数和列数
+    rows, columns = df.shape
+
+    if rows == 0:
+        raise ValueError("数据记录行数为0，无法进行可视化")
+
+    # 预览内容的拼接开销较大，只在开启 DEBUG 时生成
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("DataFrame 创建成功，形状: %s，前几行:\n%s", df.shape, df.head().to_string())
+
+    # 寻找日期/时间列
+    date_columns = []
+    for col in df.columns:
+        if any(keyword in col.lower() for keyword in ['date', 'time', '监测时间']):
+            date_columns.append(col)
+
+    if not date_columns:
+        logger.warning("未找到日期/时间列，无法按时间序列展示数据: %s", file_path)
+        x_column = df.index
+        x_label = "数据点索引"
+    else:
+        x_column = date_columns[0]
+        x_label = x_column
+
+        # 特殊处理监测时间列
+        if x_column == '监测时间':
+            # 文件名或目录中没有年份时使用当前年份
+            year = infer_year(file_path, default=pd.Timestamp.now().year)
+            df[x_column] = parse_monitoring_times(df[x_column], year)
+
+            # 检查转换后的有效日期数量
+            valid_dates = df[x_column].count()
+            if valid_dates > 0:
+                logger.debug("成功转换 %d 个日期值", valid_dates)
+                # 按日期排序
+                df = df.sort_values(x_column)
+            else:
+                logger.warning("转换后无有效日期值，使用索引作为 x 轴: %s", file_path)
+                x_column = df.index
+                x_label = "数据点索引"
+        else:
+            # 尝试自动解析其他日期列
+            try:
+                df[x_column] = pd.to_datetime(df[x_column])
+                logger.debug("成功将列 '%s' 转换为 datetime 类型", x_column)
+                # 按日期排序
+                df = df.sort_values(x_column)
+            except:
+                logger.warning("无法将列 '%s' 转换为 datetime 类型，保留原始格式", x_column)
+                x_column = df.index
+                x_label = "数据点索引"
+
+    # 提取数值列用于绘图
+    numerical_columns = _convert_numeric_columns(df, x_column)
+
+    return WaterDataset(
+        df=df,
+        x_column=x_column,
+        x_label=x_label,
+        numerical_columns=numerical_columns,
+        nbytes=int(df.memory_usage(index=True, deep=True).sum())
+    )
+
+
+PIE_BACKGROUND_COLORS = [
+    'rgba(255, 99, 132, 0.7)',
+    'rgba(54, 162, 235, 0.7)',
+    'rgba(255, 206, 86, 0.7)',
+    'rgba(75, 192, 192, 0.7)',
+    'rgba(153, 102, 255, 0.7)',
+    'rgba(255, 159, 64, 0.7)'
+]
+PIE_BORDER_COLORS = [
+    'rgb(255, 99, 132)',
+    'rgb(54, 162, 235)',
+    'rgb(255, 206, 86)',
+    'rgb(75, 192, 192)',
+    'rgb(153, 102, 255)',
+    'rgb(255, 159, 64)'
+]
+
+
+def _line_chart_data(df, x_column, chart_columns, single, max_points, downsample, payload_format):
+    """
+    生成折线图数据
+
+    Args:
+        df (pd.DataFrame): 已按 x 轴排序的数据
+        x_column (str | pd.Index): x 轴列名，或无时间列时的索引
+        chart_columns (list[str]): 绘制的数值列
+        single (bool): 只绘制一个指定指标（使用带填充的样式）
+        其余参数见 visualize_water_quality
+    """
+    view = df
+    if max_points and len(df) > max_points:
+        budget = max(max_points // max(len(chart_columns), 1), MIN_DOWNSAMPLE_POINTS)
+        positions = np.unique(np.concatenate([
+            downsample_indices(pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=np.float64),
+                               budget, downsample)
+            for col in chart_columns
+        ]))
+        # 指标数 × MIN_DOWNSAMPLE_POINTS 超过 max_points 时并集可能超出上限
+        positions = thin_indices(positions, max_points)
+        view = df.iloc[positions]
+        logger.debug("折线图降采样: %d -> %d 个点 (%s)", len(df), len(view), downsample)
+
+    # 生成折线图数据（优化NaN处理并统一格式）
+    x_values = view[x_column] if isinstance(x_column, str) else view.index
+    if payload_format == FORMAT_COLUMNAR:
         line_chart_data = {
-            'x': df[x_column].astype(str).tolist(),
+            'format': FORMAT_COLUMNAR,
+            'x': encode_epochs(x_values) if isinstance(x_column, str) else x_values.tolist(),
+            'x_unit': 's' if isinstance(x_column, str) else 'index',
+            'dtype': 'float32',
             'datasets': []
         }
-
-        if target_column and target_column in df.columns:
-            # 指定单一指标时
+        encode_series = encode_float32
+    else:
+        line_chart_data = {
+            'x': x_values.astype(str).tolist(),
+            'datasets': []
+        }
+        def encode_series(series):
+            return series.replace([np.nan, 'nan', 'NaN', 'N/A', '---', '无数据'], None).tolist()
+
+    if single:
+        # 指定单一指标时
+        line_chart_data['datasets'].append({
+            'label': chart_columns[0],
+            'data': encode_series(view[chart_columns[0]]),
+            'borderColor': '#1890ff',
+            'backgroundColor': 'rgba(24, 144, 255, 0.1)',
+            'borderWidth': 2,
+            'tension': 0.3,
+            'fill': True
+        })
+    else:
+        # 显示所有指标时
+        for col in chart_columns:
             line_chart_data['datasets'].append({
-                'label': target_column,
-                'data': df[target_column].replace([np.nan, 'nan', 'NaN', 'N/A', '---', '无数据'], None).tolist(),
-                'borderColor': '#1890ff',
-                'backgroundColor': 'rgba(24, 144, 255, 0.1)',
+                'label': col,
+                'data': encode_series(view[col]),
                 'borderWidth': 2,
                 'tension': 0.3,
-                'fill': True
+                'fill': False
             })
-        else:
-            # 显示所有指标时
-            for col in numerical_columns:
-                if col in df.columns:
-                    line_chart_data['datasets'].append({
-                        'label': col,
-                        'data': df[col].replace([np.nan, 'nan', 'NaN', 'N/A', '---', '无数据'], None).tolist(),
-                        'borderWidth': 2,
-                        'tension': 0.3,
-                        'fill': False
-                    })
-
-        # 生成饼图数据（优化NaN处理）
-        if '水质类别' in df.columns:
-            invalid_values = ['*', '-', 'nan', 'NaN', 'N/A', '无数据', '正常', '异常', '---', '']
-            valid_categories = df['水质类别'].replace(invalid_values, pd.NA).dropna()
-            water_quality_counts = valid_categories.value_counts(normalize=True).mul(100).round(1)  # 转换为百分比
-            pie_chart_data = {
-                'labels': water_quality_counts.index.tolist(),
-                'values': water_quality_counts.values.tolist(),
-                'backgroundColor': [
-                    'rgba(255, 99, 132, 0.7)',
-                    'rgba(54, 162, 235, 0.7)',
-                    'rgba(255, 206, 86, 0.7)',
-                    'rgba(75, 192, 192, 0.7)',
-                    'rgba(153, 102, 255, 0.7)',
-                    'rgba(255, 159, 64, 0.7)'
-                ],
-                'borderColor': [
-                    'rgb(255, 99, 132)',
-                    'rgb(54, 162, 235)',
-                    'rgb(255, 206, 86)',
-                    'rgb(75, 192, 192)',
-                    'rgb(153, 102, 255)',
-                    'rgb(255, 159, 64)'
-                ],
-                'borderWidth': 1
-            }
-        else:
-            pie_chart_data = None
+    return line_chart_data
+
+
+def _pie_chart_data(grades):
+    """生成水质类别分布饼图数据（百分比），过滤无效类别"""
+    invalid_values = ['*', '-', 'nan', 'NaN', 'N/A', '无数据', '正常', '异常', '---', '']
+    valid_categories = grades.replace(invalid_values, pd.NA).dropna()
+    water_quality_counts = valid_categories.value_counts(normalize=True).mul(100).round(1)  # 转换为百分比
+    return {
+        'labels': water_quality_counts.index.tolist(),
+        'values': water_quality_counts.values.tolist(),
+        'backgroundColor': PIE_BACKGROUND_COLORS,
+        'borderColor': PIE_BORDER_COLORS,
+        'borderWidth': 1
+    }
+
+
+def visualize_water_quality(file_path, target_column=None, max_points=None, downsample=DOWNSAMPLE_LTTB,
+                            payload_format=FORMAT_JSON):
+    """
+    生成前端绘图所需的折线图和饼图数据
+
+    Args:
+        file_path (str): 水质数据文件路径
+        target_column (str): 只返回该指标，为空时返回全部数值列
+        max_points (int): 折线图最多返回的点数，为空时返回全部点；
+                          各数据集分摊点数分别降采样（各自的峰值都会保留），
+                          共用的 x 轴取各自保留点的并集
+        downsample (str): 降采样方法，lttb 或 minmax
+        payload_format (str): json 或 columnar（epoch 秒时间轴 + base64 float32 序列，见 chart_payload）
+    """
+    try:
+        # 检查文件是否存在
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"文件不存在: {file_path}")
+
+        df, x_column, x_label, numerical_columns, _ = load_water_dataset(file_path)
+
+        if not numerical_columns:
+            logger.error("数据中未找到数值列，无法进行可视化，请检查数值列是否包含非数字字符: %s", file_path)
+            return None, None  # 不抛出异常，优雅地退出函数
+
+        # 静态 PNG 图表由 render_water_chart 按需渲染，这里只生成前端绘图所需的数据
+        single = bool(target_column and target_column in df.columns)
+        chart_columns = [target_column] if single else [col for col in numerical_columns if col in df.columns]
+        line_chart_data = _line_chart_data(df, x_column, chart_columns, single, max_points, downsample,
+                                           payload_format)
+        pie_chart_data = _pie_chart_data(df['水质类别']) if '水质类别' in df.columns else None
 
         return line_chart_data, pie_chart_data
 
@@ -302,77 +402,117 @@ def visualize_water_quality(file_path, target_column=None):
         #         return line_chart_base64, None
 
     except FileNotFoundError as e:
-        print(f"错误: {e}")
+        logger.error("%s", e)
         return None, None
     except json.JSONDecodeError:
-        print("错误: 无法解析 JSON 文件，请检查文件格式")
+        logger.error("无法解析 JSON 文件，请检查文件格式: %s", file_path)
         return None, None
     except Exception as e:
-        print(f"错误: 发生了一个未知错误: {e}")
-        # 打印详细的错误堆栈信息，帮助定位问题
-        import traceback
-        traceback.print_exc()
+        logger.exception("水质数据可视化发生未知错误: %s", e)
+        return None, None
+
+
+def visualize_water_range(start_date, end_date, section_names=None, target_column=None, max_points=None,
+                          downsample=DOWNSAMPLE_LTTB, payload_format=FORMAT_JSON, data_dir=None):
+    """
+    按日期范围和断面生成折线图和饼图数据（跨多个每日文件）
+
+    日期范围内的文件在进程池中并行读取并按断面过滤，拼接后按监测时间聚合为一条时间序列：
+    未指定断面或只有一个断面时每个指标一条折线（多个断面取平均值）；
+    多个断面时每个 (断面, 指标) 一条折线，标签为 "断面 指标"
+
+    Args:
+        start_date / end_date (datetime.date): 闭区间
+        section_names (list[str]): 断面名称，为空时使用全部断面
+        其余参数见 visualize_water_quality
+
+    Returns:
+        tuple: (折线图数据, 饼图数据)；范围内没有匹配的数据时为 (None, None)
+    """
+    files = list_water_files(start_date, end_date, data_dir=data_dir)
+    if not files:
+        logger.warning("日期范围内没有水质数据文件: %s ~ %s", start_date, end_date)
+        return None, None
+
+    df, names = _range_loader.load(files, section_names or None)
+    x_column = names[MONITORING_AT_COLUMN] if names else None
+    df = df.dropna(subset=[MONITORING_AT_COLUMN])
+    if df.empty:
+        logger.warning("日期范围内没有匹配断面的数据: %s ~ %s, %s", start_date, end_date, section_names)
+        return None, None
+    df = df.rename(columns=names)
+
+    parameters = [names[col] for col in PARAMETER_COLUMNS]
+    if target_column in parameters:
+        parameters = [target_column]
+    section_column = names['section_name']
+    sections = df[section_column].unique()
+
+    if section_names and len(sections) > 1:
+        series = df.groupby([x_column, section_column])[parameters].mean().unstack(section_column)
+        series.columns = [f"{section} {parameter}" for parameter, section in series.columns]
+    else:
+        series = df.groupby(x_column)[parameters].mean()
+    series = series.dropna(axis=1, how='all').reset_index()
+
+    chart_columns = [col for col in series.columns if col != x_column]
+    if not chart_columns:
+        logger.warning("日期范围内没有有效的数值: %s ~ %s", start_date, end_date)
+        return None, None
+
+    single = target_column in parameters and len(chart_columns) == 1
+    line_chart_data = _line_chart_data(series, x_column, chart_columns, single, max_points, downsample,
+                                       payload_format)
+    pie_chart_data = _pie_chart_data(df[names['water_grade']])
+    logger.debug("日期范围 %s ~ %s: %d 个文件, %d 行, %d 个时间点",
+                 start_date, end_date, len(files), len(df), len(series))
+    return line_chart_data, pie_chart_data
+
+
+def render_water_chart(file_path, target_column=None):
+    """
+    返回水质指标折线图 PNG，优先从图表缓存中取
+
+    缓存键为 (dataset_fingerprint(file_path), target_column)：指纹是文件的
+    (绝对路径, 修改时间, 大小)，文件变化后旧图自然失效；target_column 不是数值列时
+    按 None（绘制全部指标）处理，因此等价的请求共用同一张图。缓存未命中时经
+    plot_time_series 在渲染进程池中绘制并写入缓存（按 PNG 字节数限制总大小）
+
+    Returns:
+        tuple: (png, etag)。png 为 PNG 字节；etag 为缓存键的 SHA-1，同一文件版本和
+        指标的图表 ETag 相同，可用于 If-None-Match 返回 304。
+        数据中没有数值列时返回 (None, None)
+
+    Raises:
+        FileNotFoundError: 文件不存在
+    """
+    fingerprint = dataset_fingerprint(file_path)
+    dataset = load_water_dataset(file_path)
+    if not dataset.numerical_columns:
         return None, None
+    if target_column not in dataset.numerical_columns:
+        target_column = None
+
+    key = (fingerprint, target_column)
+    etag = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+    png = _chart_cache.get(key)
+    if png is None:
+        png = plot_time_series(
+            dataset.df, dataset.x_column, dataset.x_label, dataset.numerical_columns, target_column=target_column
+        )
+        _chart_cache.put(key, png)
+    return png, etag
 
 
 # 绘制每个数值列随时间的变化（支持单指标显示）
 def plot_time_series(df, x_column, x_label, numerical_columns, target_column=None):
-    plt.figure(figsize=(12, 8))
-    print(numerical_columns)
-    if target_column and target_column in numerical_columns:
-        # 单独显示单个指标
-        n_plots = 1
-        n_rows, n_cols = 1, 1
-        col = target_column
-        plt.subplot(n_rows, n_cols, 1)
-
-        x_data = df[x_column] if isinstance(x_column, str) else df.index
-        y_data = df[col]
-        mask = y_data.notna()
-        x_data = x_data[mask]
-        y_data = y_data[mask]
-
-        if len(x_data) > 0 and len(y_data) > 0:
-            plt.plot(x_data, y_data, marker='o', linestyle='-', color='blue')
-            plt.title(f"{col} 随时间的变化")
-            plt.xlabel(x_label)
-            plt.ylabel(col)
-            plt.grid(True)
-        else:
-            plt.text(0.5, 0.5, '无有效数据', ha='center', va='center')
-            plt.title(f"{col} (无有效数据)")
+    """绘制指标随时间变化的折线图，返回 PNG 字节（在渲染进程池中执行）"""
+    columns = [target_column] if target_column and target_column in numerical_columns else numerical_columns
+    if isinstance(x_column, str):
+        data = df[[x_column] + columns]
     else:
-        # 显示所有指标（原有逻辑）
-        n_plots = len(numerical_columns)
-        n_rows = (n_plots + 1) // 2
-        n_cols = min(2, n_plots)
-
-        for i, col in enumerate(numerical_columns, 1):
-            plt.subplot(n_rows, n_cols, i)
-            x_data = df[x_column] if isinstance(x_column, str) else df.index
-            y_data = df[col]
-            mask = y_data.notna()
-            x_data = x_data[mask]
-            y_data = y_data[mask]
-
-            if len(x_data) > 0 and len(y_data) > 0:
-                plt.plot(x_data, y_data)
-                plt.title(f"{col} 随时间的变化")
-                plt.xlabel(x_label)
-                plt.ylabel(col)
-                plt.grid(True)
-            else:
-                plt.text(0.5, 0.5, '无有效数据', ha='center', va='center')
-                plt.title(f"{col} (无有效数据)")
-
-    # 保存图表到内存
-    buffer = BytesIO()
-    plt.tight_layout()
-    plt.savefig(buffer, format='png')
-    buffer.seek(0)
-    chart_data = base64.b64encode(buffer.getvalue()).decode('utf-8')
-    plt.close()
-    return chart_data
+        data = df[columns]
+    return render_pool.render(render_time_series, data, x_column, x_label, numerical_columns, target_column)
 
 
 #########################################鱼类
@@ -382,41 +522,19 @@ def read_fish_data(file_path):
         df = pd.read_csv(file_path)
         return df
     except FileNotFoundError:
-        print(f"文件不存在: {file_path}")
+        logger.error("文件不存在: %s", file_path)
         return None
 
+def _png_to_base64(png):
+    return base64.b64encode(png).decode('utf-8') if png is not None else None
+
 # 生成柱状图，展示每种鱼类的平均重量
 def generate_bar_chart(df):
-    average_weight = df.groupby('Species')['Weight(g)'].mean()
-    plt.figure(figsize=(8, 6))
-    average_weight.plot(kind='bar')
-    plt.title('每种鱼类的平均重量')
-    plt.xlabel('鱼类种类')
-    plt.ylabel('平均重量 (g)')
-
-    buffer = BytesIO()
-    plt.savefig(buffer, format='png')
-    buffer.seek(0)
-    chart_data = base64.b64encode(buffer.getvalue()).decode('utf-8')
-    plt.close()
-
-    return chart_data
+    return _png_to_base64(render_pool.render(render_bar_chart, df[['Species', 'Weight(g)']]))
 
 # 生成散点图，展示鱼类的长度和宽度关系
 def generate_scatter_chart(df):
-    plt.figure(figsize=(8, 6))
-    plt.scatter(df['Length1(cm)'], df['Width(cm)'])
-    plt.title('鱼类的长度和宽度关系')
-    plt.xlabel('长度 (cm)')
-    plt.ylabel('宽度 (cm)')
-
-    buffer = BytesIO()
-    plt.savefig(buffer, format='png')
-    buffer.seek(0)
-    chart_data = base64.b64encode(buffer.getvalue()).decode('utf-8')
-    plt.close()
-
-    return chart_data
+    return _png_to_base64(render_pool.render(render_scatter_chart, df[['Length1(cm)', 'Width(cm)']]))
 
 
 def generate_single_species_scatter(df, species_name):
@@ -426,38 +544,12 @@ def generate_single_species_scatter(df, species_name):
 
     # 检查是否有数据
     if species_data.empty:
-        print(f"错误: 未找到种类为 '{species_name}' 的鱼数据")
+        logger.warning("未找到种类为 '%s' 的鱼数据", species_name)
         return None
 
-    # 计算相关系数
-    correlation = species_data['Length1(cm)'].corr(species_data['Width(cm)'])
-
-    # 创建散点图并添加回归线
-    plt.figure(figsize=(10, 7))
-    sns.regplot(x='Length1(cm)', y='Width(cm)', data=species_data,
-                scatter_kws={'alpha': 0.6, 'color': 'dodgerblue'},
-                line_kws={'color': 'crimson'})
-
-    # 添加标题和标签，包括相关系数
-    plt.title(f"{species_name} 的长度和宽度关系 (相关系数: {correlation:.2f})", fontsize=14)
-    plt.xlabel('长度 (cm)', fontsize=12)
-    plt.ylabel('宽度 (cm)', fontsize=12)
-    plt.grid(True, linestyle='--', alpha=0.7)
-
-    # 添加数据统计信息
-    plt.figtext(0.15, 0.01,
-                f"样本数量: {len(species_data)} | 平均长度: {species_data['Length1(cm)'].mean():.2f} cm | 平均宽度: {species_data['Width(cm)'].mean():.2f} cm",
-                fontsize=10, ha='left')
-
-    # 保存图表到内存并转换为Base64
-    buffer = BytesIO()
-    plt.tight_layout()
-    plt.savefig(buffer, format='png', dpi=300)
-    buffer.seek(0)
-    chart_data = base64.b64encode(buffer.getvalue()).decode('utf-8')
-    plt.close()
-
-    return chart_data
+    return _png_to_base64(render_pool.render(
+        render_single_species_scatter, species_data[['Length1(cm)', 'Width(cm)']], species_name
+    ))
 
 
 ############################name
@@ -467,7 +559,7 @@ def read_water_quality_data(file_path):
         df = pd.read_csv(file_path)
         return df
     except FileNotFoundError:
-        print(f"文件不存在: {file_path}")
+        logger.error("文件不存在: %s", file_path)
         return None
 
 
@@ -481,27 +573,16 @@ def generate_water_quality_pie_chart(df):
 
     # 如果没有有效数据，返回None
     if quality_counts.empty:
-        print("没有有效水质类别数据用于生成饼图")
+        logger.warning("没有有效水质类别数据用于生成饼图")
         return None
 
-    plt.figure(figsize=(8, 6))
-    plt.pie(quality_counts, labels=quality_counts.index, autopct='%1.1f%%', startangle=90)
-    plt.title('水质类别分布')
-    plt.axis('equal')  # 使饼图为正圆形
-
-    buffer = BytesIO()
-    plt.savefig(buffer, format='png')
-    buffer.seek(0)
-    chart_data = base64.b64encode(buffer.getvalue()).decode('utf-8')
-    plt.close()
-
-    return chart_data
+    return _png_to_base64(render_pool.render(render_water_quality_pie_chart, quality_counts))
 
 
 # 生成不同时间的溶解氧变化趋势图
 def generate_dissolved_oxygen_trend(df):
     if '监测时间' not in df.columns or '溶解氧(mg/L)' not in df.columns:
-        print("数据中缺少监测时间列或溶解氧列")
+        logger.warning("数据中缺少监测时间列或溶解氧列")
         return None
 
     # 获取当前年份
@@ -518,43 +599,12 @@ def generate_dissolved_oxygen_trend(df):
     df = df.dropna(subset=['监测时间', '溶解氧(mg/L)'])
 
     if len(df) == 0:
-        print("没有足够的有效数据绘制图表")
+        logger.warning("没有足够的有效数据绘制图表")
         return None
 
-    plt.figure(figsize=(12, 6))
-    plt.plot(df['监测时间'], df['溶解氧(mg/L)'], marker='o', linestyle='-', color='b')
-    plt.title('溶解氧随时间变化趋势')
-    plt.xlabel('监测时间')
-    plt.ylabel('溶解氧(mg/L)')
-    plt.xticks(rotation=45)
-    plt.grid(True, linestyle='--', alpha=0.7)
-    # 设置横坐标显示格式，确保年份显示
-    import matplotlib.dates as mdates
-    plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d %H:%M'))
-
-    buffer = BytesIO()
-    plt.tight_layout()
-    plt.savefig(buffer, format='png')
-    buffer.seek(0)
-    chart_data = base64.b64encode(buffer.getvalue()).decode('utf-8')
-    plt.close()
-
-    return chart_data
+    return _png_to_base64(render_pool.render(render_dissolved_oxygen_trend, df[['监测时间', '溶解氧(mg/L)']]))
 
 
 # 生成 pH 值分布直方图
 def generate_ph_histogram(df):
-    plt.figure(figsize=(8, 6))
-    plt.hist(df['pH(无量纲)'], bins=10, alpha=0.7)
-    plt.title('pH 值分布')
-    plt.xlabel('pH 值')
-    plt.ylabel('频次')
-    plt.grid(True, linestyle='--', alpha=0.7)
-
-    buffer = BytesIO()
-    plt.savefig(buffer, format='png')
-    buffer.seek(0)
-    chart_data = base64.b64encode(buffer.getvalue()).decode('utf-8')
-    plt.close()
-
-    return chart_data
+    return _png_to_base64(render_pool.render(render_ph_histogram, df['pH(无量纲)']))
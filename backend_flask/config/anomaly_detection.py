@@ -0,0 +1,446 @@
+"""
+水质异常检测引擎
+将水质参数按列加载为 NumPy 数组，与阈值上下限向量一次性比较，
+只为超出阈值的记录构建返回给前端的 JSON 结构
+"""
+
+import datetime
+from itertools import chain
+from operator import itemgetter
+
+import numpy as np
+
+# 参与异常检测的水质参数列（与 water_quality 表字段、anomaly_thresholds.parameter 一致）
+PARAMETER_COLUMNS = [
+    'water_temp',
+    'ph',
+    'dissolved_oxygen',
+    'conductivity',
+    'turbidity',
+    'cod_mn',
+    'ammonia_nitrogen',
+    'total_phosphorus',
+    'total_nitrogen',
+    'chla',
+    'algae_density'
+]
+
+
+def format_water_quality_value(value):
+    """优化后的水质参数值格式化函数"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        stripped = value.strip()
+        if not stripped:
+            return None
+        try:
+            return float(stripped)
+        except ValueError:
+            return stripped  # 保留原始字符串（如"异常"等描述）
+    return float(value) if not isinstance(value, bool) else None
+
+
+def build_threshold_vectors(thresholds, columns=PARAMETER_COLUMNS):
+    """
+    根据 anomaly_thresholds 表的记录构建阈值向量
+
+    Args:
+        thresholds (list[dict]): anomaly_thresholds 表的查询结果
+        columns (list[str]): 参数列顺序
+
+    Returns:
+        tuple: (参与检测的列名列表, 下限数组, 上限数组)，
+               未配置的上下限分别用 -inf / inf 表示
+    """
+    threshold_map = {t['parameter']: t for t in thresholds}
+    active_columns = [col for col in columns if col in threshold_map]
+
+    lower = np.array([
+        threshold_map[col]['lower_threshold'] for col in active_columns
+    ], dtype=float).reshape(-1)
+    upper = np.array([
+        threshold_map[col]['upper_threshold'] for col in active_columns
+    ], dtype=float).reshape(-1)
+    lower[np.isnan(lower)] = -np.inf
+    upper[np.isnan(upper)] = np.inf
+
+    return active_columns, lower, upper
+
+
+def load_parameter_matrix(records, columns):
+    """
+    将记录中的参数列加载为 (记录数, 参数数) 的浮点矩阵，缺失值为 NaN
+
+    各行的参数值先展平为一维列表，由 NumPy 在 C 层一次转换后再还原形状，
+    不为每行创建元组数组。查询通过 select_parameter_columns 让数据库返回 DOUBLE，
+    这里拿到的已是 float / None；Decimal 同样可以转换，但逐个转换的开销远大于比较本身。
+    只有遇到无法转换的字符串时才退回逐值解析
+
+    Returns:
+        tuple: (浮点矩阵, 是否所有值都能直接转换为浮点数)
+    """
+    if not records or not columns:
+        return np.empty((len(records), len(columns)), dtype=float), True
+
+    getter = itemgetter(*columns)
+    if len(columns) == 1:
+        flat = list(map(getter, records))
+    else:
+        flat = list(chain.from_iterable(map(getter, records)))
+
+    try:
+        return np.array(flat, dtype=float).reshape(len(records), len(columns)), True
+    except (ValueError, TypeError):
+        def to_float(value):
+            formatted = format_water_quality_value(value)
+            return formatted if isinstance(formatted, float) else np.nan
+
+        return np.array([to_float(v) for v in flat], dtype=float).reshape(len(records), len(columns)), False
+
+
+def find_violations(matrix, lower, upper):
+    """返回布尔矩阵，标记每个值是否超出 [lower, upper]（NaN 不视为异常）"""
+    with np.errstate(invalid='ignore'):
+        return (matrix < lower) | (matrix > upper)
+
+
+def detect_anomalies(records, thresholds, columns=PARAMETER_COLUMNS):
+    """
+    对一批水质记录执行阈值异常检测
+
+    Args:
+        records (list[dict]): water_quality 记录
+        thresholds (list[dict]): anomaly_thresholds 记录
+        columns (list[str]): 参与检测的参数列
+
+    Returns:
+        list[dict]: 异常记录列表，格式与 /api/water-quality/detect-anomalies 的 anomalies 一致
+    """
+    if not records:
+        return []
+
+    active_columns, lower, upper = build_threshold_vectors(thresholds, columns)
+    if not active_columns:
+        return []
+
+    matrix, all_numeric = load_parameter_matrix(records, active_columns)
+    violations = find_violations(matrix, lower, upper)
+    anomalous_rows = np.flatnonzero(violations.any(axis=1))
+    if not len(anomalous_rows):
+        return []
+
+    # 只把异常行转换回 Python 对象，原因字符串的固定部分按列预先拼好
+    prefixes = [f"{col}值" for col in active_columns]
+    suffixes = [
+        f"超出阈值[{_bound(lo)}, {_bound(up)}]" for lo, up in zip(lower.tolist(), upper.tolist())
+    ]
+    column_indexes = range(len(active_columns))
+    values = matrix[anomalous_rows].tolist()
+    flags = violations[anomalous_rows].tolist()
+
+    anomalies = []
+    for i, row_values, row_flags in zip(anomalous_rows.tolist(), values, flags):
+        record = records[i]
+        if all_numeric:
+            parameters = dict(zip(active_columns, [None if v != v else v for v in row_values]))
+        else:
+            parameters = {col: format_water_quality_value(record.get(col)) for col in active_columns}
+
+        anomalies.append({
+            "record_id": record["record_id"],
+            "site_id": record["site_id"],
+            "monitoring_date": str(record["monitoring_date"]),
+            "monitoring_time": str(record["monitoring_time"]) if record["monitoring_time"] else "",
+            "section_name": record["section_name"],
+            "anomaly_reasons": [
+                f"{prefixes[j]}{row_values[j]}{suffixes[j]}" for j in column_indexes if row_flags[j]
+            ],
+            "parameters": parameters
+        })
+    return anomalies
+
+
+def _bound(value):
+    """将阈值还原为数据库中的表示（无穷大视为未设置）"""
+    return None if value in (np.inf, -np.inf) else value
+
+
+# ======================
+# SQL 查询构建
+# ======================
+
+# 构建异常记录响应所需的非参数字段
+RECORD_COLUMNS = ['record_id', 'site_id', 'monitoring_date', 'monitoring_time', 'section_name']
+
+# 异常记录的来源：实时按阈值筛选 / 读取导入时维护的物化表
+SOURCE_LIVE = 'live'
+SOURCE_MATERIALIZED = 'materialized'
+ANOMALY_SOURCES = (SOURCE_LIVE, SOURCE_MATERIALIZED)
+
+
+def select_parameter_columns(columns):
+    """
+    参数列的 SELECT 表达式：DECIMAL 列加上 0E0 由数据库转换为 DOUBLE，仍以原列名返回
+
+    驱动对 DOUBLE 直接返回 float，避免在 Python 中逐个创建并转换 Decimal；
+    两种方式都是把十进制值舍入到最接近的双精度浮点数，检测结果不变
+    """
+    return [f"{col} + 0E0 AS {col}" for col in columns]
+
+
+def build_filter_conditions(start_date=None, end_date=None, site_id=None, table_alias=None,
+                            site_range=None, windows=None):
+    """
+    构建日期范围和监测点的过滤条件（命中 (site_id, monitoring_date) 复合索引）
+
+    site_range 为 (起始 site_id, 结束 site_id) 闭区间，用于按监测点范围划分分区；
+    windows 为 parse_windows 返回的多个 (监测点, 日期范围) 窗口，记录满足任一窗口即可
+    """
+    prefix = f"{table_alias}." if table_alias else ""
+    conditions = []
+    params = []
+
+    if site_id:
+        conditions.append(f"{prefix}site_id = %s")
+        params.append(site_id)
+    if site_range is not None:
+        conditions.append(f"{prefix}site_id BETWEEN %s AND %s")
+        params.extend(site_range)
+    if start_date:
+        conditions.append(f"{prefix}monitoring_date >= %s")
+        params.append(start_date)
+    if end_date:
+        conditions.append(f"{prefix}monitoring_date <= %s")
+        params.append(end_date)
+    if windows:
+        window_condition, window_params = build_window_condition(windows, table_alias)
+        conditions.append(window_condition)
+        params.extend(window_params)
+
+    return conditions, params
+
+
+def parse_windows(raw_windows):
+    """
+    校验批量检测的窗口列表，日期统一为 YYYY-MM-DD
+
+    Args:
+        raw_windows (list[dict]): [{site_id, start_date, end_date}, ...]，日期可省略
+
+    Raises:
+        ValueError: 窗口格式不正确
+    """
+    if not isinstance(raw_windows, list) or not raw_windows:
+        raise ValueError("windows 必须为非空列表")
+
+    windows = []
+    for i, raw in enumerate(raw_windows):
+        if not isinstance(raw, dict):
+            raise ValueError(f"第 {i + 1} 个窗口格式不正确")
+        try:
+            site_id = int(raw.get('site_id'))
+        except (TypeError, ValueError):
+            raise ValueError(f"第 {i + 1} 个窗口缺少有效的 site_id")
+
+        window = {'site_id': site_id}
+        for key in ('start_date', 'end_date'):
+            value = raw.get(key)
+            try:
+                window[key] = datetime.date.fromisoformat(str(value)[:10]).isoformat() if value else None
+            except ValueError:
+                raise ValueError(f"第 {i + 1} 个窗口的 {key} 不是 YYYY-MM-DD 格式")
+        windows.append(window)
+    return windows
+
+
+def build_window_condition(windows, table_alias=None):
+    """
+    构建多个窗口的过滤条件：site_id IN (...) AND ((窗口1) OR (窗口2) ...)
+
+    site_id IN 让数据库只在涉及的监测点上做索引范围扫描，
+    再由各窗口自己的日期范围精确筛选
+    """
+    prefix = f"{table_alias}." if table_alias else ""
+    site_ids = sorted({w['site_id'] for w in windows})
+    params = list(site_ids)
+
+    clauses = []
+    for window in windows:
+        clause, clause_params = _window_clause(window, prefix)
+        clauses.append(clause)
+        params.extend(clause_params)
+
+    condition = (
+        f"{prefix}site_id IN ({', '.join(['%s'] * len(site_ids))})"
+        f" AND ({' OR '.join(clauses)})"
+    )
+    return condition, params
+
+
+def _window_clause(window, prefix=""):
+    """单个窗口的条件，例如 (site_id = %s AND monitoring_date >= %s AND monitoring_date <= %s)"""
+    parts = [f"{prefix}site_id = %s"]
+    params = [window['site_id']]
+    if window.get('start_date'):
+        parts.append(f"{prefix}monitoring_date >= %s")
+        params.append(window['start_date'])
+    if window.get('end_date'):
+        parts.append(f"{prefix}monitoring_date <= %s")
+        params.append(window['end_date'])
+    return "(" + " AND ".join(parts) + ")", params
+
+
+def build_violation_predicate(thresholds, columns=PARAMETER_COLUMNS):
+    """
+    将阈值转换为 SQL 谓词，例如 (ph < %s OR ph > %s) OR (...)
+
+    参数名只取自 PARAMETER_COLUMNS 白名单，阈值通过占位符传入；
+    未设置的上限或下限不生成对应条件，NULL 值在 SQL 中天然不满足比较
+
+    Returns:
+        tuple: (谓词字符串, 参数列表)，没有任何可用阈值时谓词为 None
+    """
+    threshold_map = {t['parameter']: t for t in thresholds}
+    clauses = []
+    params = []
+
+    for col in columns:
+        threshold = threshold_map.get(col)
+        if threshold is None:
+            continue
+
+        bounds = []
+        if threshold['lower_threshold'] is not None:
+            bounds.append(f"{col} < %s")
+            params.append(threshold['lower_threshold'])
+        if threshold['upper_threshold'] is not None:
+            bounds.append(f"{col} > %s")
+            params.append(threshold['upper_threshold'])
+        if bounds:
+            clauses.append("(" + " OR ".join(bounds) + ")")
+
+    if not clauses:
+        return None, []
+    return " OR ".join(clauses), params
+
+
+def build_materialized_predicate(start_date=None, end_date=None, site_id=None, site_range=None,
+                                 windows=None):
+    """构建从 water_quality_anomalies 物化表查找异常记录 ID 的谓词"""
+    conditions, params = build_filter_conditions(start_date, end_date, site_id, table_alias='a',
+                                                 site_range=site_range, windows=windows)
+    subquery = "SELECT a.record_id FROM water_quality_anomalies a"
+    if conditions:
+        subquery += " WHERE " + " AND ".join(conditions)
+    return f"record_id IN ({subquery})", params
+
+
+def build_anomaly_query(thresholds, start_date=None, end_date=None, site_id=None,
+                        after_record_id=None, limit=None, source=SOURCE_LIVE,
+                        site_range=None, windows=None, columns=PARAMETER_COLUMNS):
+    """
+    构建只返回超出阈值记录的查询，只选取响应需要的字段
+
+    after_record_id 和 limit 用于基于 record_id 的键集分页（keyset pagination）：
+    下一页从上一页最后一条记录的 record_id 之后开始读取
+
+    source 为 SOURCE_LIVE 时按阈值条件实时筛选；为 SOURCE_MATERIALIZED 时
+    从导入时维护的 water_quality_anomalies 表按索引查找异常记录
+
+    Returns:
+        tuple: (SQL, 参数列表)，没有可用阈值时返回 (None, [])
+    """
+    if source == SOURCE_MATERIALIZED:
+        if not any(t['parameter'] in columns for t in thresholds):
+            return None, []
+        predicate, predicate_params = build_materialized_predicate(start_date, end_date, site_id,
+                                                                   site_range, windows)
+    else:
+        predicate, predicate_params = build_violation_predicate(thresholds, columns)
+    if predicate is None:
+        return None, []
+
+    threshold_parameters = {t['parameter'] for t in thresholds}
+    select_columns = RECORD_COLUMNS + select_parameter_columns(
+        [col for col in columns if col in threshold_parameters]
+    )
+
+    conditions, params = build_filter_conditions(start_date, end_date, site_id, site_range=site_range,
+                                                 windows=windows)
+    if after_record_id is not None:
+        conditions.append("record_id > %s")
+        params.append(after_record_id)
+    conditions.append(f"({predicate})")
+    params.extend(predicate_params)
+
+    query = (
+        f"SELECT {', '.join(select_columns)} FROM water_quality"
+        f" WHERE {' AND '.join(conditions)}"
+        " ORDER BY record_id"
+    )
+    if limit is not None:
+        query += " LIMIT %s"
+        params.append(limit)
+    return query, params
+
+
+def build_count_query(start_date=None, end_date=None, site_id=None):
+    """构建统计时间窗口内记录总数的查询"""
+    conditions, params = build_filter_conditions(start_date, end_date, site_id)
+    query = "SELECT COUNT(*) AS total_records FROM water_quality"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    return query, params
+
+
+def build_window_count_query(windows):
+    """
+    构建一次扫描统计每个窗口记录数的查询，第 i 个窗口的计数列名为 window_i
+    """
+    sums = []
+    params = []
+    for i, window in enumerate(windows):
+        clause, clause_params = _window_clause(window)
+        sums.append(f"SUM({clause}) AS window_{i}")
+        params.extend(clause_params)
+
+    condition, condition_params = build_window_condition(windows)
+    query = f"SELECT {', '.join(sums)} FROM water_quality WHERE {condition}"
+    return query, params + condition_params
+
+
+def group_anomalies_by_window(anomalies, windows):
+    """
+    把一次查询得到的异常记录分配到各个窗口（窗口重叠时同一条记录会出现在多个窗口中）
+
+    Returns:
+        list[list[dict]]: 与 windows 顺序一致的异常记录列表
+    """
+    by_site = {}
+    for anomaly in anomalies:
+        by_site.setdefault(anomaly['site_id'], []).append(anomaly)
+
+    grouped = []
+    for window in windows:
+        start = window.get('start_date')
+        end = window.get('end_date')
+        grouped.append([
+            anomaly for anomaly in by_site.get(window['site_id'], [])
+            if (not start or anomaly['monitoring_date'] >= start)
+            and (not end or anomaly['monitoring_date'] <= end)
+        ])
+    return grouped
+
+
+def iter_anomalies(cursor, thresholds, batch_size=1000):
+    """
+    从已执行查询的数据库游标中分批读取记录并逐条产出异常
+
+    配合非缓冲（服务端）游标使用时，内存中最多只保留 batch_size 条记录
+    """
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        yield from detect_anomalies(rows, thresholds)
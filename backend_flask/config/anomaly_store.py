@@ -0,0 +1,127 @@
+"""
+水质异常物化表维护
+water_quality_anomalies 表按 (记录, 参数) 保存超出阈值的监测值：
+导入数据时只对新插入的记录增量计算，阈值修改时只重算对应参数，
+异常检测接口据此做索引查找而不必重新评估全部历史数据
+
+命令行回填（在 backend_flask 目录下）:
+    python -m config.anomaly_store
+"""
+
+from config.anomaly_detection import PARAMETER_COLUMNS
+
+# 单个参数的异常筛选语句，参数名作为占位符传入，列名来自 PARAMETER_COLUMNS 白名单
+_SELECT_VIOLATIONS = """
+SELECT w.record_id, t.parameter, w.site_id, w.monitoring_date, w.{column},
+       t.lower_threshold, t.upper_threshold
+FROM water_quality w
+JOIN anomaly_thresholds t ON t.parameter = %s
+WHERE (w.{column} < t.lower_threshold OR w.{column} > t.upper_threshold)
+"""
+
+_INSERT_PREFIX = """
+INSERT INTO water_quality_anomalies
+    (record_id, parameter, site_id, monitoring_date, value, lower_threshold, upper_threshold)
+"""
+
+_ON_DUPLICATE = """
+ON DUPLICATE KEY UPDATE
+    value = VALUES(value),
+    lower_threshold = VALUES(lower_threshold),
+    upper_threshold = VALUES(upper_threshold)
+"""
+
+
+def _violation_select(column, extra_conditions=""):
+    """构建某个参数的异常筛选子查询"""
+    if column not in PARAMETER_COLUMNS:
+        raise ValueError(f"未知的水质参数: {column}")
+    return _SELECT_VIOLATIONS.format(column=column) + extra_conditions
+
+
+def materialize_records(cursor, original_file, min_record_id=None, parameters=PARAMETER_COLUMNS):
+    """
+    为某个文件新导入的 water_quality 记录计算异常并写入物化表
+
+    按 original_file 选出记录，不假设一次多行 INSERT 得到连续的 ID
+    （innodb_autoinc_lock_mode=2 时并发导入的 ID 会交错）。同一文件后插入的记录 ID 更大，
+    min_record_id 传入第一次 INSERT 的 lastrowid，即可跳过该文件以前导入过的记录；
+    写入是幂等的，同一记录重复计算只会覆盖原有条目
+
+    Args:
+        cursor: 数据库游标（由调用方负责提交事务）
+        original_file (str): 记录的来源文件（water_quality.original_file）
+        min_record_id (int): 本次导入的第一条记录 ID，为 None 时处理该文件的全部记录
+        parameters (list[str]): 需要计算的参数
+
+    Returns:
+        int: 受影响的行数
+    """
+    extra = " AND w.original_file = %s"
+    extra_params = [original_file]
+    if min_record_id is not None:
+        extra += " AND w.record_id >= %s"
+        extra_params.append(min_record_id)
+
+    selects = []
+    params = []
+    for column in parameters:
+        selects.append(_violation_select(column, extra))
+        params.append(column)
+        params.extend(extra_params)
+
+    if not selects:
+        return 0
+
+    # UNION 结果包成派生表后再配合 ON DUPLICATE KEY UPDATE，重复计算同一记录时保持幂等
+    query = (
+        _INSERT_PREFIX
+        + "SELECT * FROM (" + " UNION ALL ".join(selects) + ") AS violations"
+        + _ON_DUPLICATE
+    )
+    cursor.execute(query, params)
+    return cursor.rowcount
+
+
+def recompute_parameter(cursor, parameter):
+    """
+    阈值修改后重算单个参数的异常条目，其他参数不受影响
+
+    Returns:
+        int: 重算后该参数的异常条目数
+    """
+    select = _violation_select(parameter)
+    cursor.execute("DELETE FROM water_quality_anomalies WHERE parameter = %s", (parameter,))
+    cursor.execute(_INSERT_PREFIX + select, (parameter,))
+    return cursor.rowcount
+
+
+def rebuild_all(cursor, parameters=PARAMETER_COLUMNS):
+    """按当前阈值重建整张物化表（用于首次部署时回填历史数据）"""
+    return {parameter: recompute_parameter(cursor, parameter) for parameter in parameters}
+
+
+if __name__ == "__main__":
+    import os
+    import mysql.connector
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    conn = mysql.connector.connect(
+        host=os.environ.get('MYSQL_HOST', 'localhost'),
+        user=os.environ.get('MYSQL_USER', 'root'),
+        password=os.environ.get('MYSQL_PASSWORD', '123456'),
+        database=os.environ.get('MYSQL_DATABASE', 'water_quality_monitoring')
+    )
+    cursor = conn.cursor()
+    try:
+        counts = rebuild_all(cursor)
+        conn.commit()
+        for parameter, count in counts.items():
+            print(f"{parameter}: {count} 条异常")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
@@ -0,0 +1,173 @@
+"""
+水质异常汇总统计
+按监测点 / 参数 / 时间段统计异常数量，全部在数据库中 GROUP BY 完成，
+接口只返回分组计数而不是每条异常记录
+
+- live（默认）: 对 water_quality 用条件求和 SUM(col < 下限 OR col > 上限) 按当前阈值实时统计
+- materialized: 对 water_quality_anomalies 物化表按索引分组计数（需先回填物化表）
+"""
+
+from config.anomaly_detection import (
+    PARAMETER_COLUMNS, SOURCE_LIVE, SOURCE_MATERIALIZED, build_filter_conditions, build_violation_predicate
+)
+
+SUMMARY_DIMENSIONS = ('site', 'parameter', 'date')
+
+# 时间粒度对应的分组表达式：周以周一为起点，月以 1 日为起点
+SUMMARY_BUCKETS = {
+    'day': "{col}",
+    'week': "DATE_SUB({col}, INTERVAL WEEKDAY({col}) DAY)",
+    'month': "DATE_SUB({col}, INTERVAL DAYOFMONTH({col}) - 1 DAY)",
+}
+
+
+def parse_group_by(value):
+    """
+    解析 group_by 参数（逗号分隔，如 "site,parameter"）
+
+    Raises:
+        ValueError: 包含不支持的分组维度
+    """
+    if not value:
+        return []
+    dimensions = [d.strip() for d in value.split(',') if d.strip()]
+    for dimension in dimensions:
+        if dimension not in SUMMARY_DIMENSIONS:
+            raise ValueError(f"不支持的分组维度: {dimension}")
+    # 去重并固定为 site, parameter, date 的顺序
+    return [d for d in SUMMARY_DIMENSIONS if d in dimensions]
+
+
+def _dimension_columns(group_by, bucket, table_alias):
+    """返回 (SELECT 表达式列表, GROUP BY 表达式列表)，不含 parameter 维度"""
+    select = []
+    group = []
+    if 'site' in group_by:
+        select.append(f"{table_alias}.site_id")
+        group.append(f"{table_alias}.site_id")
+    if 'date' in group_by:
+        expression = SUMMARY_BUCKETS[bucket].format(col=f"{table_alias}.monitoring_date")
+        select.append(f"{expression} AS period")
+        group.append("period")
+    return select, group
+
+
+def build_materialized_summary_query(group_by, bucket='day', start_date=None, end_date=None,
+                                     site_id=None):
+    """
+    构建从物化表分组统计异常数量的查询
+
+    anomaly_count 为 (记录, 参数) 异常条目数，record_count 为异常记录数
+    """
+    select, group = _dimension_columns(group_by, bucket, 'a')
+    if 'parameter' in group_by:
+        select.insert(1 if 'site' in group_by else 0, "a.parameter")
+        group.insert(1 if 'site' in group_by else 0, "a.parameter")
+
+    conditions, params = build_filter_conditions(start_date, end_date, site_id, table_alias='a')
+    query = (
+        f"SELECT {', '.join(select + ['COUNT(*) AS anomaly_count', 'COUNT(DISTINCT a.record_id) AS record_count'])}"
+        " FROM water_quality_anomalies a"
+    )
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    if group:
+        query += f" GROUP BY {', '.join(group)} ORDER BY {', '.join(group)}"
+    return query, params
+
+
+def build_live_summary_query(thresholds, group_by, bucket='day', start_date=None, end_date=None,
+                             site_id=None, columns=PARAMETER_COLUMNS):
+    """
+    构建按当前阈值条件求和的分组统计查询，每个参数一列计数
+
+    Returns:
+        tuple: (SQL, 参数列表, 参与统计的参数列)，没有可用阈值时 SQL 为 None
+    """
+    sums = []
+    sum_params = []
+    active_columns = []
+    for col in columns:
+        predicate, predicate_params = build_violation_predicate(thresholds, [col])
+        if predicate is None:
+            continue
+        sums.append(f"SUM({predicate}) AS {col}")
+        sum_params.extend(predicate_params)
+        active_columns.append(col)
+
+    any_predicate, any_params = build_violation_predicate(thresholds, columns)
+    if any_predicate is None:
+        return None, [], []
+
+    select, group = _dimension_columns(group_by, bucket, 'w')
+    conditions, filter_params = build_filter_conditions(start_date, end_date, site_id, table_alias='w')
+    # 先用任一参数超限的谓词过滤，只对异常记录做条件求和
+    conditions.append(f"({any_predicate})")
+
+    query = (
+        f"SELECT {', '.join(select + sums + ['COUNT(*) AS record_count'])}"
+        " FROM water_quality w"
+        f" WHERE {' AND '.join(conditions)}"
+    )
+    if group:
+        query += f" GROUP BY {', '.join(group)} ORDER BY {', '.join(group)}"
+    return query, sum_params + filter_params + any_params, active_columns
+
+
+def unpivot_live_summary(rows, group_by, active_columns):
+    """把条件求和查询的每参数一列转换为与物化表查询相同的行格式"""
+    groups = []
+    for row in rows:
+        keys = {}
+        if 'site' in group_by:
+            keys['site_id'] = row['site_id']
+        if 'date' in group_by:
+            keys['period'] = row['period']
+
+        counts = {col: int(row[col] or 0) for col in active_columns}
+        if 'parameter' in group_by:
+            for col in active_columns:
+                if counts[col]:
+                    groups.append({**keys, 'parameter': col, 'anomaly_count': counts[col],
+                                   'record_count': counts[col]})
+        else:
+            groups.append({**keys, 'anomaly_count': sum(counts.values()),
+                           'record_count': int(row['record_count'])})
+    return groups
+
+
+def format_summary_groups(rows):
+    """统一计数类型并把日期转换为字符串"""
+    groups = []
+    for row in rows:
+        group = dict(row)
+        if 'period' in group:
+            group['period'] = str(group['period'])
+        group['anomaly_count'] = int(group['anomaly_count'])
+        group['record_count'] = int(group['record_count'])
+        groups.append(group)
+    return groups
+
+
+def summarize_anomalies(execute_query, thresholds, group_by, bucket='day', source=SOURCE_LIVE,
+                        start_date=None, end_date=None, site_id=None):
+    """
+    执行异常汇总统计
+
+    Args:
+        execute_query (callable): 执行查询并返回字典列表的函数
+        thresholds (list[dict]): 当前阈值（live 模式使用）
+
+    Returns:
+        list[dict]: 分组计数，键为分组维度加 anomaly_count / record_count
+    """
+    if source == SOURCE_MATERIALIZED:
+        query, params = build_materialized_summary_query(group_by, bucket, start_date, end_date, site_id)
+        return format_summary_groups(execute_query(query, params))
+
+    query, params, active_columns = build_live_summary_query(
+        thresholds, group_by, bucket, start_date, end_date, site_id
+    )
+    if query is None:
+        return []
+    return format_summary_groups(unpivot_live_summary(execute_query(query, params), group_by, active_columns))
@@ -0,0 +1,126 @@
+"""
+水质季节基线维护
+water_quality_baselines 表按 (监测点, 月份, 参数) 保存样本数、和与平方和，
+评分时由此直接得到均值和标准差，不需要重新扫描历史数据。导入数据后只按基础表
+重新计算新记录涉及的 (监测点, 月份)，结果只取决于 water_quality，重复调用或
+重复导入同一文件都不会重复累加
+
+命令行回填（在 backend_flask 目录下）:
+    python -m config.baseline_store
+"""
+
+from config.anomaly_detection import PARAMETER_COLUMNS
+
+# 单个参数按 (监测点, 月份) 的汇总语句，列名来自 PARAMETER_COLUMNS 白名单
+_SELECT_AGGREGATES = """
+SELECT site_id, MONTH(monitoring_date) AS month, %s AS parameter,
+       COUNT({column}), SUM({column}), SUM({column} * {column})
+FROM water_quality
+WHERE {column} IS NOT NULL{extra_conditions}
+GROUP BY site_id, MONTH(monitoring_date)
+"""
+
+_INSERT_PREFIX = """
+INSERT INTO water_quality_baselines
+    (site_id, month, parameter, sample_count, value_sum, value_sq_sum)
+"""
+
+# 汇总都按基础表完整计算，已有的行直接覆盖（并发刷新同一分组时结果相同）
+_ON_DUPLICATE = """
+ON DUPLICATE KEY UPDATE
+    sample_count = VALUES(sample_count),
+    value_sum = VALUES(value_sum),
+    value_sq_sum = VALUES(value_sq_sum)
+"""
+
+
+def _aggregate_select(column, extra_conditions=""):
+    """构建某个参数的分组汇总子查询"""
+    if column not in PARAMETER_COLUMNS:
+        raise ValueError(f"未知的水质参数: {column}")
+    return _SELECT_AGGREGATES.format(column=column, extra_conditions=extra_conditions)
+
+
+def _aggregate_query(extra_conditions, extra_params, parameters):
+    selects = []
+    params = []
+    for column in parameters:
+        selects.append(_aggregate_select(column, extra_conditions))
+        params.append(column)
+        params.extend(extra_params)
+    query = (
+        _INSERT_PREFIX
+        + "SELECT * FROM (" + " UNION ALL ".join(selects) + ") AS aggregates"
+        + _ON_DUPLICATE
+    )
+    return query, params
+
+
+def refresh_baselines(cursor, site_months, parameters=PARAMETER_COLUMNS):
+    """
+    按 water_quality 的全部记录重新计算若干 (监测点, 月份) 的季节基线
+
+    导入数据后传入新记录涉及的 (监测点, 月份)。按监测点集合 × 月份集合筛选，
+    可能顺带重算少量未变化的分组，结果同样正确；没有有效样本的分组会被删除
+
+    Args:
+        cursor: 数据库游标（由调用方负责提交事务）
+        site_months (iterable): (site_id, 月份) 序列
+        parameters (list[str]): 需要重算的参数
+
+    Returns:
+        int: 受影响的行数
+    """
+    site_months = {(site_id, month) for site_id, month in site_months if site_id is not None and month}
+    if not site_months or not parameters:
+        return 0
+
+    site_ids = sorted({site_id for site_id, _ in site_months})
+    months = sorted({month for _, month in site_months})
+    site_placeholders = ', '.join(['%s'] * len(site_ids))
+    month_placeholders = ', '.join(['%s'] * len(months))
+
+    cursor.execute(
+        f"DELETE FROM water_quality_baselines WHERE site_id IN ({site_placeholders}) "
+        f"AND month IN ({month_placeholders}) AND parameter IN ({', '.join(['%s'] * len(parameters))})",
+        site_ids + months + list(parameters)
+    )
+    extra = f" AND site_id IN ({site_placeholders}) AND MONTH(monitoring_date) IN ({month_placeholders})"
+    query, params = _aggregate_query(extra, site_ids + months, parameters)
+    cursor.execute(query, params)
+    return cursor.rowcount
+
+
+def rebuild_baselines(cursor, parameters=PARAMETER_COLUMNS):
+    """清空并按全部历史数据重建季节基线（用于首次部署或历史数据变更后）"""
+    cursor.execute("DELETE FROM water_quality_baselines")
+    if not parameters:
+        return 0
+    query, params = _aggregate_query("", [], parameters)
+    cursor.execute(query, params)
+    return cursor.rowcount
+
+
+if __name__ == "__main__":
+    import os
+    import mysql.connector
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    conn = mysql.connector.connect(
+        host=os.environ.get('MYSQL_HOST', 'localhost'),
+        user=os.environ.get('MYSQL_USER', 'root'),
+        password=os.environ.get('MYSQL_PASSWORD', '123456'),
+        database=os.environ.get('MYSQL_DATABASE', 'water_quality_monitoring')
+    )
+    cursor = conn.cursor()
+    try:
+        count = rebuild_baselines(cursor)
+        conn.commit()
+        print(f"已重建 {count} 条基线")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
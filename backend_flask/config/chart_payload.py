@@ -0,0 +1,148 @@
+"""
+图表数据的紧凑传输格式
+/visualize-water 和 /visualize-fish 在请求 format=columnar 时返回列式数据：
+
+- 时间轴为 epoch 秒整数（不是时间字符串），所有数据集共用
+- 每个数值序列为小端 float32 数组的 base64 编码，缺失值为 NaN；
+  前端用 new Float32Array(Uint8Array.from(atob(data), c => c.charCodeAt(0)).buffer) 解码
+- 分类列（如鱼种）为 labels + 整数 codes
+
+两种格式的响应体都按 Accept-Encoding 协商压缩：优先 brotli（需安装 brotli 包），否则 gzip
+"""
+
+import base64
+import gzip
+
+import numpy as np
+
+try:
+    import brotli
+except ImportError:  # brotli 为可选依赖，未安装时只使用 gzip
+    brotli = None
+
+FORMAT_JSON = 'json'
+FORMAT_COLUMNAR = 'columnar'
+PAYLOAD_FORMATS = (FORMAT_JSON, FORMAT_COLUMNAR)
+
+COLUMNAR_DTYPE = '<f4'  # 小端 float32
+MIN_COMPRESS_BYTES = 1024  # 小于该大小的响应压缩收益不大，直接返回
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5  # 动态响应取压缩率和耗时的折中
+# 预先压缩的响应只压缩一次，使用较高的压缩级别；brotli 11 对几百 KB 的响应需要数秒，取 6
+PRECOMPRESS_GZIP_LEVEL = 9
+PRECOMPRESS_BROTLI_QUALITY = 6
+
+
+def encode_float32(values):
+    """把数值序列编码为小端 float32 的 base64 字符串，非数值和缺失值为 NaN"""
+    import pandas as pd  # 应用启动时只用到 compress_response，pandas 在首次编码时导入
+    array = pd.to_numeric(pd.Series(values), errors='coerce').to_numpy(dtype=np.float64)
+    return base64.b64encode(array.astype(COLUMNAR_DTYPE).tobytes()).decode('ascii')
+
+
+def encode_epochs(values):
+    """
+    把时间序列转换为 epoch 秒整数列表，无法解析的为 None
+
+    监测时间没有时区信息，按原样（当地时间）换算
+    """
+    import pandas as pd
+    times = pd.to_datetime(pd.Series(values), errors='coerce')
+    seconds = times.to_numpy(dtype='datetime64[s]').astype(np.int64)
+    return [None if missing else int(second) for second, missing in zip(seconds, times.isna().to_numpy())]
+
+
+def encode_categories(values):
+    """把分类序列编码为 {'labels': [...], 'codes': [...]}，缺失值的 code 为 -1"""
+    import pandas as pd
+    categorical = pd.Categorical(values)
+    return {
+        'labels': [str(label) for label in categorical.categories],
+        'codes': categorical.codes.tolist(),
+    }
+
+
+def encode_frame(frame):
+    """
+    把 DataFrame 按列编码：数值列为 base64 float32，其余列为分类编码
+
+    Returns:
+        dict: {'format': 'columnar', 'length': 行数, 'columns': {列名: 编码结果}}
+    """
+    import pandas as pd
+    columns = {}
+    for col in frame.columns:
+        if pd.api.types.is_numeric_dtype(frame[col]):
+            columns[col] = encode_float32(frame[col])
+        else:
+            columns[col] = encode_categories(frame[col])
+    return {'format': FORMAT_COLUMNAR, 'length': len(frame), 'columns': columns}
+
+
+def choose_encoding(accept_encodings):
+    """
+    根据请求的 Accept-Encoding 选择压缩方式
+
+    Args:
+        accept_encodings: werkzeug 的 request.accept_encodings
+
+    Returns:
+        str: 'br'、'gzip' 或 None
+    """
+    if brotli is not None and accept_encodings.quality('br') > 0:
+        return 'br'
+    if accept_encodings.quality('gzip') > 0:
+        return 'gzip'
+    return None
+
+
+def compress_response(response, accept_encodings):
+    """按 Accept-Encoding 压缩 Flask 响应体（原地修改并返回 response）"""
+    response.vary.add('Accept-Encoding')
+    if response.direct_passthrough or 'Content-Encoding' in response.headers:
+        return response
+
+    body = response.get_data()
+    if len(body) < MIN_COMPRESS_BYTES:
+        return response
+
+    encoding = choose_encoding(accept_encodings)
+    if encoding == 'br':
+        body = brotli.compress(body, quality=BROTLI_QUALITY)
+    elif encoding == 'gzip':
+        body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+    else:
+        return response
+
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def precompress(body):
+    """
+    预先压缩不变的响应体
+
+    Returns:
+        dict: {None: 原始字节, 'gzip': ..., 'br': ...}；小于 MIN_COMPRESS_BYTES 时只有原始字节
+    """
+    variants = {None: body}
+    if len(body) >= MIN_COMPRESS_BYTES:
+        variants['gzip'] = gzip.compress(body, compresslevel=PRECOMPRESS_GZIP_LEVEL)
+        if brotli is not None:
+            variants['br'] = brotli.compress(body, quality=PRECOMPRESS_BROTLI_QUALITY)
+    return variants
+
+
+def precompressed_response(variants, accept_encodings, mimetype='application/json'):
+    """按 Accept-Encoding 从 precompress 的结果中选择响应体，不再做任何序列化或压缩"""
+    from flask import Response
+
+    encoding = choose_encoding(accept_encodings)
+    if encoding not in variants:
+        encoding = None
+    response = Response(variants[encoding], mimetype=mimetype)
+    response.vary.add('Accept-Encoding')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    return response
@@ -0,0 +1,236 @@
+"""
+matplotlib 图表渲染
+所有图表都用面向对象的 Figure API 绘制（不使用 pyplot 的全局当前图），
+在共享进程池（见 process_pool）中执行，渲染不占用请求线程，也不会与其他线程共享图形状态：
+
+- 工作进程第一次渲染时设置中文字体并预先加载字体缓存，之后每次渲染不再查找字体
+- 未完成的渲染任务数有上限（CHART_RENDER_QUEUE），超过时立即抛出 RenderQueueFull，
+  由接口返回 503，渲染高峰不会让请求线程全部阻塞在等待图表上。
+  等待超时的任务在工作进程中真正结束之前仍占用名额
+- CHART_RENDER_WORKERS=0 或共享进程池未启动时在调用线程中渲染（仍使用 Figure API，线程安全）
+
+渲染函数返回 PNG 字节，没有可绘制的数据时返回 None
+"""
+
+import logging
+import os
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from io import BytesIO
+
+from config.process_pool import shared_process_pool
+
+logger = logging.getLogger(__name__)
+
+CHART_FONT_FAMILY = ["SimHei"]
+CHART_RENDER_WORKERS = int(os.environ.get('CHART_RENDER_WORKERS', 2))
+CHART_RENDER_QUEUE = int(os.environ.get('CHART_RENDER_QUEUE', max(CHART_RENDER_WORKERS, 1) * 4))
+CHART_RENDER_TIMEOUT = float(os.environ.get('CHART_RENDER_TIMEOUT', 30))
+
+_fonts_ready = False
+
+
+class RenderQueueFull(Exception):
+    """排队中的渲染任务已达到上限"""
+
+
+def init_render_process():
+    """设置中文字体并预先加载字体缓存（每个进程只执行一次）"""
+    global _fonts_ready
+    if _fonts_ready:
+        return
+    import matplotlib
+    from matplotlib import font_manager
+
+    matplotlib.rcParams["font.family"] = CHART_FONT_FAMILY
+    matplotlib.rcParams["axes.unicode_minus"] = False  # 解决负号显示问题
+    # 第一次 findfont 会构建字体缓存，放在初始化时完成
+    font_manager.findfont(font_manager.FontProperties(family=CHART_FONT_FAMILY))
+    _fonts_ready = True
+
+
+def _render_task(render_func, *args):
+    """在工作进程中执行渲染函数，第一次执行时初始化字体"""
+    init_render_process()
+    return render_func(*args)
+
+
+def _new_figure(figsize):
+    from matplotlib.figure import Figure
+    return Figure(figsize=figsize)
+
+
+def _to_png(fig, tight=False, dpi=None):
+    buffer = BytesIO()
+    if tight:
+        fig.tight_layout()
+    fig.savefig(buffer, format='png', dpi=dpi)
+    return buffer.getvalue()
+
+
+def _plot_series(ax, x_data, y_data, col, x_label, **style):
+    mask = y_data.notna()
+    x_data = x_data[mask]
+    y_data = y_data[mask]
+    if len(x_data) > 0:
+        ax.plot(x_data, y_data, **style)
+        ax.set_title(f"{col} 随时间的变化")
+        ax.set_xlabel(x_label)
+        ax.set_ylabel(col)
+        ax.grid(True)
+    else:
+        ax.text(0.5, 0.5, '无有效数据', ha='center', va='center')
+        ax.set_title(f"{col} (无有效数据)")
+
+
+def render_time_series(df, x_column, x_label, numerical_columns, target_column=None):
+    """水质指标随时间变化的折线图：指定 target_column 时单独绘制，否则每个指标一个子图"""
+    fig = _new_figure((12, 8))
+    x_data = df[x_column] if isinstance(x_column, str) else df.index
+    if target_column and target_column in numerical_columns:
+        ax = fig.add_subplot(1, 1, 1)
+        _plot_series(ax, x_data, df[target_column], target_column, x_label,
+                     marker='o', linestyle='-', color='blue')
+    else:
+        n_plots = len(numerical_columns)
+        n_rows = (n_plots + 1) // 2
+        n_cols = min(2, n_plots)
+        for i, col in enumerate(numerical_columns, 1):
+            _plot_series(fig.add_subplot(n_rows, n_cols, i), x_data, df[col], col, x_label)
+    return _to_png(fig, tight=True)
+
+
+def render_bar_chart(df):
+    """每种鱼类的平均重量柱状图"""
+    average_weight = df.groupby('Species')['Weight(g)'].mean()
+    fig = _new_figure((8, 6))
+    ax = fig.add_subplot()
+    average_weight.plot(kind='bar', ax=ax)
+    ax.set_title('每种鱼类的平均重量')
+    ax.set_xlabel('鱼类种类')
+    ax.set_ylabel('平均重量 (g)')
+    return _to_png(fig)
+
+
+def render_scatter_chart(df):
+    """鱼类长度和宽度关系散点图"""
+    fig = _new_figure((8, 6))
+    ax = fig.add_subplot()
+    ax.scatter(df['Length1(cm)'], df['Width(cm)'])
+    ax.set_title('鱼类的长度和宽度关系')
+    ax.set_xlabel('长度 (cm)')
+    ax.set_ylabel('宽度 (cm)')
+    return _to_png(fig)
+
+
+def render_single_species_scatter(species_data, species_name):
+    """单个鱼种的长度-宽度散点图和回归线（dpi=300）"""
+    import seaborn as sns
+
+    correlation = species_data['Length1(cm)'].corr(species_data['Width(cm)'])
+    fig = _new_figure((10, 7))
+    ax = fig.add_subplot()
+    sns.regplot(x='Length1(cm)', y='Width(cm)', data=species_data, ax=ax,
+                scatter_kws={'alpha': 0.6, 'color': 'dodgerblue'},
+                line_kws={'color': 'crimson'})
+
+    # 添加标题和标签，包括相关系数
+    ax.set_title(f"{species_name} 的长度和宽度关系 (相关系数: {correlation:.2f})", fontsize=14)
+    ax.set_xlabel('长度 (cm)', fontsize=12)
+    ax.set_ylabel('宽度 (cm)', fontsize=12)
+    ax.grid(True, linestyle='--', alpha=0.7)
+
+    # 添加数据统计信息
+    fig.text(0.15, 0.01,
+             f"样本数量: {len(species_data)} | 平均长度: {species_data['Length1(cm)'].mean():.2f} cm | 平均宽度: {species_data['Width(cm)'].mean():.2f} cm",
+             fontsize=10, ha='left')
+    return _to_png(fig, tight=True, dpi=300)
+
+
+def render_water_quality_pie_chart(quality_counts):
+    """水质类别分布饼图，quality_counts 为各类别的数量"""
+    fig = _new_figure((8, 6))
+    ax = fig.add_subplot()
+    ax.pie(quality_counts, labels=quality_counts.index, autopct='%1.1f%%', startangle=90)
+    ax.set_title('水质类别分布')
+    ax.axis('equal')  # 使饼图为正圆形
+    return _to_png(fig)
+
+
+def render_dissolved_oxygen_trend(df):
+    """溶解氧随时间变化趋势图，df 的监测时间和溶解氧已转换为 datetime / 数值"""
+    import matplotlib.dates as mdates
+
+    fig = _new_figure((12, 6))
+    ax = fig.add_subplot()
+    ax.plot(df['监测时间'], df['溶解氧(mg/L)'], marker='o', linestyle='-', color='b')
+    ax.set_title('溶解氧随时间变化趋势')
+    ax.set_xlabel('监测时间')
+    ax.set_ylabel('溶解氧(mg/L)')
+    ax.tick_params(axis='x', labelrotation=45)
+    ax.grid(True, linestyle='--', alpha=0.7)
+    # 设置横坐标显示格式，确保年份显示
+    ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d %H:%M'))
+    return _to_png(fig, tight=True)
+
+
+def render_ph_histogram(values):
+    """pH 值分布直方图"""
+    fig = _new_figure((8, 6))
+    ax = fig.add_subplot()
+    ax.hist(values, bins=10, alpha=0.7)
+    ax.set_title('pH 值分布')
+    ax.set_xlabel('pH 值')
+    ax.set_ylabel('频次')
+    ax.grid(True, linestyle='--', alpha=0.7)
+    return _to_png(fig)
+
+
+class ChartRenderPool:
+    """在共享进程池中渲染图表，限制未完成的任务数"""
+
+    def __init__(self, workers, max_pending):
+        self.workers = workers
+        self._slots = threading.BoundedSemaphore(max(max_pending, 1))
+
+    def render(self, render_func, *args, timeout=CHART_RENDER_TIMEOUT):
+        """
+        渲染一张图表
+
+        Args:
+            render_func (callable): 本模块的 render_* 函数（需可被 pickle）
+            args: 渲染参数，只传入绘图需要的数据以减少进程间传输
+            timeout (float): 等待渲染结果的最长时间（秒）
+
+        Returns:
+            bytes: PNG 内容；没有可绘制的数据时为 None
+
+        Raises:
+            RenderQueueFull: 未完成的渲染任务已达到上限
+            TimeoutError: 渲染超时
+        """
+        if not self._slots.acquire(blocking=False):
+            raise RenderQueueFull("图表渲染任务过多，请稍后重试")
+        executor = shared_process_pool() if self.workers > 0 else None
+        if executor is None:
+            try:
+                return _render_task(render_func, *args)
+            finally:
+                self._slots.release()
+
+        try:
+            future = executor.submit(_render_task, render_func, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # 名额在任务真正结束（完成、失败或被取消）时归还；超时后仍在工作进程中
+        # 执行的任务继续占用名额，新的渲染请求不会在它后面无限排队
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise TimeoutError(f"图表渲染超过 {timeout} 秒") from None
+
+
+render_pool = ChartRenderPool(CHART_RENDER_WORKERS, CHART_RENDER_QUEUE)
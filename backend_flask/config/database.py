@@ -6,12 +6,15 @@ MySQL数据库连接模块
 import mysql.connector
 from mysql.connector import pooling
 from dotenv import load_dotenv
+import logging
 import os
 import sys
 
 # 加载环境变量
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # MySQL连接池实例
 connection_pool = None
 
@@ -51,7 +54,7 @@ def init_db():
         if target_db not in databases:
             # 创建数据库
             server_cursor.execute(f"CREATE DATABASE {target_db} CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci")
-            print(f"已创建数据库: {target_db}")
+            logger.info("已创建数据库: %s", target_db)
         
         # 关闭服务器连接
         server_cursor.close()
@@ -68,12 +71,12 @@ def init_db():
         conn = connection_pool.get_connection()
         if conn.is_connected():
             db_info = conn.get_server_info()
-            print(f"MySQL 已连接: {db_config['host']}:{db_config['port']} (Server: {db_info})")
+            logger.info("MySQL 已连接: %s:%s (Server: %s)", db_config['host'], db_config['port'], db_info)
             conn.close()
         return connection_pool
         
     except Exception as e:
-        print(f"MySQL连接错误: {str(e)}")
+        logger.critical("MySQL连接错误: %s", e)
         sys.exit(1)
 
 def get_db():
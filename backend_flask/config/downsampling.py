@@ -0,0 +1,161 @@
+"""
+折线图降采样
+图表宽度只有约一千像素，长时间范围的数据点远多于可显示的点数。
+以下方法都返回被保留点在原序列中的下标，缺失值（NaN）不参与选点：
+
+- lttb: Largest-Triangle-Three-Buckets，按与相邻桶构成的三角形面积选点，保留形状和峰值
+- minmax: 每个桶保留最小值和最大值，保证所有极值（异常点）都可见
+
+x 轴使用点的顺序位置（数据已按监测时间排序），多个数据集共用 x 轴时
+调用方取各数据集下标的并集，并集超过上限时用 thin_indices 均匀截取
+"""
+
+import numpy as np
+
+DOWNSAMPLE_LTTB = 'lttb'
+DOWNSAMPLE_MINMAX = 'minmax'
+DOWNSAMPLE_METHODS = (DOWNSAMPLE_LTTB, DOWNSAMPLE_MINMAX)
+
+MIN_DOWNSAMPLE_POINTS = 3  # 首尾两点之外至少保留一个桶
+
+
+def _bucket_ids(count, buckets):
+    """把 count 个点按顺序等分为 buckets 个桶，返回每个点所属的桶号"""
+    return np.arange(count) * buckets // count
+
+
+def lttb_indices(y, max_points):
+    """
+    Largest-Triangle-Three-Buckets 降采样
+
+    桶平均值一次性用 np.add.reduceat 计算；逐桶选点依赖上一个桶选中的点，
+    每个桶内的三角形面积用向量运算求出
+
+    Args:
+        y (np.ndarray): 不含 NaN 的一维数值
+        max_points (int): 最多保留的点数（>= 3）
+
+    Returns:
+        np.ndarray: 保留点的下标（升序）
+    """
+    count = len(y)
+    if count <= max_points:
+        return np.arange(count)
+
+    # 首尾两点固定保留，中间的点分成 max_points - 2 个桶
+    buckets = max_points - 2
+    middle = np.arange(1, count - 1)
+    starts = np.searchsorted(_bucket_ids(len(middle), buckets), np.arange(buckets)) + 1
+    ends = np.append(starts[1:], count - 1)
+
+    x = np.arange(count, dtype=np.float64)
+    sums_x = np.add.reduceat(x, starts)
+    sums_y = np.add.reduceat(y, starts)
+    # reduceat 的最后一段会累加到序列末尾，需要去掉最后一个点
+    sums_x[-1] -= x[-1]
+    sums_y[-1] -= y[-1]
+    sizes = ends - starts
+    avg_x = np.append(sums_x / sizes, x[-1])[1:]
+    avg_y = np.append(sums_y / sizes, y[-1])[1:]
+
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = count - 1
+    previous = 0
+    for i in range(buckets):
+        start, end = starts[i], ends[i]
+        # 三角形 (上一个选中点, 候选点, 下一个桶的平均点) 面积的两倍
+        areas = np.abs(
+            (x[previous] - avg_x[i]) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (avg_y[i] - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        selected[i + 1] = previous
+    return selected
+
+
+def _first_per_bucket(positions, bucket_ids):
+    """positions 中每个桶第一次出现的位置"""
+    _, first = np.unique(bucket_ids[positions], return_index=True)
+    return positions[first]
+
+
+def minmax_indices(y, max_points):
+    """
+    最小值 / 最大值分桶降采样
+
+    分成 max_points // 2 个桶，用 np.minimum.reduceat / np.maximum.reduceat
+    求出每个桶的极值后定位其下标，全部为向量运算
+
+    Args:
+        y (np.ndarray): 不含 NaN 的一维数值
+        max_points (int): 最多保留的点数（>= 2）
+
+    Returns:
+        np.ndarray: 保留点的下标（升序）
+    """
+    count = len(y)
+    if count <= max_points:
+        return np.arange(count)
+
+    buckets = max(max_points // 2, 1)
+    bucket_ids = _bucket_ids(count, buckets)
+    starts = np.searchsorted(bucket_ids, np.arange(buckets))
+    lows = np.minimum.reduceat(y, starts)[bucket_ids]
+    highs = np.maximum.reduceat(y, starts)[bucket_ids]
+    return np.union1d(
+        _first_per_bucket(np.flatnonzero(y == lows), bucket_ids),
+        _first_per_bucket(np.flatnonzero(y == highs), bucket_ids),
+    )
+
+
+def downsample_indices(values, max_points, method=DOWNSAMPLE_LTTB):
+    """
+    对可能含有缺失值的序列降采样
+
+    Args:
+        values (array-like): 一维数值，缺失值为 NaN / None
+        max_points (int): 最多保留的有效点数
+        method (str): lttb 或 minmax
+
+    Returns:
+        np.ndarray: 保留点在 values 中的下标（升序）；不需要降采样时返回全部下标
+
+    Raises:
+        ValueError: 不支持的方法
+    """
+    if method not in DOWNSAMPLE_METHODS:
+        raise ValueError(f"不支持的降采样方法: {method}")
+
+    y = np.asarray(values, dtype=np.float64)
+    if len(y) <= max_points:
+        return np.arange(len(y))
+
+    valid = np.flatnonzero(~np.isnan(y))
+    if len(valid) <= max_points:
+        return valid
+
+    if method == DOWNSAMPLE_LTTB:
+        picked = lttb_indices(y[valid], max_points)
+    else:
+        picked = minmax_indices(y[valid], max_points)
+    return valid[picked]
+
+
+def thin_indices(indices, max_points):
+    """
+    从升序下标中均匀取出最多 max_points 个（保留首尾）
+
+    多个数据集的下标并集可能超过总点数上限（如数据集数 × MIN_DOWNSAMPLE_POINTS > max_points），
+    用于把并集截到上限以内
+
+    Returns:
+        np.ndarray: 下标（升序）
+    """
+    indices = np.asarray(indices)
+    if len(indices) <= max_points:
+        return indices
+    if max_points <= 1:
+        return indices[:max_points]
+    keep = np.unique(np.linspace(0, len(indices) - 1, max_points).round().astype(np.int64))
+    return indices[keep]
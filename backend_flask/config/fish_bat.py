@@ -1,7 +1,10 @@
+import os
 import pandas as pd
 import mysql.connector
 from datetime import datetime
 
+from config.fish_stats import refresh_species_stats
+
 def import_fish_data():
     db_config = {
         'host': 'localhost',
@@ -92,6 +95,8 @@ def import_fish_data():
             batch = records[i:i + batch_size]
             cursor.executemany(insert_query, batch)
             total_inserted += cursor.rowcount
+            # 与观测数据在同一事务中按基础表重算本批次涉及的鱼种汇总
+            refresh_species_stats(cursor, [record[0] for record in batch])
             print(f"已插入: {total_inserted}/{len(records)} 条记录")
             conn.commit()
         
@@ -107,6 +112,7 @@ def import_fish_data():
             conn.close()
             print("数据库连接已关闭")
 
+# 在 backend_flask 目录下以模块方式运行：python -m config.fish_bat
 if __name__ == "__main__":
     print("="*50)
     print(f"鱼类数据导入程序 - {datetime.now().strftime('%Y-%m-%d %H:%M')}")
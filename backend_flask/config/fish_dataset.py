@@ -0,0 +1,224 @@
+"""
+鱼类数据集服务
+/visualize-fish 的数据来自 fish_observations（Fish.csv 由 fish_bat.py 导入，
+管理员上传的数据由 process_fish_upload 写入）：
+
+- 柱状图：每种鱼类的平均重量，由 fish_species_stats 汇总表算出
+- 散点图：全部鱼的长度 / 宽度
+- 每个鱼种的散点和统计信息（样本数、平均长度、平均宽度、相关系数），统计信息同样来自汇总表
+
+汇总表（每个鱼种一行）最多每 ttl 秒读取一次，用来判断数据是否变化；其间的请求
+不查询数据库，直接返回上次预先序列化的响应体：
+
+- 柱状图和全部散点（所有响应共用的部分）每种 format 只序列化一次，
+  每个鱼种只序列化自己的散点和统计信息，响应体由两段字节拼接而成
+- 压缩在某个 (format, species) 第一次被请求时进行并缓存
+- 有新观测导入时在后台线程重新读取散点数据并重建，重建完成前继续返回旧版本；
+  重建失败后按指数退避延后重试，不会每个请求都重新查询
+- 本进程修改观测数据后可调用 invalidate，下一次请求立即检查汇总表
+"""
+
+import json
+import logging
+import threading
+import time
+
+from config.chart_payload import FORMAT_COLUMNAR, PAYLOAD_FORMATS, encode_frame, precompress
+from config.fish_stats import SELECT_SPECIES_STATS, species_summary
+
+logger = logging.getLogger(__name__)
+
+# 加载或重建失败后的重试间隔（秒），连续失败时翻倍
+REBUILD_RETRY_MIN = 5
+REBUILD_RETRY_MAX = 300
+
+SCATTER_COLUMNS = ['Species', 'Length1(cm)', 'Width(cm)']
+SPECIES_POINT_COLUMNS = ['Length1(cm)', 'Width(cm)']
+
+# 散点数据，列名与原 Fish.csv 的表头一致，响应结构保持不变
+SELECT_SCATTER_POINTS = """
+SELECT s.common_name AS `Species`, o.body_length1 AS `Length1(cm)`, o.body_width AS `Width(cm)`
+FROM fish_observations o
+JOIN fish_species s ON s.species_id = o.species_id
+ORDER BY o.observation_id
+"""
+
+
+def _dumps(payload):
+    # 与 Flask 默认的 jsonify 一致：键排序、ASCII 转义，紧凑分隔符
+    return json.dumps(payload, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+
+class FishSnapshot:
+    """某一版本观测数据的预计算结果（只读）"""
+
+    def __init__(self, summaries, points, fingerprint):
+        """
+        Args:
+            summaries (list[dict]): species_summary 的结果，按鱼种名称排序
+            points (DataFrame): SCATTER_COLUMNS 三列的散点数据
+            fingerprint: 汇总表内容，用于判断数据是否变化
+        """
+        import pandas as pd
+
+        self.fingerprint = fingerprint
+        self.species = [summary['species'] for summary in summaries]
+
+        bar_chart_data = pd.DataFrame({
+            'Species': self.species,
+            'Weight(g)': [summary['avg_weight'] for summary in summaries],
+        })
+        scatter_frame = points[SCATTER_COLUMNS]
+        species_groups = {name: group for name, group in scatter_frame.groupby('Species')}
+        empty_points = scatter_frame.iloc[0:0]
+
+        # 响应体 = 共用前缀 + single_species_data + "}"（与 jsonify 的键排序结果相同）
+        self._prefixes = {}
+        # (format, species) -> single_species_data 的 JSON 字节，species 为 None 表示不指定鱼种
+        self._fragments = {}
+        # (format, species) -> {编码: 响应体字节}，首次请求时生成
+        self._variants = {}
+        for payload_format in PAYLOAD_FORMATS:
+            columnar = payload_format == FORMAT_COLUMNAR
+            base = {
+                "bar_chart_data": encode_frame(bar_chart_data) if columnar else bar_chart_data.to_dict('records'),
+                "scatter_chart_data": encode_frame(scatter_frame) if columnar else scatter_frame.to_dict('records'),
+            }
+            self._prefixes[payload_format] = _dumps(base)[:-1] + b',"single_species_data":'
+            self._fragments[(payload_format, None)] = _dumps(None)
+            for summary in summaries:
+                name = summary['species']
+                species_points = species_groups.get(name, empty_points)[SPECIES_POINT_COLUMNS]
+                self._fragments[(payload_format, name)] = _dumps({
+                    'species': name,
+                    'data': encode_frame(species_points) if columnar else species_points.to_dict('records'),
+                    'stats': summary['stats'],
+                })
+
+    def response_variants(self, payload_format, species=None):
+        """返回预先编码的响应体 {编码: 字节}，鱼种不存在时返回 None"""
+        key = (payload_format, species or None)
+        variants = self._variants.get(key)
+        if variants is None:
+            fragment = self._fragments.get(key)
+            if fragment is None:
+                return None
+            # 并发的首次请求可能各压缩一次，结果相同，后写入的覆盖先写入的
+            variants = precompress(self._prefixes[payload_format] + fragment + b'}')
+            self._variants[key] = variants
+        return variants
+
+
+class FishDatasetService:
+    """常驻内存的鱼类数据集，定期检查汇总表，变化后在后台重新加载"""
+
+    def __init__(self, execute_query, ttl=30):
+        """
+        Args:
+            execute_query (callable): 执行查询并返回字典列表的函数
+            ttl (float): 汇总表的检查间隔（秒），用于感知其他进程导入的观测数据
+        """
+        self.execute_query = execute_query
+        self._ttl = ttl
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._check_lock = threading.Lock()
+        self._loading = False
+        self._checked_at = None  # 上次读取汇总表的时间（time.monotonic）
+        self._failures = 0
+        self._retry_at = 0.0
+
+    def invalidate(self):
+        """观测数据被修改后调用，下一次请求立即检查汇总表"""
+        self._checked_at = None
+
+    def _load_points(self):
+        import pandas as pd  # 首次加载时才导入 pandas
+
+        points = pd.DataFrame(self.execute_query(SELECT_SCATTER_POINTS), columns=SCATTER_COLUMNS)
+        # DECIMAL 列转换为浮点数，空值为 NaN（与读取 CSV 的结果一致）
+        for column in SPECIES_POINT_COLUMNS:
+            points[column] = pd.to_numeric(points[column], errors='coerce').astype('float64')
+        return points
+
+    def _build(self, rows):
+        summaries = [species_summary(row) for row in rows]
+        return FishSnapshot(summaries, self._load_points(), _fingerprint(rows))
+
+    def _record_failure(self, error):
+        self._failures += 1
+        delay = min(REBUILD_RETRY_MIN * 2 ** (self._failures - 1), REBUILD_RETRY_MAX)
+        self._retry_at = time.monotonic() + delay
+        logger.warning("鱼类数据集加载失败（连续 %d 次），%d 秒后重试: %s", self._failures, delay, error)
+
+    def _record_success(self, snapshot):
+        self._snapshot = snapshot
+        self._failures = 0
+        self._retry_at = 0.0
+
+    def _background_rebuild(self, rows):
+        try:
+            self._record_success(self._build(rows))
+        except Exception as e:
+            # 继续使用旧版本，退避期内不再检查汇总表
+            self._record_failure(e)
+        finally:
+            self._loading = False
+
+    def _load_first(self):
+        with self._lock:
+            if self._snapshot is not None:
+                return self._snapshot
+            checked_at = self._checked_at
+            if checked_at is not None and time.monotonic() - checked_at < self._ttl:
+                return None  # 刚检查过，仍没有观测数据
+            if time.monotonic() < self._retry_at:
+                raise RuntimeError("鱼类数据集加载失败，请稍后重试")
+            try:
+                rows = self.execute_query(SELECT_SPECIES_STATS)
+                if rows:
+                    self._record_success(self._build(rows))
+                self._checked_at = time.monotonic()
+            except Exception as e:
+                self._record_failure(e)
+                raise
+            return self._snapshot
+
+    def snapshot(self):
+        """
+        返回当前版本的预计算结果，没有任何观测数据时返回 None
+
+        第一次调用时同步加载。之后汇总表最多每 ttl 秒读取一次（同一时刻只有一个请求读取），
+        汇总变化时由后台线程重建，重建完成前返回旧版本；重建失败后在退避期内直接返回旧版本
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            return self._load_first()
+
+        now = time.monotonic()
+        checked_at = self._checked_at
+        if (checked_at is not None and now - checked_at < self._ttl) or self._loading or now < self._retry_at:
+            return snapshot
+        if not self._check_lock.acquire(blocking=False):
+            return snapshot  # 其他请求正在读取汇总表
+        try:
+            self._checked_at = now
+            try:
+                rows = self.execute_query(SELECT_SPECIES_STATS)
+            except Exception as e:
+                self._record_failure(e)
+                return snapshot
+            if not rows:
+                self._snapshot = None
+                return None
+            if _fingerprint(rows) != snapshot.fingerprint and not self._loading:
+                self._loading = True
+                threading.Thread(target=self._background_rebuild, args=(rows,), daemon=True).start()
+        finally:
+            self._check_lock.release()
+        return snapshot
+
+
+def _fingerprint(rows):
+    """汇总表内容，用于判断数据是否变化"""
+    return tuple(tuple(row.values()) for row in rows)
@@ -0,0 +1,138 @@
+"""
+鱼类体长批量预测
+一次请求预测多条记录：输入（JSON 数组或上传的 CSV）整体转换为一个 (n, 3) 的
+float64 数组并一次性校验，然后只调用一次 model.predict，scikit-learn 的输入校验
+和 Python 调用开销只发生一次，不再是每条记录一次 HTTP 往返
+
+特征顺序与 trainModel.py 训练时一致：体重(g)、高度(cm)、宽度(cm)
+"""
+
+import csv
+import io
+import json
+import os
+
+import numpy as np
+
+FEATURE_FIELDS = ['weight', 'height', 'width']
+
+# CSV 表头可以使用接口字段名，也可以直接使用 Fish.csv 的列名
+CSV_FIELD_ALIASES = {
+    'weight': 'weight', 'weight(g)': 'weight',
+    'height': 'height', 'height(cm)': 'height',
+    'width': 'width', 'width(cm)': 'width',
+}
+
+MAX_BATCH_ROWS = int(os.environ.get('FISH_LENGTH_MAX_BATCH_ROWS', 100000))
+STREAM_CHUNK_ROWS = 1000  # 流式返回时每块包含的预测值个数
+
+
+def _to_features(rows):
+    """
+    把行列表整体转换为 (n, 3) 的 float64 数组并校验
+
+    整体转换失败时才逐行查找出错的记录，用于给出具体的序号（从 1 开始）
+
+    Raises:
+        ValueError: 没有数据、超过 MAX_BATCH_ROWS、存在缺失 / 非数值 / 非有限值
+    """
+    if not rows:
+        raise ValueError("没有需要预测的数据")
+    if len(rows) > MAX_BATCH_ROWS:
+        raise ValueError(f"单次最多预测 {MAX_BATCH_ROWS} 条记录")
+
+    try:
+        features = np.array(rows, dtype=np.float64)
+    except (TypeError, ValueError):
+        features = None
+    if features is None or features.shape != (len(rows), len(FEATURE_FIELDS)):
+        for i, row in enumerate(rows):
+            try:
+                values = np.array(row, dtype=np.float64)
+            except (TypeError, ValueError):
+                values = None
+            if values is None or values.shape != (len(FEATURE_FIELDS),):
+                raise ValueError(f"第 {i + 1} 条记录无效: 需要 {', '.join(FEATURE_FIELDS)} 三个数值")
+        raise ValueError("输入数据格式无效")
+
+    invalid = np.flatnonzero(~np.isfinite(features).all(axis=1))
+    if invalid.size:
+        # 缺失值（None / 空单元格）转换后为 NaN，与非有限数值一起在这里检出
+        raise ValueError(f"第 {invalid[0] + 1} 条记录包含缺失值或非有限数值")
+    return features
+
+
+def parse_json_batch(payload):
+    """
+    解析 JSON 请求体
+
+    支持三种形式：[{"weight": .., "height": .., "width": ..}, ...]、
+    [[weight, height, width], ...]，或把上述数组放在 {"items": [...]} 中
+
+    Returns:
+        numpy.ndarray: (n, 3) 的特征数组
+
+    Raises:
+        ValueError: 请求体格式无效
+    """
+    items = payload.get('items') if isinstance(payload, dict) else payload
+    if not isinstance(items, list):
+        raise ValueError("请求体需要是 JSON 数组或包含 items 数组的对象")
+    rows = [
+        [item.get(field) for field in FEATURE_FIELDS] if isinstance(item, dict) else item
+        for item in items
+    ]
+    return _to_features(rows)
+
+
+def parse_csv_batch(stream):
+    """
+    解析上传的 CSV 文件（UTF-8，第一行为表头，需包含体重、高度和宽度三列）
+
+    Args:
+        stream: 二进制文件流（如 request.files['file'].stream）
+
+    Returns:
+        numpy.ndarray: (n, 3) 的特征数组
+
+    Raises:
+        ValueError: 缺少必需列或数据无效
+    """
+    reader = csv.reader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+    header = next(reader, None)
+    if header is None:
+        raise ValueError("CSV文件为空")
+    positions = {}
+    for index, name in enumerate(header):
+        field = CSV_FIELD_ALIASES.get(name.strip().lower())
+        if field and field not in positions:
+            positions[field] = index
+    missing = [field for field in FEATURE_FIELDS if field not in positions]
+    if missing:
+        raise ValueError(f"CSV文件缺少必需列: {', '.join(missing)}")
+
+    columns = [positions[field] for field in FEATURE_FIELDS]
+    width = max(columns) + 1
+    rows = [
+        [row[i].strip() or None for i in columns] if len(row) >= width else row
+        for row in reader if any(cell.strip() for cell in row)
+    ]
+    return _to_features(rows)
+
+
+def predict_lengths(model, features):
+    """对整个特征数组调用一次 model.predict，返回 float64 数组"""
+    return np.asarray(model.predict(features), dtype=np.float64)
+
+
+def stream_predictions(predictions, model_version=None, chunk_rows=STREAM_CHUNK_ROWS):
+    """
+    把预测结果分块序列化为 JSON: {"count": n, "length_predictions": [...], "model_version": ..}
+
+    逐块生成，大批量时不需要在内存中拼出完整的响应体
+    """
+    yield f'{{"count":{len(predictions)},"length_predictions":['
+    for start in range(0, len(predictions), chunk_rows):
+        chunk = json.dumps(predictions[start:start + chunk_rows].tolist(), separators=(',', ':'))[1:-1]
+        yield chunk if start == 0 else ',' + chunk
+    yield f'],"model_version":{json.dumps(model_version)}}}'
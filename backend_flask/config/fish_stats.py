@@ -0,0 +1,172 @@
+"""
+鱼类物种汇总维护
+fish_species_stats 表按鱼种保存样本数、和、平方和以及长度×宽度之和，
+导入观测数据后按 fish_observations 重新计算涉及的鱼种（结果只取决于基础表，
+重复调用或重复导入不会重复累加）。/visualize-fish 的平均重量、
+平均长度 / 宽度和长度-宽度相关系数都由这些汇总直接算出，计算量只与鱼种数有关，
+不随观测记录增长
+
+长度和宽度的统计只使用两者都不为空的记录（与相关系数的样本一致）
+
+命令行回填（在 backend_flask 目录下）:
+    python -m config.fish_stats
+"""
+
+import math
+
+_STATS_COLUMNS = """
+    (species_id, sample_count, weight_count, weight_sum, weight_sq_sum,
+     pair_count, length_sum, length_sq_sum, width_sum, width_sq_sum, length_width_sum)
+"""
+
+# 长度和宽度都不为空的记录才计入成对统计
+_PAIR = "body_length1 IS NOT NULL AND body_width IS NOT NULL"
+
+_SELECT_AGGREGATES = f"""
+SELECT species_id, COUNT(*), COUNT(body_weight),
+       IFNULL(SUM(body_weight), 0), IFNULL(SUM(body_weight * body_weight), 0),
+       SUM(CASE WHEN {_PAIR} THEN 1 ELSE 0 END),
+       IFNULL(SUM(CASE WHEN {_PAIR} THEN body_length1 END), 0),
+       IFNULL(SUM(CASE WHEN {_PAIR} THEN body_length1 * body_length1 END), 0),
+       IFNULL(SUM(CASE WHEN {_PAIR} THEN body_width END), 0),
+       IFNULL(SUM(CASE WHEN {_PAIR} THEN body_width * body_width END), 0),
+       IFNULL(SUM(CASE WHEN {_PAIR} THEN body_length1 * body_width END), 0)
+FROM fish_observations{{conditions}}
+GROUP BY species_id
+"""
+
+# 汇总都按基础表完整计算，已有的行直接覆盖（并发刷新同一鱼种时结果相同）
+_ON_DUPLICATE = """
+ON DUPLICATE KEY UPDATE
+    sample_count = VALUES(sample_count),
+    weight_count = VALUES(weight_count),
+    weight_sum = VALUES(weight_sum),
+    weight_sq_sum = VALUES(weight_sq_sum),
+    pair_count = VALUES(pair_count),
+    length_sum = VALUES(length_sum),
+    length_sq_sum = VALUES(length_sq_sum),
+    width_sum = VALUES(width_sum),
+    width_sq_sum = VALUES(width_sq_sum),
+    length_width_sum = VALUES(length_width_sum)
+"""
+
+SELECT_SPECIES_STATS = """
+SELECT s.common_name, st.sample_count, st.weight_count, st.weight_sum, st.weight_sq_sum,
+       st.pair_count, st.length_sum, st.length_sq_sum, st.width_sum, st.width_sq_sum,
+       st.length_width_sum
+FROM fish_species_stats st
+JOIN fish_species s ON s.species_id = st.species_id
+WHERE st.sample_count > 0
+ORDER BY s.common_name
+"""
+
+
+def refresh_species_stats(cursor, species_ids):
+    """
+    按 fish_observations 的全部记录重新计算若干鱼种的汇总
+
+    导入观测数据后传入新记录涉及的鱼种，与 rebuild_species_stats 的计算相同，
+    只是限定在这些鱼种上
+
+    Args:
+        cursor: 数据库游标（由调用方负责提交事务）
+        species_ids (iterable): 鱼种 ID
+
+    Returns:
+        int: 受影响的行数
+    """
+    species_ids = sorted(set(species_ids))
+    if not species_ids:
+        return 0
+    placeholders = ', '.join(['%s'] * len(species_ids))
+    cursor.execute(f"DELETE FROM fish_species_stats WHERE species_id IN ({placeholders})", species_ids)
+    query = (
+        "INSERT INTO fish_species_stats" + _STATS_COLUMNS
+        + _SELECT_AGGREGATES.format(conditions=f" WHERE species_id IN ({placeholders})")
+        + _ON_DUPLICATE
+    )
+    cursor.execute(query, species_ids)
+    return cursor.rowcount
+
+
+def rebuild_species_stats(cursor):
+    """清空并按全部观测记录重建鱼种汇总（用于首次部署或历史数据变更后）"""
+    cursor.execute("DELETE FROM fish_species_stats")
+    cursor.execute(
+        "INSERT INTO fish_species_stats" + _STATS_COLUMNS
+        + _SELECT_AGGREGATES.format(conditions="")
+    )
+    return cursor.rowcount
+
+
+def mean(total, count):
+    """由和与样本数求平均值，没有样本时为 NaN"""
+    return float(total) / count if count else math.nan
+
+
+def variance(total, sq_total, count):
+    """由和与平方和求样本方差（n-1），样本少于 2 个时为 NaN"""
+    if count < 2:
+        return math.nan
+    return max(float(sq_total) - float(total) ** 2 / count, 0.0) / (count - 1)
+
+
+def correlation(x_sum, x_sq_sum, y_sum, y_sq_sum, xy_sum, count):
+    """由和、平方和与乘积和求 Pearson 相关系数，无法计算时为 NaN"""
+    if count < 2:
+        return math.nan
+    x_sum, y_sum = float(x_sum), float(y_sum)
+    covariance = float(xy_sum) - x_sum * y_sum / count
+    x_spread = float(x_sq_sum) - x_sum ** 2 / count
+    y_spread = float(y_sq_sum) - y_sum ** 2 / count
+    if x_spread <= 0 or y_spread <= 0:
+        return math.nan
+    return covariance / math.sqrt(x_spread * y_spread)
+
+
+def species_summary(row):
+    """
+    把 SELECT_SPECIES_STATS 的一行转换为图表需要的统计值
+
+    Returns:
+        dict: {'species', 'avg_weight', 'stats': {'sample_size', 'avg_length', 'avg_width', 'correlation'}}
+    """
+    pair_count = row['pair_count']
+    return {
+        'species': row['common_name'],
+        'avg_weight': mean(row['weight_sum'], row['weight_count']),
+        'stats': {
+            'sample_size': int(row['sample_count']),
+            'avg_length': mean(row['length_sum'], pair_count),
+            'avg_width': mean(row['width_sum'], pair_count),
+            'correlation': correlation(
+                row['length_sum'], row['length_sq_sum'], row['width_sum'], row['width_sq_sum'],
+                row['length_width_sum'], pair_count
+            ),
+        },
+    }
+
+
+if __name__ == "__main__":
+    import os
+    import mysql.connector
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    conn = mysql.connector.connect(
+        host=os.environ.get('MYSQL_HOST', 'localhost'),
+        user=os.environ.get('MYSQL_USER', 'root'),
+        password=os.environ.get('MYSQL_PASSWORD', '123456'),
+        database=os.environ.get('MYSQL_DATABASE', 'water_quality_monitoring')
+    )
+    cursor = conn.cursor()
+    try:
+        count = rebuild_species_stats(cursor)
+        conn.commit()
+        print(f"已重建 {count} 个鱼种的汇总")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
@@ -0,0 +1,95 @@
+"""
+线性模型快速预测
+LinearRegression 等线性模型的 predict 就是 X·coef + intercept，三个特征时真正的计算
+只有几次乘加，耗时主要花在 scikit-learn 的输入校验和数组转换上。模型加载时把
+暴露 coef_ / intercept_ 的回归模型编译为 LinearPredictor：
+
+- predict_one：单条记录直接用 Python 浮点数做乘加，不创建任何数组（约 1 微秒以内）
+- predict：批量记录用一次矩阵乘法，与 scikit-learn 线性模型的计算方式相同
+
+编译后会用一组探测输入与 model.predict 的结果比对，不一致（如 PLS 这类预测前会
+先中心化输入的模型，或分类器）时放弃编译，继续使用 scikit-learn 的 predict
+"""
+
+import warnings
+
+import numpy as np
+
+PROBE_ROWS = 16
+PROBE_RTOL = 1e-9
+
+
+class LinearPredictor:
+    """与线性回归模型等价的点积计算"""
+
+    def __init__(self, coef, intercept):
+        self.coef = coef
+        self.intercept = intercept
+        self.n_features = coef.size
+        self._coef_values = coef.tolist()
+
+    def predict(self, features):
+        """批量预测，features 为 (n, n_features) 的数组"""
+        features = np.asarray(features, dtype=np.float64)
+        if features.ndim != 2 or features.shape[1] != self.n_features:
+            raise ValueError(f"输入需要 {self.n_features} 个特征")
+        return features @ self.coef + self.intercept
+
+    def predict_one(self, *values):
+        """单条预测，values 为按特征顺序排列的数值，返回 float"""
+        if len(values) != self.n_features:
+            raise ValueError(f"输入需要 {self.n_features} 个特征")
+        total = 0.0
+        for coef, value in zip(self._coef_values, values):
+            total += coef * float(value)
+        return total + self.intercept
+
+
+def _linear_parameters(model):
+    """取出单输出线性模型的 (coef, intercept)，不是线性模型时返回 None"""
+    coef = getattr(model, 'coef_', None)
+    intercept = getattr(model, 'intercept_', None)
+    if coef is None or intercept is None:
+        return None
+    try:
+        coef = np.array(coef, dtype=np.float64)  # 复制一份，不再引用内存映射的数组
+        intercept = np.asarray(intercept, dtype=np.float64).reshape(-1)
+    except (TypeError, ValueError):
+        return None
+    if coef.ndim == 2 and coef.shape[0] == 1:
+        coef = coef[0]
+    if coef.ndim != 1 or intercept.size != 1 or not np.isfinite(coef).all():
+        return None
+    return coef, float(intercept[0])
+
+
+def compile_linear(model):
+    """
+    把线性回归模型编译为 LinearPredictor
+
+    Returns:
+        LinearPredictor: 编译成功时返回；模型不是单输出线性模型，或探测结果与
+        model.predict 不一致时返回 None（调用方继续使用 model.predict）
+    """
+    parameters = _linear_parameters(model)
+    if parameters is None:
+        return None
+    predictor = LinearPredictor(*parameters)
+
+    # 探测输入覆盖正负值和不同量级，确认 predict 确实只是 X·coef + intercept
+    rng = np.random.default_rng(0)
+    probe = rng.uniform(-1.0, 1.0, (PROBE_ROWS, predictor.n_features)) * np.logspace(0, 3, PROBE_ROWS)[:, None]
+    try:
+        with warnings.catch_warnings():
+            # 用 DataFrame 训练的模型收到数组时会提示缺少列名，不影响结果
+            warnings.simplefilter('ignore')
+            expected = np.asarray(model.predict(probe), dtype=np.float64).reshape(-1)
+    except Exception:
+        return None
+    if expected.shape != (PROBE_ROWS,):
+        return None
+    actual = predictor.predict(probe)
+    scale = max(float(np.abs(expected).max()), 1.0)
+    if not np.allclose(actual, expected, rtol=PROBE_RTOL, atol=PROBE_RTOL * scale):
+        return None
+    return predictor
@@ -0,0 +1,152 @@
+"""
+统一日志配置
+app.py、routes/ 和 config/ 下的模块都通过 logging.getLogger(__name__) 记录日志：
+
+- 根日志器只挂一个 QueueHandler，请求线程只负责把记录放入队列，
+  由 QueueListener 后台线程写入 RotatingFileHandler（logs/app.log）和控制台
+- 各模块的日志级别可通过 LOG_LEVELS 环境变量单独设置，
+  如 "config.DataVisualization=DEBUG,routes.fish_recognition=WARNING"
+- 逐条记录类的高频日志通过 extra=sampled(n) 每 n 条只保留 1 条
+- 进程池的工作进程中没有 QueueListener 线程，由 setup_worker_logging 改为
+  直接写入 stderr 和 logs/worker.log
+
+记录日志时使用 % 风格参数（logger.info("共 %d 条", count)），
+级别未开启时不会格式化消息
+"""
+
+import atexit
+import logging
+import os
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+LOG_DIR = 'logs'
+LOG_FILE = os.path.join(LOG_DIR, 'app.log')
+WORKER_LOG_FILE = os.path.join(LOG_DIR, 'worker.log')
+LOG_FORMAT = '%(asctime)s %(levelname)s %(name)s: %(message)s [in %(pathname)s:%(lineno)d]'
+
+# 默认日志级别；第三方库默认只记录警告
+DEFAULT_LEVEL = 'INFO'
+DEFAULT_MODULE_LEVELS = {
+    'werkzeug': 'WARNING',
+    'urllib3': 'WARNING',
+    'matplotlib': 'WARNING',
+    'PIL': 'WARNING',
+}
+
+_listener = None
+_setup_lock = threading.Lock()
+
+
+def sampled(every):
+    """为高频日志生成 extra 参数：同一调用点每 every 条只记录 1 条"""
+    return {'sample_every': every}
+
+
+class SamplingFilter(logging.Filter):
+    """按调用点计数采样带有 sample_every 属性的日志记录"""
+
+    def __init__(self):
+        super().__init__()
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        every = getattr(record, 'sample_every', None)
+        if not every or every <= 1:
+            return True
+        key = (record.pathname, record.lineno)
+        with self._lock:
+            count = self._counts.get(key, 0)
+            self._counts[key] = count + 1
+        return count % every == 0
+
+
+def parse_module_levels(value):
+    """解析 "模块=级别,模块=级别" 格式的字符串"""
+    levels = {}
+    for item in (value or '').split(','):
+        if '=' not in item:
+            continue
+        name, level = item.split('=', 1)
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def _apply_levels(level=None, module_levels=None):
+    """设置根日志器和各模块的日志级别，返回根日志器"""
+    root = logging.getLogger()
+    root.setLevel(level or os.environ.get('LOG_LEVEL', DEFAULT_LEVEL).upper())
+
+    levels = dict(DEFAULT_MODULE_LEVELS)
+    levels.update(module_levels or {})
+    levels.update(parse_module_levels(os.environ.get('LOG_LEVELS')))
+    for name, module_level in levels.items():
+        logging.getLogger(name).setLevel(module_level)
+    return root
+
+
+def setup_logging(level=None, module_levels=None, log_file=LOG_FILE, console_level=None):
+    """
+    初始化全局日志（重复调用无副作用）
+
+    Args:
+        level (str): 根日志级别，默认取 LOG_LEVEL 环境变量或 INFO
+        module_levels (dict): 模块名到日志级别的映射，会与 LOG_LEVELS 环境变量合并
+        log_file (str): 日志文件路径
+        console_level (str): 控制台输出级别，默认取 LOG_CONSOLE_LEVEL 环境变量或 WARNING
+    """
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return
+
+        os.makedirs(os.path.dirname(log_file) or '.', exist_ok=True)
+        formatter = logging.Formatter(LOG_FORMAT)
+
+        file_handler = RotatingFileHandler(
+            log_file,
+            maxBytes=1024 * 1024 * 10,  # 10MB
+            backupCount=10,
+            encoding='utf-8'
+        )
+        file_handler.setFormatter(formatter)
+
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(formatter)
+        console_handler.setLevel(console_level or os.environ.get('LOG_CONSOLE_LEVEL', 'WARNING').upper())
+
+        # 采样在放入队列前完成，被丢弃的记录不会进入后台线程
+        log_queue = queue.SimpleQueue()
+        queue_handler = QueueHandler(log_queue)
+        queue_handler.addFilter(SamplingFilter())
+
+        root = _apply_levels(level, module_levels)
+        root.addHandler(queue_handler)
+
+        _listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+
+def setup_worker_logging(log_file=WORKER_LOG_FILE):
+    """
+    工作进程的日志配置（进程池初始化函数中调用）
+
+    移除从父进程继承的处理器（QueueHandler 写入的队列在工作进程中没有线程读取），
+    改为直接写入 stderr 和 log_file。多个工作进程追加写同一个文件，因此不做轮转
+    """
+    root = _apply_levels()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+
+    os.makedirs(os.path.dirname(log_file) or '.', exist_ok=True)
+    formatter = logging.Formatter('%(process)d ' + LOG_FORMAT)
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(os.environ.get('LOG_CONSOLE_LEVEL', 'WARNING').upper())
+    for handler in (logging.FileHandler(log_file, encoding='utf-8'), console_handler):
+        handler.setFormatter(formatter)
+        handler.addFilter(SamplingFilter())
+        root.addHandler(handler)
@@ -0,0 +1,87 @@
+"""
+按内存大小限制的 LRU 缓存
+条目数量不固定，所有条目的估算字节数之和超过上限时淘汰最久未使用的条目，
+适合缓存大小差异很大的对象（如解析后的 DataFrame）
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class SizedLRUCache:
+    """线程安全、按总字节数淘汰的 LRU 缓存"""
+
+    def __init__(self, max_bytes, sizeof):
+        """
+        Args:
+            max_bytes (int): 缓存总大小上限（字节）
+            sizeof (callable): 估算单个缓存值字节数的函数
+        """
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        """读取缓存并标记为最近使用，未命中时返回 default"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        """
+        写入缓存并按需淘汰旧条目
+
+        单个值超过总上限时不缓存
+
+        Returns:
+            bool: 是否已缓存
+        """
+        size = self._sizeof(value)
+        with self._lock:
+            self._discard(key)
+            if size > self.max_bytes:
+                return False
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+            return True
+
+    def pop(self, key):
+        """移除指定条目（不存在时忽略）"""
+        with self._lock:
+            self._discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        """返回缓存统计信息"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.current_bytes -= entry[1]
@@ -0,0 +1,307 @@
+"""
+体长预测模型注册表
+每次训练（trainModel.py）生成一个版本目录，保存模型和元数据：
+
+    models/fish_length/
+        ACTIVE                      当前生效的版本号
+        20250101120000123-1a2b3c4d/
+            model.joblib            joblib.dump 的模型（不压缩，加载时可内存映射）
+            metadata.json           特征列表、评估指标、训练数据哈希等
+
+服务端通过 ModelRegistry 使用模型：
+
+- 模型以 joblib.load(mmap_mode='r') 加载，numpy 数组映射为只读内存页，
+  多个工作进程加载同一版本时共享这些页
+- 每次取模型只做一次 os.stat 检查 ACTIVE 文件；发生变化时在后台线程加载新版本，
+  加载完成前继续使用旧版本，加载完成后整体替换引用（请求要么用旧版本要么用新版本）
+- 也可以通过接口调用 reload 立即切换（会更新 ACTIVE，其他工作进程随后自动跟进）
+- 注册表中没有任何版本时回退到 backend_flask/fish_length_model.pkl（版本号 legacy）
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+
+from config.linear_predictor import compile_linear
+
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL_REGISTRY_DIR = os.environ.get('FISH_MODEL_DIR', os.path.join(BACKEND_DIR, 'models', 'fish_length'))
+LEGACY_MODEL_PATH = os.path.join(BACKEND_DIR, 'fish_length_model.pkl')
+LEGACY_VERSION = 'legacy'
+
+ACTIVE_FILE = 'ACTIVE'
+MODEL_FILE = 'model.joblib'
+METADATA_FILE = 'metadata.json'
+
+# 与 trainModel.py 的特征顺序一致
+DEFAULT_FEATURES = ['Weight(g)', 'Height(cm)', 'Width(cm)']
+
+
+class ModelNotFound(Exception):
+    """指定的模型版本不存在"""
+
+
+class LoadedModel:
+    """
+    已加载的模型版本（只读）
+
+    线性回归模型在加载时编译为 LinearPredictor（见 linear_predictor），预测不再经过
+    scikit-learn 的输入校验；其他模型使用 model.predict
+    """
+
+    def __init__(self, version, model, metadata):
+        self.version = version
+        self.model = model
+        self.metadata = metadata
+        self.fast_path = compile_linear(model)
+
+    def predict(self, features):
+        if self.fast_path is not None:
+            return self.fast_path.predict(features)
+        return self.model.predict(features)
+
+    def predict_one(self, *values):
+        """单条预测，values 为按特征顺序排列的数值，返回 float"""
+        if self.fast_path is not None:
+            return self.fast_path.predict_one(*values)
+        return float(self.model.predict([list(values)])[0])
+
+
+def file_sha256(path):
+    """计算文件的 SHA-256，用于记录训练数据的哈希"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_atomic(path, text):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def list_versions(registry_dir=MODEL_REGISTRY_DIR):
+    """返回注册表中的全部版本号（按时间升序）"""
+    if not os.path.isdir(registry_dir):
+        return []
+    return sorted(
+        name for name in os.listdir(registry_dir)
+        if not name.startswith('.') and os.path.isfile(os.path.join(registry_dir, name, MODEL_FILE))
+    )
+
+
+def active_version(registry_dir=MODEL_REGISTRY_DIR):
+    """读取 ACTIVE 指定的版本，没有时取最新版本，注册表为空时返回 None"""
+    try:
+        with open(os.path.join(registry_dir, ACTIVE_FILE), encoding='utf-8') as f:
+            version = f.read().strip()
+        if version:
+            return version
+    except FileNotFoundError:
+        pass
+    versions = list_versions(registry_dir)
+    return versions[-1] if versions else None
+
+
+def read_metadata(version, registry_dir=MODEL_REGISTRY_DIR):
+    path = os.path.join(registry_dir, version, METADATA_FILE)
+    if not os.path.isfile(path):
+        return {'version': version}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def activate_version(version, registry_dir=MODEL_REGISTRY_DIR):
+    """
+    把 ACTIVE 原子地指向 version，各工作进程在下一次取模型时切换
+
+    Raises:
+        ModelNotFound: 版本不存在
+    """
+    if version not in list_versions(registry_dir):
+        raise ModelNotFound(f"模型版本不存在: {version}")
+    _write_atomic(os.path.join(registry_dir, ACTIVE_FILE), version + '\n')
+
+
+def register_model(model, features=DEFAULT_FEATURES, metrics=None, training_data=None,
+                   registry_dir=MODEL_REGISTRY_DIR, activate=True, **extra):
+    """
+    保存一个新的模型版本
+
+    版本目录先写入临时目录再整体重命名，加载方不会看到写了一半的版本
+
+    Args:
+        model: 已训练的模型
+        features (list[str]): 特征列表（顺序即 predict 的输入顺序）
+        metrics (dict): 评估指标，如 {'mse': .., 'r2': ..}
+        training_data (str): 训练数据文件路径，记录其 SHA-256
+        activate (bool): 是否同时设为当前版本
+        extra: 其他需要写入元数据的字段
+
+    Returns:
+        str: 新版本号
+    """
+    import joblib
+
+    now = datetime.now()
+    created_at = now.isoformat(timespec='seconds')
+    data_hash = file_sha256(training_data) if training_data else None
+    seed = f"{now.isoformat()}:{data_hash}:{os.getpid()}:{time.time_ns()}"
+    # 时间戳精确到毫秒，版本号按字符串排序即按创建时间排序
+    version = now.strftime('%Y%m%d%H%M%S%f')[:17] + '-' + hashlib.sha256(seed.encode()).hexdigest()[:8]
+
+    metadata = {
+        'version': version,
+        'created_at': created_at,
+        'model_type': type(model).__name__,
+        'features': list(features),
+        'metrics': metrics or {},
+        'training_data': os.path.basename(training_data) if training_data else None,
+        'training_data_sha256': data_hash,
+        **extra,
+    }
+    try:
+        import sklearn
+        metadata['sklearn_version'] = sklearn.__version__
+    except ImportError:
+        pass
+
+    os.makedirs(registry_dir, exist_ok=True)
+    tmp_dir = os.path.join(registry_dir, f".{version}.tmp")
+    os.makedirs(tmp_dir)
+    try:
+        # 不压缩，加载时才能以 mmap_mode 映射数组
+        joblib.dump(model, os.path.join(tmp_dir, MODEL_FILE))
+        with open(os.path.join(tmp_dir, METADATA_FILE), 'w', encoding='utf-8') as f:
+            json.dump(metadata, f, ensure_ascii=False, indent=2)
+        os.rename(tmp_dir, os.path.join(registry_dir, version))
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    if activate:
+        activate_version(version, registry_dir)
+    return version
+
+
+class ModelRegistry:
+    """常驻内存的当前模型，ACTIVE 变化后在后台加载新版本并原子替换"""
+
+    def __init__(self, registry_dir=MODEL_REGISTRY_DIR, legacy_path=LEGACY_MODEL_PATH):
+        self.registry_dir = registry_dir
+        self.legacy_path = legacy_path
+        self._active = None
+        self._active_stamp = None
+        self._load_lock = threading.Lock()
+        self._loading = False
+
+    def _stamp(self):
+        try:
+            stat = os.stat(os.path.join(self.registry_dir, ACTIVE_FILE))
+            return stat.st_mtime_ns, stat.st_size
+        except FileNotFoundError:
+            return None
+
+    def _load(self, version):
+        """加载指定版本（version 为 None 时回退到 legacy 模型）"""
+        import joblib
+
+        if version is None or version == LEGACY_VERSION:
+            if not os.path.isfile(self.legacy_path):
+                raise ModelNotFound("注册表中没有模型，且未找到 fish_length_model.pkl")
+            model = joblib.load(self.legacy_path, mmap_mode='r')
+            return LoadedModel(LEGACY_VERSION, model, {'version': LEGACY_VERSION, 'features': DEFAULT_FEATURES})
+
+        path = os.path.join(self.registry_dir, version, MODEL_FILE)
+        if not os.path.isfile(path):
+            raise ModelNotFound(f"模型版本不存在: {version}")
+        model = joblib.load(path, mmap_mode='r')
+        return LoadedModel(version, model, read_metadata(version, self.registry_dir))
+
+    def _swap(self, loaded, stamp):
+        # 单次引用赋值，正在处理的请求仍持有旧版本
+        self._active = loaded
+        self._active_stamp = stamp
+        logger.info("体长预测模型已切换到版本 %s", loaded.version)
+
+    def _background_reload(self, stamp):
+        try:
+            self._swap(self._load(active_version(self.registry_dir)), stamp)
+        except Exception as e:
+            # 新版本加载失败时继续使用旧版本，同一 ACTIVE 不再重试
+            self._active_stamp = stamp
+            logger.warning("模型加载失败，继续使用版本 %s: %s",
+                           self._active.version if self._active else None, e)
+        finally:
+            self._loading = False
+
+    def current(self):
+        """
+        返回当前模型；第一次调用时同步加载，之后 ACTIVE 变化时在后台加载
+
+        Returns:
+            LoadedModel: 当前模型，没有可用模型时为 None
+        """
+        stamp = self._stamp()
+        active = self._active
+        if active is not None:
+            if stamp != self._active_stamp and not self._loading:
+                with self._load_lock:
+                    if not self._loading and stamp != self._active_stamp:
+                        self._loading = True
+                        threading.Thread(target=self._background_reload, args=(stamp,), daemon=True).start()
+            return active
+
+        with self._load_lock:
+            if self._active is None:
+                try:
+                    self._swap(self._load(active_version(self.registry_dir)), stamp)
+                except Exception as e:
+                    logger.warning("模型加载失败: %s", e)
+                    return None
+            return self._active
+
+    def reload(self, version=None):
+        """
+        立即加载并切换到指定版本（默认 ACTIVE 指定的版本）
+
+        指定版本时先在调用线程中加载，加载成功后才更新 ACTIVE 并切换，
+        其他工作进程随后在后台跟进；加载失败时 ACTIVE 和当前模型都保持不变。
+        加载期间其他请求继续使用旧版本
+
+        Raises:
+            ValueError: 指定了 legacy（它不在注册表中，无法通过 ACTIVE 让所有工作进程切换）
+            ModelNotFound: 版本不存在
+        """
+        if version == LEGACY_VERSION:
+            raise ValueError("legacy 模型不在注册表中，不能作为切换目标")
+        with self._load_lock:
+            if version is None:
+                loaded = self._load(active_version(self.registry_dir))
+            else:
+                if version not in list_versions(self.registry_dir):
+                    raise ModelNotFound(f"模型版本不存在: {version}")
+                loaded = self._load(version)
+                activate_version(version, self.registry_dir)
+            # 在写入 ACTIVE 之后取时间戳，本进程不会再为这次切换触发后台加载
+            self._swap(loaded, self._stamp())
+        return loaded
+
+    def versions(self):
+        """注册表中全部版本的元数据及当前版本号"""
+        active = self._active
+        return {
+            'active_version': active.version if active else None,
+            'fast_path': active.fast_path is not None if active else None,
+            'versions': [read_metadata(version, self.registry_dir) for version in list_versions(self.registry_dir)],
+        }
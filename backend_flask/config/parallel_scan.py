@@ -0,0 +1,200 @@
+"""
+分区并行异常扫描
+跨多年或全部监测点的异常检测按月份或 site_id 区间划分为多个分区，
+在共享进程池（见 process_pool）中并行执行，每个工作进程在第一次扫描时
+创建自己的数据库连接池，各分区结果按 record_id 归并后返回
+
+每个请求带有截止时间：尚未开始的分区在超时后取消，
+正在执行的分区通过 MAX_EXECUTION_TIME 由 MySQL 终止查询，
+避免一个超大查询长时间占用 WSGI 工作线程
+"""
+
+import datetime
+import heapq
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_EXCEPTION, wait
+from operator import itemgetter
+
+from config.anomaly_detection import SOURCE_LIVE, build_anomaly_query, detect_anomalies
+from config.process_pool import shared_process_pool
+
+MYSQL_QUERY_TIMEOUT_ERRNO = 3024  # 查询超过 MAX_EXECUTION_TIME 被终止
+SCAN_FETCH_BATCH_SIZE = 5000  # 工作进程每次从游标读取的条数，读取间隙检查截止时间
+PARTITIONS_PER_WORKER = 2  # 按监测点区间划分时每个工作进程分到的分区数
+# 指定监测点时，日期范围超过该月数才按月并行扫描；更短的单站点查询直接在请求线程中执行
+SINGLE_SITE_PARTITION_MONTHS = int(os.environ.get('ANOMALY_SCAN_SITE_PARTITION_MONTHS', 12))
+
+# 工作进程内的数据库连接池，由 _get_worker_pool 在第一次扫描时创建
+_worker_pool = None
+
+
+class ScanTimeout(Exception):
+    """分区扫描超过请求截止时间"""
+
+
+def _get_worker_pool(db_config):
+    """返回本工作进程的单连接连接池，不存在时创建"""
+    global _worker_pool
+    if _worker_pool is None:
+        from mysql.connector import pooling
+        _worker_pool = pooling.MySQLConnectionPool(
+            pool_name=f"scan_pool_{multiprocessing.current_process().pid}",
+            pool_size=1,
+            **db_config
+        )
+    return _worker_pool
+
+
+def scan_partition(db_config, partition, thresholds, source, deadline, limit=None):
+    """
+    在工作进程中扫描单个分区并返回按 record_id 排序的异常记录
+
+    Args:
+        db_config (dict): 数据库连接参数
+        partition (dict): start_date / end_date / site_id / site_range 过滤条件
+        thresholds (list[dict]): 当前阈值
+        source (str): 异常记录来源（live / materialized）
+        deadline (float): 截止时间（time.time() 时间戳）
+        limit (int): 每个分区最多返回的记录数
+
+    Raises:
+        ScanTimeout: 开始执行或读取过程中已超过截止时间
+    """
+    remaining = deadline - time.time()
+    if remaining <= 0:
+        raise ScanTimeout("分区在开始执行前已超时")
+
+    query, params = build_anomaly_query(thresholds, limit=limit, source=source, **partition)
+    if not query:
+        return []
+
+    conn = _get_worker_pool(db_config).get_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        # 由 MySQL 在剩余时间用完时终止 SELECT，工作进程不会被单个慢查询卡住
+        cursor.execute("SET SESSION MAX_EXECUTION_TIME = %s", (max(int(remaining * 1000), 1),))
+        cursor.execute(query, params)
+        anomalies = []
+        while True:
+            rows = cursor.fetchmany(SCAN_FETCH_BATCH_SIZE)
+            if not rows:
+                break
+            anomalies.extend(detect_anomalies(rows, thresholds))
+            if time.time() > deadline:
+                raise ScanTimeout("分区读取超时")
+        return anomalies
+    except ScanTimeout:
+        raise
+    except Exception as e:
+        if getattr(e, 'errno', None) == MYSQL_QUERY_TIMEOUT_ERRNO:
+            raise ScanTimeout("分区查询超过截止时间被数据库终止") from None
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def _month_starts(start, end):
+    """返回 [start, end] 覆盖的每个自然月的第一天"""
+    month = start.replace(day=1)
+    while month <= end:
+        yield month
+        month = (month + datetime.timedelta(days=32)).replace(day=1)
+
+
+def plan_partitions(start_date=None, end_date=None, site_id=None, site_bounds=None, workers=1):
+    """
+    把一次扫描划分为多个互不重叠的分区
+
+    有完整日期范围且跨多个月时按自然月划分；指定了监测点时只有跨度超过
+    SINGLE_SITE_PARTITION_MONTHS 个月才划分。没有完整日期范围（扫描全部历史）
+    且未指定监测点时，把 site_bounds (最小, 最大 site_id) 等分为若干区间。
+    只有一个工作进程时不划分
+
+    Returns:
+        list[dict]: 分区过滤条件，可直接作为 build_anomaly_query 的关键字参数；
+                    无法划分时只返回一个分区
+    """
+    base = {'start_date': start_date, 'end_date': end_date, 'site_id': site_id}
+
+    if start_date and end_date:
+        start = datetime.date.fromisoformat(str(start_date)[:10])
+        end = datetime.date.fromisoformat(str(end_date)[:10])
+        months = list(_month_starts(start, end))
+        large_enough = not site_id or len(months) > SINGLE_SITE_PARTITION_MONTHS
+        if workers > 1 and len(months) > 1 and large_enough:
+            partitions = []
+            for month in months:
+                next_month = (month + datetime.timedelta(days=32)).replace(day=1)
+                partitions.append({
+                    **base,
+                    'start_date': max(month, start).isoformat(),
+                    'end_date': min(next_month - datetime.timedelta(days=1), end).isoformat(),
+                })
+            return partitions
+
+        return [base]
+
+    if not site_id and site_bounds and site_bounds[0] is not None and workers > 1:
+        low, high = site_bounds
+        count = min(workers * PARTITIONS_PER_WORKER, high - low + 1)
+        step = -(-(high - low + 1) // count)
+        return [
+            {**base, 'site_range': (lo, min(lo + step - 1, high))}
+            for lo in range(low, high + 1, step)
+        ]
+
+    return [base]
+
+
+class ParallelAnomalyScanner:
+    """在进程池中并行扫描分区并按 record_id 归并结果"""
+
+    def __init__(self, db_config, workers):
+        self.db_config = db_config
+        self.workers = workers
+
+    @property
+    def enabled(self):
+        """是否可以并行扫描（配置了多个工作进程且共享进程池已启动）"""
+        return self.workers > 1 and shared_process_pool() is not None
+
+    def scan(self, partitions, thresholds, source=SOURCE_LIVE, timeout=30, limit=None):
+        """
+        并行扫描所有分区
+
+        Args:
+            partitions (list[dict]): plan_partitions 的结果
+            thresholds (list[dict]): 当前阈值
+            source (str): 异常记录来源
+            timeout (float): 本次请求的最长耗时（秒）
+            limit (int): 只需要按 record_id 排序的前 limit 条时传入，每个分区也只取 limit 条
+
+        Returns:
+            list[dict]: 按 record_id 排序的异常记录
+
+        Raises:
+            ScanTimeout: 超过 timeout 仍有分区未完成，未开始的分区已被取消
+        """
+        deadline = time.time() + timeout
+        executor = shared_process_pool()
+        futures = [
+            executor.submit(scan_partition, self.db_config, partition, thresholds, source, deadline, limit)
+            for partition in partitions
+        ]
+
+        done, pending = wait(futures, timeout=timeout, return_when=FIRST_EXCEPTION)
+        failed = [f for f in done if f.exception() is not None]
+        if pending or failed:
+            for future in pending:
+                future.cancel()
+            if failed and not isinstance(failed[0].exception(), ScanTimeout):
+                raise failed[0].exception()
+            raise ScanTimeout(f"异常扫描超过 {timeout} 秒，已取消 {len(pending)} 个未完成分区")
+
+        merged = heapq.merge(*(f.result() for f in futures), key=itemgetter('record_id'))
+        if limit is not None:
+            return [anomaly for _, anomaly in zip(range(limit), merged)]
+        return list(merged)
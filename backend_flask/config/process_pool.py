@@ -0,0 +1,79 @@
+"""
+共享进程池
+异常扫描、水质文件读取和图表渲染共用一个进程池，在应用启动时创建：
+
+- app.py 在初始化日志（启动 QueueListener 线程）和创建数据库连接池之前调用
+  start_process_pool，此时进程中只有主线程。fork 出的工作进程不会继承其他线程
+  正持有的锁（日志、MySQL 连接、matplotlib 等），也不需要重新导入 Flask 主模块
+- 创建后立即提交一个空任务，全部工作进程在启动阶段就 fork 完成，请求线程中不再 fork
+- 工作进程启动时由 init_worker_process 重新配置日志（见 log_config.setup_worker_logging）
+- 没有启动进程池时（命令行脚本、PROCESS_POOL_WORKERS<=1、不支持 fork 的平台），
+  shared_process_pool 返回 None，各功能在调用线程中执行
+
+各功能需要的进程内状态（扫描用的数据库连接、渲染用的字体）由任务在第一次执行时
+按需创建，不依赖进程池的初始化函数
+"""
+
+import atexit
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from config.log_config import setup_worker_logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROCESS_POOL_WORKERS = min(4, os.cpu_count() or 1)
+
+_executor = None
+
+
+def init_worker_process():
+    """进程池初始化函数：替换从父进程继承的日志配置"""
+    setup_worker_logging()
+
+
+def start_process_pool(workers=None):
+    """
+    创建共享进程池并立即启动全部工作进程（重复调用无副作用）
+
+    必须在启动任何后台线程之前调用。workers 默认取 PROCESS_POOL_WORKERS 环境变量
+    （在调用时读取，.env 中的配置同样生效）
+
+    Returns:
+        ProcessPoolExecutor: 进程池；workers<=1 或平台不支持 fork 时为 None
+    """
+    global _executor
+    if workers is None:
+        workers = int(os.environ.get('PROCESS_POOL_WORKERS', DEFAULT_PROCESS_POOL_WORKERS))
+    if _executor is not None or workers <= 1:
+        return _executor
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        # spawn 方式的工作进程会重新导入主模块（app.py），此时在调用线程中执行
+        logger.warning("当前平台不支持 fork，不启用进程池")
+        return None
+
+    executor = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('fork'),
+        initializer=init_worker_process
+    )
+    # fork 方式在第一次提交任务时一次启动全部工作进程
+    executor.submit(os.getpid).result()
+    _executor = executor
+    atexit.register(shutdown_process_pool)
+    return executor
+
+
+def shared_process_pool():
+    """返回共享进程池，未启动时返回 None"""
+    return _executor
+
+
+def shutdown_process_pool():
+    """关闭共享进程池并取消排队中的任务"""
+    global _executor
+    executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
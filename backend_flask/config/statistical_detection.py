@@ -0,0 +1,332 @@
+"""
+水质统计异常检测
+在固定阈值之外，按监测点计算滚动统计量识别缓慢漂移和站点特有的异常：
+
+- zscore: 每个监测点最近 window 次观测的滚动均值 / 标准差
+- mad: 每个监测点最近 window 次观测的滚动中位数 / 中位数绝对偏差（对离群值稳健）
+- seasonal: water_quality_baselines 表中该监测点同月份的历史基线
+
+记录按 (site_id, 日期, 时间) 排序后，滚动窗口只取同一监测点的前 window 次观测
+（不含当前值），全部用 NumPy 前缀和与滑动窗口视图按列向量化计算
+"""
+
+import datetime
+import math
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from config.anomaly_detection import (
+    PARAMETER_COLUMNS, RECORD_COLUMNS, build_filter_conditions, format_water_quality_value,
+    load_parameter_matrix, select_parameter_columns
+)
+
+METHOD_THRESHOLD = 'threshold'
+METHOD_ZSCORE = 'zscore'
+METHOD_MAD = 'mad'
+METHOD_SEASONAL = 'seasonal'
+STATISTICAL_METHODS = (METHOD_ZSCORE, METHOD_MAD, METHOD_SEASONAL)
+DETECTION_METHODS = (METHOD_THRESHOLD,) + STATISTICAL_METHODS
+
+DEFAULT_WINDOW = 30  # 滚动窗口（观测次数），约为 4 小时一次观测下的 5 天
+MIN_PERIODS = 10  # 窗口 / 基线中至少需要的有效样本数
+DEFAULT_SCORE_THRESHOLD = 3.0  # 偏离超过多少个标准差（或标准化 MAD）视为异常
+MAD_SCALE = 1.4826  # 正态分布下 MAD 与标准差的换算系数
+OBSERVATIONS_PER_DAY = 6  # 每个监测点每天的观测次数，用于估算滚动窗口需要回溯的天数
+MAD_CHUNK_ROWS = 50000  # 计算滚动中位数时每块的行数，限制窗口矩阵的内存占用
+# 前缀和相减的舍入误差与累计平方和成正比，窗口离差平方和低于该比例时视为常数窗口
+ZSCORE_VARIANCE_RTOL = 1e-12
+
+_REASON_TEMPLATES = {
+    METHOD_ZSCORE: "{col}值{value}偏离站点滚动均值{center:.4g}达{score:.1f}个标准差",
+    METHOD_MAD: "{col}值{value}偏离站点滚动中位数{center:.4g}达{score:.1f}倍MAD",
+    METHOD_SEASONAL: "{col}值{value}偏离站点{month}月基线均值{center:.4g}达{score:.1f}个标准差",
+}
+
+
+def lookback_days(window):
+    """滚动窗口需要在查询开始日期之前额外读取的天数"""
+    return math.ceil(window / OBSERVATIONS_PER_DAY) + 1
+
+
+def build_history_query(start_date=None, end_date=None, site_id=None, lookback=0,
+                        columns=PARAMETER_COLUMNS):
+    """
+    构建统计检测读取记录的查询，按 (site_id, 日期, 时间) 排序
+
+    lookback 大于 0 时从 start_date 之前 lookback 天开始读取，
+    使查询窗口内最早的记录也有完整的滚动历史
+
+    Raises:
+        ValueError: start_date 不是 YYYY-MM-DD 格式
+    """
+    if start_date and lookback:
+        try:
+            start = datetime.date.fromisoformat(str(start_date)[:10])
+        except ValueError:
+            raise ValueError(f"无效的开始日期: {start_date}")
+        start_date = (start - datetime.timedelta(days=lookback)).isoformat()
+
+    conditions, params = build_filter_conditions(start_date, end_date, site_id)
+    query = f"SELECT {', '.join(RECORD_COLUMNS + select_parameter_columns(columns))} FROM water_quality"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY site_id, monitoring_date, monitoring_time, record_id"
+    return query, params
+
+
+def _group_layout(site_ids):
+    """返回按监测点排序后的组编号和每行所在组的起始下标"""
+    is_start = np.empty(len(site_ids), dtype=bool)
+    is_start[:1] = True
+    is_start[1:] = site_ids[1:] != site_ids[:-1]
+    codes = np.cumsum(is_start) - 1
+    starts = np.flatnonzero(is_start)
+    return codes, starts[codes]
+
+
+def rolling_zscore(values, site_ids, window=DEFAULT_WINDOW, min_periods=MIN_PERIODS):
+    """
+    按监测点计算每个值相对其前 window 次观测的 z 分数
+
+    用前缀和一次算出所有窗口的和与平方和，窗口起点截断到所在监测点的第一行；
+    求和前先按组去均值，避免大数值参数（如藻密度）的平方和损失精度
+
+    Args:
+        values (np.ndarray): (记录数, 参数数) 矩阵，已按监测点排序，缺失值为 NaN
+        site_ids (np.ndarray): 每行的监测点 ID
+
+    Returns:
+        tuple: (滚动均值矩阵, z 分数矩阵)，样本不足或标准差为 0 时为 NaN
+    """
+    n, width = values.shape
+    if not n:
+        return np.full((0, width), np.nan), np.full((0, width), np.nan)
+
+    codes, group_start = _group_layout(site_ids)
+    rows = np.arange(n)
+    window_start = np.maximum(rows - window, group_start)
+
+    valid = ~np.isnan(values)
+    group_means = np.zeros((codes[-1] + 1, width))
+    for j in range(width):
+        sums = np.bincount(codes, weights=np.where(valid[:, j], values[:, j], 0.0))
+        hits = np.bincount(codes, weights=valid[:, j].astype(float))
+        group_means[:, j] = np.divide(sums, hits, out=np.zeros_like(sums), where=hits > 0)
+    offsets = group_means[codes]
+
+    centered = np.where(valid, values - offsets, 0.0)
+    zero_row = np.zeros((1, width))
+    cum_sum = np.concatenate([zero_row, np.cumsum(centered, axis=0)])
+    cum_sq = np.concatenate([zero_row, np.cumsum(centered * centered, axis=0)])
+    cum_n = np.concatenate([zero_row, np.cumsum(valid, axis=0)])
+
+    win_n = cum_n[rows] - cum_n[window_start]
+    win_sum = cum_sum[rows] - cum_sum[window_start]
+    win_sq = cum_sq[rows] - cum_sq[window_start]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = win_sum / win_n
+        squared_deviation = win_sq - win_n * mean * mean
+        # 常数窗口的离差平方和理论上为 0，相减后只剩舍入误差，不能当作很小的标准差
+        squared_deviation[squared_deviation <= ZSCORE_VARIANCE_RTOL * cum_sq[rows]] = 0.0
+        std = np.sqrt(squared_deviation / (win_n - 1))
+        scores = (centered - mean) / std
+    enough = (win_n >= min_periods) & (std > 0) & valid
+    scores[~enough] = np.nan
+    return mean + offsets, scores
+
+
+def rolling_mad(values, site_ids, window=DEFAULT_WINDOW, min_periods=MIN_PERIODS):
+    """
+    按监测点计算每个值相对其前 window 次观测中位数的稳健分数 (x - median) / (1.4826 * MAD)
+
+    用 sliding_window_view 为每行构造前 window 个值的视图（不复制数据），
+    属于其他监测点的位置置为 NaN 后按行排序取中位数；分块处理以限制内存
+
+    Returns:
+        tuple: (滚动中位数矩阵, 稳健分数矩阵)，样本不足或 MAD 为 0 时为 NaN
+    """
+    n, width = values.shape
+    medians = np.full((n, width), np.nan)
+    scores = np.full((n, width), np.nan)
+    if not n:
+        return medians, scores
+
+    codes, _ = _group_layout(site_ids)
+    padded_codes = np.concatenate([np.full(window, -1), codes])
+    code_windows = sliding_window_view(padded_codes, window)[:n]
+
+    for j in range(width):
+        if np.isnan(values[:, j]).all():
+            continue
+        padded = np.concatenate([np.full(window, np.nan), values[:, j]])
+        value_windows = sliding_window_view(padded, window)[:n]
+        for lo in range(0, n, MAD_CHUNK_ROWS):
+            hi = min(lo + MAD_CHUNK_ROWS, n)
+            block = np.where(code_windows[lo:hi] == codes[lo:hi, None], value_windows[lo:hi], np.nan)
+            count = np.count_nonzero(~np.isnan(block), axis=1)
+            median = _sorted_median(np.sort(block, axis=1), count)
+            mad = _sorted_median(np.sort(np.abs(block - median[:, None]), axis=1), count)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                score = (values[lo:hi, j] - median) / (MAD_SCALE * mad)
+            score[(count < min_periods) | ~(mad > 0)] = np.nan
+            medians[lo:hi, j] = median
+            scores[lo:hi, j] = score
+    return medians, scores
+
+
+def _sorted_median(sorted_block, count):
+    """按行已排序（NaN 排在末尾）的矩阵中，取每行前 count 个有效值的中位数"""
+    rows = np.arange(len(sorted_block))
+    lower = np.maximum((count - 1) // 2, 0)
+    upper = np.maximum(count // 2, 0)
+    upper = np.minimum(upper, sorted_block.shape[1] - 1)
+    median = (sorted_block[rows, lower] + sorted_block[rows, upper]) / 2
+    median[count == 0] = np.nan
+    return median
+
+
+def build_baseline_query(site_ids, months, columns=PARAMETER_COLUMNS):
+    """构建读取指定监测点、月份季节基线的查询"""
+    site_ids = sorted(set(site_ids))
+    months = sorted(set(months))
+    query = (
+        "SELECT site_id, month, parameter, sample_count, value_sum, value_sq_sum"
+        " FROM water_quality_baselines"
+        f" WHERE month IN ({', '.join(['%s'] * len(months))})"
+        f" AND parameter IN ({', '.join(['%s'] * len(columns))})"
+    )
+    params = months + list(columns)
+    # 监测点较少时按 site_id 过滤，否则读取这些月份的全部基线
+    if len(site_ids) <= 1000:
+        query += f" AND site_id IN ({', '.join(['%s'] * len(site_ids))})"
+        params += site_ids
+    return query, params
+
+
+def seasonal_scores(values, site_ids, months, baselines, columns=PARAMETER_COLUMNS,
+                    min_periods=MIN_PERIODS):
+    """
+    用季节基线计算每个值的 z 分数
+
+    Args:
+        values (np.ndarray): (记录数, 参数数) 矩阵
+        site_ids (np.ndarray): 每行的监测点 ID
+        months (np.ndarray): 每行的监测月份 (1-12)
+        baselines (list[dict]): water_quality_baselines 记录
+
+    Returns:
+        tuple: (基线均值矩阵, z 分数矩阵)，没有基线或样本不足时为 NaN
+    """
+    n, width = values.shape
+    means = np.full((n, width), np.nan)
+    scores = np.full((n, width), np.nan)
+    if not n or not baselines:
+        return means, scores
+
+    # 把 (监测点, 月份) 映射为稠密下标，基线整理为 (组合数, 参数数) 的矩阵后按行索引
+    keys = site_ids.astype(np.int64) * 13 + months
+    unique_keys, row_keys = np.unique(keys, return_inverse=True)
+    column_index = {col: j for j, col in enumerate(columns)}
+    key_index = {key: i for i, key in enumerate(unique_keys.tolist())}
+
+    base_n = np.zeros((len(unique_keys), width))
+    base_sum = np.zeros((len(unique_keys), width))
+    base_sq = np.zeros((len(unique_keys), width))
+    for row in baselines:
+        i = key_index.get(int(row['site_id']) * 13 + int(row['month']))
+        j = column_index.get(row['parameter'])
+        if i is None or j is None:
+            continue
+        base_n[i, j] = float(row['sample_count'])
+        base_sum[i, j] = float(row['value_sum'])
+        base_sq[i, j] = float(row['value_sq_sum'])
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = base_sum / base_n
+        variance = (base_sq - base_n * mean * mean) / (base_n - 1)
+        std = np.sqrt(np.maximum(variance, 0.0))
+    usable = (base_n >= min_periods) & (std > 0)
+    mean[~usable] = np.nan
+    std[~usable] = np.nan
+
+    means = mean[row_keys]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        scores = (values - means) / std[row_keys]
+    return means, scores
+
+
+def detect_statistical_anomalies(records, method, baselines=None, window=DEFAULT_WINDOW,
+                                 score_threshold=DEFAULT_SCORE_THRESHOLD, start_date=None,
+                                 columns=PARAMETER_COLUMNS):
+    """
+    对按 build_history_query 排序读取的记录执行统计异常检测
+
+    Args:
+        records (list[dict]): water_quality 记录，按 (site_id, 日期, 时间) 排序
+        method (str): zscore / mad / seasonal
+        baselines (list[dict]): seasonal 方法使用的季节基线记录
+        window (int): 滚动窗口大小（观测次数）
+        score_threshold (float): 分数绝对值超过该值视为异常
+        start_date (str): 只输出该日期及之后的异常，之前的记录仅作为滚动历史
+
+    Returns:
+        list[dict]: 按 record_id 排序的异常记录，格式与阈值检测一致
+    """
+    if not records:
+        return []
+
+    values, all_numeric = load_parameter_matrix(records, columns)
+    site_ids = np.fromiter((r['site_id'] for r in records), dtype=np.int64, count=len(records))
+    months = None
+
+    if method == METHOD_ZSCORE:
+        centers, scores = rolling_zscore(values, site_ids, window)
+    elif method == METHOD_MAD:
+        centers, scores = rolling_mad(values, site_ids, window)
+    elif method == METHOD_SEASONAL:
+        months = np.fromiter((r['monitoring_date'].month for r in records), dtype=np.int64,
+                             count=len(records))
+        centers, scores = seasonal_scores(values, site_ids, months, baselines or [], columns)
+    else:
+        raise ValueError(f"不支持的检测方法: {method}")
+
+    with np.errstate(invalid='ignore'):
+        flags = np.abs(scores) > score_threshold
+    if start_date:
+        start = datetime.date.fromisoformat(str(start_date)[:10])
+        in_range = np.fromiter((r['monitoring_date'] >= start for r in records), dtype=bool,
+                               count=len(records))
+        flags &= in_range[:, None]
+
+    anomalous_rows = np.flatnonzero(flags.any(axis=1))
+    template = _REASON_TEMPLATES[method]
+    anomalies = []
+    for i, row_values, row_centers, row_scores, row_flags in zip(
+            anomalous_rows.tolist(), values[anomalous_rows].tolist(),
+            centers[anomalous_rows].tolist(), scores[anomalous_rows].tolist(),
+            flags[anomalous_rows].tolist()):
+        record = records[i]
+        if all_numeric:
+            parameters = dict(zip(columns, [None if v != v else v for v in row_values]))
+        else:
+            parameters = {col: format_water_quality_value(record.get(col)) for col in columns}
+
+        anomalies.append({
+            "record_id": record["record_id"],
+            "site_id": record["site_id"],
+            "monitoring_date": str(record["monitoring_date"]),
+            "monitoring_time": str(record["monitoring_time"]) if record["monitoring_time"] else "",
+            "section_name": record["section_name"],
+            "anomaly_reasons": [
+                template.format(col=col, value=row_values[j], center=row_centers[j],
+                                score=abs(row_scores[j]),
+                                month=months[i] if months is not None else None)
+                for j, col in enumerate(columns) if row_flags[j]
+            ],
+            "parameters": parameters
+        })
+
+    anomalies.sort(key=lambda a: a["record_id"])
+    return anomalies
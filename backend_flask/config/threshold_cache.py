@@ -0,0 +1,66 @@
+"""
+异常阈值缓存
+在进程内缓存 anomaly_thresholds 表，避免每次异常检测请求都查询数据库；
+版本号是阈值内容的哈希，内容相同时在所有工作进程中、重启前后都相同，
+可作为由阈值派生的结果的缓存键
+"""
+
+import hashlib
+import json
+import threading
+import time
+
+
+def thresholds_version(thresholds):
+    """阈值内容的稳定哈希：逐行按键排序序列化后再按行排序，与查询返回的行顺序无关"""
+    rows = sorted(json.dumps(row, sort_keys=True, default=str) for row in thresholds)
+    return hashlib.sha256("\n".join(rows).encode('utf-8')).hexdigest()[:16]
+
+
+class ThresholdCache:
+    """带版本号的进程内阈值缓存"""
+
+    def __init__(self, loader, ttl=60):
+        """
+        Args:
+            loader (callable): 从数据库读取全部阈值记录的函数
+            ttl (float): 缓存有效期（秒），用于感知其他工作进程对阈值的修改
+        """
+        self._loader = loader
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        # (版本号, 阈值列表, 加载时间)，整体替换以保证无锁读取时的一致性
+        self._entry = None
+
+    @property
+    def version(self):
+        """当前阈值版本号（缓存失效时会重新加载）"""
+        return self.get()[0]
+
+    def _fresh_entry(self):
+        entry = self._entry
+        if entry is not None and time.monotonic() - entry[2] < self._ttl:
+            return entry
+        return None
+
+    def get(self):
+        """
+        获取阈值及其版本号，缓存失效时重新加载
+
+        Returns:
+            tuple: (版本号, 阈值记录列表)；调用方不应修改返回的列表
+        """
+        entry = self._fresh_entry()
+        if entry is None:
+            with self._lock:
+                entry = self._fresh_entry()
+                if entry is None:
+                    thresholds = self._loader()
+                    entry = (thresholds_version(thresholds), thresholds, time.monotonic())
+                    self._entry = entry
+        return entry[0], entry[1]
+
+    def invalidate(self):
+        """阈值被修改后调用，下次读取时重新加载（版本号随内容变化）"""
+        with self._lock:
+            self._entry = None
@@ -1,7 +1,6 @@
 import os
 import csv
 import json
-import re
 import mysql.connector
 from flask import Flask, request, jsonify
 from werkzeug.utils import secure_filename
@@ -10,6 +9,11 @@ from datetime import datetime
 import jwt
 from functools import wraps
 
+from config.anomaly_store import materialize_records
+from config.baseline_store import refresh_baselines
+from config.fish_stats import refresh_species_stats
+from config.water_cleaning import infer_year, parse_water_tbody
+
 app = Flask(__name__)
 
 # 数据库配置
@@ -27,6 +31,8 @@ app.config['JWT_ACCESS_TOKEN_EXPIRES'] = 3600  # 1小时过期
 # 文件上传配置
 UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {'csv', 'json'}
+WATER_INSERT_BATCH_SIZE = 500  # 水质数据每批插入条数
+FISH_INSERT_BATCH_SIZE = 500  # 鱼类观测数据每批插入条数
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
@@ -190,7 +196,7 @@ def log_action(user_id, action, details):
             fetch=False
         )
     except Exception as e:
-        app.logger.error(f"日志记录失败: {str(e)}")
+        app.logger.error("日志记录失败: %s", e)
 
 # ======================
 # 地区数据处理功能
@@ -309,124 +315,97 @@ def upload_water_data():
 
 def process_water_upload(filepath):
     """处理上传的水质数据文件"""
+    # 读取JSON文件
+    with open(filepath, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    
+    # 验证JSON结构
+    if 'tbody' not in data or not isinstance(data['tbody'], list):
+        raise ValueError("文件格式无效: 缺少有效的tbody数据")
+    
+    tbody = data['tbody']
+    
+    # 整个文件使用同一个连接和事务，插入后增量维护异常物化表
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    site_cache = {}
+    records_to_insert = []
+    
     try:
-        # 读取JSON文件
-        with open(filepath, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        # 验证JSON结构
-        if 'tbody' not in data or not isinstance(data['tbody'], list):
-            raise ValueError("文件格式无效: 缺少有效的tbody数据")
-        
-        tbody = data['tbody']
-        inserted_count = 0
-        
-        # 处理每条记录
-        for record in tbody:
-            # 验证记录格式
-            if len(record) < 17:
+        # 整个文件一次性完成数值提取和日期解析；监测时间的年份取自文件名（YYYY-MM-DD.json）
+        for values in parse_water_tbody(tbody, infer_year(filepath), min_fields=17):
+            if values['monitoring_date'] is None:
                 continue
-            
-            # 解析记录字段
-            province = record[0].strip()
-            river_basin = record[1].strip()
-            section_name = record[2].strip()
-            
-            # 解析时间
-            date_time_str = record[3]
-            if " " in date_time_str:
-                date_part, time_part = date_time_str.split()
-                monitoring_date = date_part
-                monitoring_time = time_part
-            else:
-                monitoring_date = date_time_str
-                monitoring_time = None
-            
-            water_grade = record[4].strip()
-            
-            # 解析HTML值中的原始值
-            def extract_value(html_str):
-                """从HTML中提取原始值"""
-                if not html_str or html_str in ["", "--", "NA"]:
-                    return None
-                
-                # 尝试提取原始值
-                if 'title=' in html_str:
-                    match = re.search(r"原始值[：:]([\d.]+)", html_str)
-                    if match:
-                        return float(match.group(1))
-                
-                # 尝试直接转换
-                try:
-                    # 去除HTML标签
-                    clean_str = re.sub(r'<[^>]+>', '', html_str)
-                    return float(clean_str)
-                except:
-                    return None
-            
-            # 提取各参数值
-            values = {
-                'water_temp': extract_value(record[5]),
-                'ph': extract_value(record[6]),
-                'dissolved_oxygen': extract_value(record[7]),
-                'conductivity': extract_value(record[8]),
-                'turbidity': extract_value(record[9]),
-                'cod_mn': extract_value(record[10]),
-                'ammonia_nitrogen': extract_value(record[11]),
-                'total_phosphorus': extract_value(record[12]),
-                'total_nitrogen': extract_value(record[13]),
-                'chla': extract_value(record[14]) if len(record) > 14 else None,
-                'algae_density': extract_value(record[15]) if len(record) > 15 else None,
-                'site_status': record[16].strip() if len(record) > 16 else "正常",
-            }
-            
+            province = values['province']
+            river_basin = values['river_basin']
+            section_name = values['section_name']
+
             # 处理监测点
             site_key = (province, river_basin, section_name)
             
-            # 查找或创建监测点
-            site_query = """
-            SELECT site_id FROM monitoring_site 
-            WHERE province = %s AND river_basin = %s AND section_name = %s
-            """
-            site_result = execute_query(site_query, (province, river_basin, section_name))
-            
-            if site_result:
-                site_id = site_result[0]['site_id']
+            if site_key in site_cache:
+                site_id = site_cache[site_key]
             else:
-                # 创建新站点
-                site_code = f"{province[:2]}{river_basin[:2]}{section_name[:2]}"
-                execute_query(
-                    "INSERT INTO monitoring_site (site_code, site_name, province, river_basin, section_name) "
-                    "VALUES (%s, %s, %s, %s, %s)",
-                    (site_code, section_name, province, river_basin, section_name),
-                    fetch=False
+                # 查找或创建监测点
+                cursor.execute(
+                    "SELECT site_id FROM monitoring_site "
+                    "WHERE province = %s AND river_basin = %s AND section_name = %s",
+                    site_key
                 )
-                site_id = execute_query("SELECT LAST_INSERT_ID()")[0]['LAST_INSERT_ID()']
+                site_result = cursor.fetchall()
+                
+                if site_result:
+                    site_id = site_result[0]['site_id']
+                else:
+                    # 创建新站点
+                    site_code = f"{province[:2]}{river_basin[:2]}{section_name[:2]}"
+                    cursor.execute(
+                        "INSERT INTO monitoring_site (site_code, site_name, province, river_basin, section_name) "
+                        "VALUES (%s, %s, %s, %s, %s)",
+                        (site_code, section_name, province, river_basin, section_name)
+                    )
+                    site_id = cursor.lastrowid
+                site_cache[site_key] = site_id
             
-            # 插入水质数据
-            execute_query(
+            records_to_insert.append((
+                site_id, values['monitoring_date'], values['monitoring_time'],
+                province, river_basin, section_name, values['water_grade'],
+                values['water_temp'], values['ph'], values['dissolved_oxygen'],
+                values['conductivity'], values['turbidity'], values['cod_mn'],
+                values['ammonia_nitrogen'], values['total_phosphorus'], 
+                values['total_nitrogen'], values['chla'], values['algae_density'],
+                values['site_status'], filepath
+            ))
+        
+        # 批量插入水质数据，插入完成后为本文件的新记录计算异常写入物化表
+        first_record_id = None
+        for i in range(0, len(records_to_insert), WATER_INSERT_BATCH_SIZE):
+            batch = records_to_insert[i:i + WATER_INSERT_BATCH_SIZE]
+            cursor.executemany(
                 "INSERT INTO water_quality (site_id, monitoring_date, monitoring_time, "
                 "province, river_basin, section_name, water_grade, water_temp, ph, "
                 "dissolved_oxygen, conductivity, turbidity, cod_mn, ammonia_nitrogen, "
                 "total_phosphorus, total_nitrogen, chla, algae_density, site_status, original_file) "
                 "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
-                (
-                    site_id, monitoring_date, monitoring_time,
-                    province, river_basin, section_name, water_grade,
-                    values['water_temp'], values['ph'], values['dissolved_oxygen'],
-                    values['conductivity'], values['turbidity'], values['cod_mn'],
-                    values['ammonia_nitrogen'], values['total_phosphorus'], 
-                    values['total_nitrogen'], values['chla'], values['algae_density'],
-                    values['site_status'], filepath
-                ),
-                fetch=False
+                batch
             )
-            inserted_count += 1
+            if first_record_id is None:
+                # 多行 INSERT 的 lastrowid 为本批次第一条记录的 ID，之后插入的记录 ID 都更大
+                first_record_id = cursor.lastrowid
+        if first_record_id is not None:
+            materialize_records(cursor, filepath, first_record_id)
+            # 按基础表重算本文件涉及的 (监测点, 月份) 的季节基线
+            refresh_baselines(cursor, [(record[0], record[1].month) for record in records_to_insert if record[1]])
         
-        return inserted_count
+        conn.commit()
+        return len(records_to_insert)
     
-    except Exception as e:
-        raise e
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
 
 # ======================
 # 鱼类数据上传功能
@@ -497,73 +476,73 @@ def upload_fish_data():
 
 def process_fish_upload(filepath):
     """处理上传的鱼类数据文件"""
+    # 读取CSV文件
+    with open(filepath, 'r', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        rows = list(reader)
+    
+    # 验证CSV结构
+    required_columns = ['Species', 'Weight', 'Length1', 'Length2', 'Length3', 'Height', 'Width']
+    if not all(col in reader.fieldnames for col in required_columns):
+        missing = [col for col in required_columns if col not in reader.fieldnames]
+        raise ValueError(f"CSV文件缺少必需列: {', '.join(missing)}")
+    
+    # 整个文件使用同一个连接和事务，插入后增量维护鱼种汇总
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    species_cache = {}
+    records_to_insert = []
+    
     try:
-        # 读取CSV文件
-        with open(filepath, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            rows = list(reader)
-        
-        # 验证CSV结构
-        required_columns = ['Species', 'Weight', 'Length1', 'Length2', 'Length3', 'Height', 'Width']
-        if not all(col in reader.fieldnames for col in required_columns):
-            missing = [col for col in required_columns if col not in reader.fieldnames]
-            raise ValueError(f"CSV文件缺少必需列: {', '.join(missing)}")
-        
-        inserted_count = 0
-        
-        # 处理每条记录
         for row in rows:
             species = row['Species'].strip()
             
             # 查找物种ID
-            species_query = "SELECT species_id FROM fish_species WHERE common_name = %s"
-            species_result = execute_query(species_query, (species,))
-            
-            if species_result:
-                species_id = species_result[0]['species_id']
+            if species in species_cache:
+                species_id = species_cache[species]
             else:
-                # 创建新物种
-                execute_query(
-                    "INSERT INTO fish_species (common_name) VALUES (%s)",
-                    (species,),
-                    fetch=False
-                )
-                species_id = execute_query("SELECT LAST_INSERT_ID()")[0]['LAST_INSERT_ID()']
+                cursor.execute("SELECT species_id FROM fish_species WHERE common_name = %s", (species,))
+                species_result = cursor.fetchall()
+                
+                if species_result:
+                    species_id = species_result[0]['species_id']
+                else:
+                    # 创建新物种
+                    cursor.execute("INSERT INTO fish_species (common_name) VALUES (%s)", (species,))
+                    species_id = cursor.lastrowid
+                species_cache[species] = species_id
             
             # 处理空值或无效值
-            weight = row['Weight'].strip() or None
-            length1 = row['Length1'].strip() or None
-            length2 = row['Length2'].strip() or None
-            length3 = row['Length3'].strip() or None
-            height = row['Height'].strip() or None
-            width = row['Width'].strip() or None
-            
-            # 插入观测数据
-            execute_query(
+            values = [row[col].strip() or None for col in required_columns[1:]]
+            records_to_insert.append(
+                (species_id,) + tuple(float(value) if value else None for value in values)
+            )
+        
+        # 批量插入观测数据，插入完成后按基础表重算涉及的鱼种汇总
+        for i in range(0, len(records_to_insert), FISH_INSERT_BATCH_SIZE):
+            batch = records_to_insert[i:i + FISH_INSERT_BATCH_SIZE]
+            cursor.executemany(
                 "INSERT INTO fish_observations (species_id, body_weight, body_length1, "
                 "body_length2, body_length3, body_height, body_width) "
                 "VALUES (%s, %s, %s, %s, %s, %s, %s)",
-                (
-                    species_id, 
-                    float(weight) if weight else None, 
-                    float(length1) if length1 else None, 
-                    float(length2) if length2 else None, 
-                    float(length3) if length3 else None, 
-                    float(height) if height else None, 
-                    float(width) if width else None
-                ),
-                fetch=False
+                batch
             )
-            inserted_count += 1
+        refresh_species_stats(cursor, [record[0] for record in records_to_insert])
         
-        return inserted_count
+        conn.commit()
+        return len(records_to_insert)
     
-    except Exception as e:
-        raise e
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
 
 # ======================
 # 主程序入口
 # ======================
 
+# 在 backend_flask 目录下以模块方式运行：python -m config.upload
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
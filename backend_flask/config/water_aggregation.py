@@ -0,0 +1,153 @@
+"""
+水质参数按时间段聚合
+长时间范围的图表不需要每 4 小时一个原始点，按小时 / 天 / 周统计各参数的
+平均值、最小值、最大值和有效值个数。全部在数据库中对截断后的时间 GROUP BY 完成，
+按 (site_id, monitoring_date) 复合索引过滤，接口只返回每个时间段一行
+
+结果转换为 /visualize-water 相同的 line_chart_data 结构，前端可直接绘制
+"""
+
+from config.anomaly_detection import PARAMETER_COLUMNS, build_filter_conditions
+from config.chart_payload import FORMAT_COLUMNAR, encode_epochs, encode_float32
+
+# 时间段对应的分组表达式：小时截断到整点（监测时间缺失的记录归入当天 0 点），周以周一为起点
+AGGREGATE_BUCKETS = {
+    '1h': "TIMESTAMP({date}, MAKETIME(HOUR(IFNULL({time}, '00:00:00')), 0, 0))",
+    '1d': "{date}",
+    '1w': "DATE_SUB({date}, INTERVAL WEEKDAY({date}) DAY)",
+}
+
+AGGREGATE_FUNCTIONS = {
+    'mean': 'AVG',
+    'min': 'MIN',
+    'max': 'MAX',
+    'count': 'COUNT',  # 只统计非空值
+}
+
+# 参数列对应的图表标签（与水质 JSON 的表头一致）
+PARAMETER_LABELS = {
+    'water_temp': '水温(℃)',
+    'ph': 'pH(无量纲)',
+    'dissolved_oxygen': '溶解氧(mg/L)',
+    'conductivity': '电导率(μS/cm)',
+    'turbidity': '浊度(NTU)',
+    'cod_mn': '高锰酸盐指数(mg/L)',
+    'ammonia_nitrogen': '氨氮(mg/L)',
+    'total_phosphorus': '总磷(mg/L)',
+    'total_nitrogen': '总氮(mg/L)',
+    'chla': '叶绿素α(mg/L)',
+    'algae_density': '藻密度(cells/L)',
+}
+
+AGGREGATE_LABELS = {'mean': '平均值', 'min': '最小值', 'max': '最大值', 'count': '数量'}
+
+
+def _parse_list(value, allowed, name):
+    """解析逗号分隔的列表参数并按 allowed 的顺序去重"""
+    items = [item.strip() for item in value.split(',') if item.strip()]
+    for item in items:
+        if item not in allowed:
+            raise ValueError(f"不支持的{name}: {item}")
+    return [item for item in allowed if item in items]
+
+
+def parse_aggregates(value):
+    """
+    解析 aggregates 参数（逗号分隔，如 "mean,max"），为空时只统计平均值
+
+    Raises:
+        ValueError: 包含不支持的聚合函数
+    """
+    if not value:
+        return ['mean']
+    return _parse_list(value, list(AGGREGATE_FUNCTIONS), "聚合函数")
+
+
+def parse_parameters(value):
+    """
+    解析 parameters 参数（逗号分隔的 water_quality 列名），为空时统计全部参数
+
+    Raises:
+        ValueError: 包含不存在的参数列
+    """
+    if not value:
+        return list(PARAMETER_COLUMNS)
+    return _parse_list(value, PARAMETER_COLUMNS, "参数")
+
+
+def build_aggregate_query(bucket, aggregates, parameters, start_date=None, end_date=None, site_id=None):
+    """
+    构建按时间段聚合的查询，每个 (参数, 聚合函数) 一列，列名为 "参数__聚合函数"
+
+    列名和函数名都来自白名单，过滤值以占位符传入
+
+    Returns:
+        tuple: (SQL, 参数列表)
+    """
+    period = AGGREGATE_BUCKETS[bucket].format(date='w.monitoring_date', time='w.monitoring_time')
+    columns = [
+        f"{AGGREGATE_FUNCTIONS[aggregate]}(w.{parameter}) AS {parameter}__{aggregate}"
+        for parameter in parameters
+        for aggregate in aggregates
+    ]
+    conditions, params = build_filter_conditions(start_date, end_date, site_id, table_alias='w')
+
+    query = f"SELECT {period} AS period, {', '.join(columns)} FROM water_quality w"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " GROUP BY period ORDER BY period"
+    return query, params
+
+
+def _to_number(value, aggregate):
+    if value is None:
+        return None
+    return int(value) if aggregate == 'count' else float(value)
+
+
+def build_aggregate_chart(rows, aggregates, parameters, payload_format=None):
+    """
+    把聚合结果转换为 line_chart_data：x 为时间段起点，每个 (参数, 聚合函数) 一个数据集
+
+    Args:
+        rows (list[dict]): build_aggregate_query 的查询结果（按时间段排序）
+        payload_format (str): json 或 columnar（见 chart_payload）
+    """
+    periods = [row['period'] for row in rows]
+    if payload_format == FORMAT_COLUMNAR:
+        line_chart_data = {
+            'format': FORMAT_COLUMNAR,
+            'x': encode_epochs(periods),
+            'x_unit': 's',
+            'dtype': 'float32',
+            'datasets': []
+        }
+    else:
+        line_chart_data = {'x': [str(period) for period in periods], 'datasets': []}
+
+    for parameter in parameters:
+        for aggregate in aggregates:
+            key = f"{parameter}__{aggregate}"
+            values = [_to_number(row[key], aggregate) for row in rows]
+            line_chart_data['datasets'].append({
+                'label': f"{PARAMETER_LABELS[parameter]} {AGGREGATE_LABELS[aggregate]}",
+                'parameter': parameter,
+                'aggregate': aggregate,
+                'data': encode_float32(values) if payload_format == FORMAT_COLUMNAR else values,
+                'borderWidth': 2,
+                'tension': 0.3,
+                'fill': False
+            })
+    return line_chart_data
+
+
+def aggregate_water_quality(execute_query, bucket, aggregates, parameters, start_date=None, end_date=None,
+                            site_id=None, payload_format=None):
+    """
+    执行按时间段聚合并返回 line_chart_data
+
+    Args:
+        execute_query (callable): 执行查询并返回字典列表的函数
+    """
+    query, params = build_aggregate_query(bucket, aggregates, parameters, start_date, end_date, site_id)
+    return build_aggregate_chart(execute_query(query, params), aggregates, parameters, payload_format)
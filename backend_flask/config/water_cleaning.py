@@ -0,0 +1,177 @@
+"""
+水质数据清洗
+水质 JSON 文件（thead / tbody）的数值提取和监测时间解析，
+DataVisualization、upload.py 和 water_quality_bat.py 共用：
+
+- 数值：优先取 title 中的"原始值"，否则整个单元格（可带一层 HTML 标签）必须是一个数字；
+  "--"、"*"、"极值过滤"等视为缺失。DataFrame 列用 str.extract 每列提取一次，
+  入库时对展平的单元格列表逐个匹配
+- 监测时间为 "MM-DD HH:MM"，补上年份后按显式格式解析
+"""
+
+import datetime
+import os
+import re
+
+import pandas as pd
+
+from config.anomaly_detection import PARAMETER_COLUMNS
+
+NUMBER_PATTERN = r"[-+]?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?"
+
+# 只有一个捕获组，str.extract 直接得到一列字符串：
+# 单元格含"原始值"时取其后的数字（如 原始值：3.262947E+07），否则整个单元格（可带一层标签）必须是一个数字
+VALUE_PATTERN = re.compile(
+    rf"^(?:.*?原始值[：:]\s*|\s*(?:<[^>]*>)?\s*(?={NUMBER_PATTERN}\s*(?:</[^>]*>)?\s*$))"
+    rf"({NUMBER_PATTERN})",
+    re.S
+)
+
+# 与 VALUE_PATTERN 规则相同的两个分支，按单元格是否含"原始值"选择；
+# 以字面量开头的模式匹配更快，用于入库时逐个单元格提取
+RAW_VALUE_PATTERN = re.compile(rf"原始值[：:]\s*({NUMBER_PATTERN})")
+BARE_VALUE_PATTERN = re.compile(rf"\s*(?:<[^>]*>)?\s*({NUMBER_PATTERN})\s*(?:</[^>]*>)?\s*")
+
+MONITORING_TIME_FORMAT = '%Y-%m-%d %H:%M'
+YEAR_PATTERN = re.compile(r"(\d{4})-\d{2}")
+
+# tbody 每行的字段顺序（与 thead 一致），水质参数位于第 5~15 列
+TBODY_TEXT_FIELDS = ['province', 'river_basin', 'section_name']
+MONITORING_TIME_INDEX = 3
+WATER_GRADE_INDEX = 4
+PARAMETER_START_INDEX = 5
+SITE_STATUS_INDEX = PARAMETER_START_INDEX + len(PARAMETER_COLUMNS)
+TBODY_FIELD_COUNT = SITE_STATUS_INDEX + 1
+
+# parse_water_tbody 返回的字段，与 water_quality 表字段同名
+WATER_RECORD_COLUMNS = (
+    TBODY_TEXT_FIELDS + ['monitoring_date', 'monitoring_time', 'water_grade']
+    + PARAMETER_COLUMNS + ['site_status']
+)
+
+
+def clean_column_name(name):
+    """清理列名，移除 HTML 标签和单位信息"""
+    return re.sub(r'<[^>]*>', '', name).strip()
+
+
+def extract_numeric(series):
+    """
+    把一列原始单元格转换为 float，无法识别的单元格为 NaN
+
+    Args:
+        series (pd.Series): 原始单元格（HTML 片段、数字字符串或 None）
+
+    Returns:
+        pd.Series: float64 数值列
+    """
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype('float64')
+    if series.empty:
+        return pd.Series(dtype='float64', index=series.index)
+    # 非字符串单元格（None 等）在 str.extract 中直接得到 NaN；
+    # 提取结果都是合法数字，可以直接 astype，比 pd.to_numeric 快得多
+    return series.str.extract(VALUE_PATTERN, expand=False).astype('float64')
+
+
+def extract_values(cells):
+    """
+    与 extract_numeric 规则相同，直接处理单元格列表，返回 float / None 列表
+
+    入库时单个文件只有约 100 行，省去构建 Series 的固定开销
+    """
+    raw_search = RAW_VALUE_PATTERN.search
+    bare_match = BARE_VALUE_PATTERN.fullmatch
+    values = []
+    for cell in cells:
+        if isinstance(cell, str):
+            match = raw_search(cell) if '原始值' in cell else bare_match(cell)
+            values.append(float(match.group(1)) if match else None)
+        elif isinstance(cell, (int, float)) and cell == cell:
+            values.append(float(cell))
+        else:
+            values.append(None)
+    return values
+
+
+def parse_monitoring_times(series, year):
+    """
+    解析 "MM-DD HH:MM" 格式的监测时间列
+
+    Args:
+        series (pd.Series): 原始监测时间
+        year (int): 补充的年份
+
+    Returns:
+        pd.Series: datetime64 列，无法解析的为 NaT
+    """
+    return pd.to_datetime(
+        f"{int(year)}-" + series.astype(str),
+        format=MONITORING_TIME_FORMAT,
+        errors='coerce'
+    )
+
+
+def infer_year(path, default=None):
+    """从文件路径中的 YYYY-MM（月份目录或 YYYY-MM-DD.json 文件名）推断年份，找不到时返回 default 或当前年份"""
+    match = YEAR_PATTERN.search(os.path.basename(path)) or YEAR_PATTERN.search(path)
+    if match:
+        return int(match.group(1))
+    return default if default is not None else datetime.date.today().year
+
+
+def parse_water_tbody(tbody, year, min_fields=14, default_date=None):
+    """
+    把 tbody 原始行批量转换为 water_quality 记录
+
+    单个文件通常只有约 100 行，直接用列表处理，避免为小表构建 DataFrame 的固定开销
+
+    Args:
+        tbody (list[list]): JSON 中的 tbody
+        year (int): 监测时间补充的年份
+        min_fields (int): 字段数少于该值的行被跳过
+        default_date (datetime.date): 监测时间无法解析时使用的日期，为 None 时保留缺失
+
+    Returns:
+        list[dict]: 键为 WATER_RECORD_COLUMNS；缺失值为 None
+    """
+    rows = [row for row in tbody if len(row) >= min_fields]
+    if not rows:
+        return []
+
+    def field(row, index, fallback):
+        value = row[index] if len(row) > index else None
+        return value.strip() if isinstance(value, str) else fallback
+
+    # 所有参数单元格展平后一次提取
+    parameter_count = len(PARAMETER_COLUMNS)
+    values = extract_values([
+        row[index] if len(row) > index else None
+        for row in rows
+        for index in range(PARAMETER_START_INDEX, SITE_STATUS_INDEX)
+    ])
+
+    # 同一文件的监测时间只有少数几个不同取值，每个取值只解析一次
+    moments = {}
+    for text in {row[MONITORING_TIME_INDEX] for row in rows}:
+        if isinstance(text, str):
+            try:
+                moments[text] = datetime.datetime.strptime(f"{int(year)}-{text.strip()}", MONITORING_TIME_FORMAT)
+            except ValueError:
+                pass
+
+    records = []
+    for i, row in enumerate(rows):
+        moment = moments.get(row[MONITORING_TIME_INDEX]) if isinstance(row[MONITORING_TIME_INDEX], str) else None
+        record = {
+            'province': field(row, 0, "未知省份"),
+            'river_basin': field(row, 1, "未知流域"),
+            'section_name': field(row, 2, "未知断面"),
+            'monitoring_date': moment.date() if moment else default_date,
+            'monitoring_time': moment.time() if moment else None,
+            'water_grade': field(row, WATER_GRADE_INDEX, ""),
+        }
+        record.update(zip(PARAMETER_COLUMNS, values[i * parameter_count:(i + 1) * parameter_count]))
+        record['site_status'] = field(row, SITE_STATUS_INDEX, "正常")
+        records.append(record)
+    return records
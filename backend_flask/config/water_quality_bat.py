@@ -1,10 +1,13 @@
 import os
-import json
 import re
 import mysql.connector
 from datetime import datetime, timedelta
 import traceback
 
+from config.anomaly_store import materialize_records
+from config.baseline_store import refresh_baselines
+from config.water_store import WATER_DATA_DIR, read_water_records
+
 def import_water_quality_data():
     # 数据库配置
     db_config = {
@@ -15,7 +18,7 @@ def import_water_quality_data():
     }
     
     # 水质数据文件夹路径
-    data_dir = r"软件工程大作业数据\水质数据"
+    data_dir = WATER_DATA_DIR
     
     try:
         # 连接数据库
@@ -75,103 +78,25 @@ def import_water_quality_data():
                 total_files += 1
                 
                 try:
-                    # 3. 读取并解析JSON文件
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                    
-                    # 验证JSON结构
-                    if 'tbody' not in data or not isinstance(data['tbody'], list):
-                        print(f"文件 {json_file} 格式无效: 缺少有效的tbody数据")
+                    # 3. 读取记录：优先内存映射读取列式存储（数值和日期已在编译时解析），
+                    #    没有最新的存储文件时直接解析JSON；无法解析日期的记录使用月份第一天
+                    try:
+                        parsed_records, source_rows = read_water_records(file_path, default_date=base_date)
+                    except ValueError as e:
+                        print(f"文件 {json_file} 格式无效: {e}")
                         continue
                     
-                    tbody = data['tbody']
-                    print(f"文件 {json_file}: 找到 {len(tbody)} 条记录")
+                    print(f"文件 {json_file}: 找到 {source_rows} 条记录")
                     
                     # 4. 处理文件中的所有记录
                     records_to_insert = []
-                    skipped_records = 0
-                    
-                    for record_index, record in enumerate(tbody):
-                        # 验证记录格式
-                        if len(record) < 14:  # 至少14个字段
-                            skipped_records += 1
-                            continue
-                        
+                    skipped_records = source_rows - len(parsed_records)
+
+                    for record_index, values in enumerate(parsed_records):
                         try:
-                            # 解析记录字段
-                            province = record[0].strip() if record[0] is not None else "未知省份"
-                            river_basin = record[1].strip() if record[1] is not None else "未知流域"
-                            section_name = record[2].strip() if record[2] is not None else "未知断面"
-                            
-                            # 修复: 安全处理时间字段
-                            date_time_str = record[3]
-                            monitoring_date = base_date
-                            monitoring_time = None
-                            
-                            if date_time_str is not None:
-                                # 检查是否是字符串类型
-                                if isinstance(date_time_str, str):
-                                    # 处理带空格的时间格式
-                                    if " " in date_time_str:
-                                        date_str, time_str = date_time_str.split(" ", 1)
-                                        monitoring_time = time_str
-                                        
-                                        # 尝试解析日期部分 (月-日)
-                                        if "-" in date_str:
-                                            try:
-                                                month_part, day_part = date_str.split("-")
-                                                month_part = int(month_part)
-                                                day_part = int(day_part)
-                                                monitoring_date = datetime(year, month_part, day_part).date()
-                                            except:
-                                                pass
-                                    else:
-                                        # 没有空格，尝试直接作为时间处理
-                                        monitoring_time = date_time_str
-                            
-                            water_grade = record[4].strip() if record[4] is not None else ""
-                            
-                            # 解析HTML值中的原始值
-                            def extract_value(html_str):
-                                """从HTML中提取原始值"""
-                                if html_str is None or html_str in ["", "--", "NA"]:
-                                    return None
-                                
-                                # 如果是数字，直接返回
-                                if isinstance(html_str, (int, float)):
-                                    return float(html_str)
-                                
-                                # 如果是字符串，尝试提取原始值
-                                if isinstance(html_str, str):
-                                    # 尝试提取原始值
-                                    match = re.search(r"原始值[：:]([\d.]+)", html_str)
-                                    if match:
-                                        return float(match.group(1))
-                                    
-                                    # 尝试直接转换
-                                    try:
-                                        # 去除HTML标签
-                                        clean_str = re.sub(r'<[^>]+>', '', html_str)
-                                        return float(clean_str)
-                                    except:
-                                        return None
-                                return None
-                            
-                            # 提取各参数值（添加安全索引检查）
-                            values = {
-                                'water_temp': extract_value(record[5]) if len(record) > 5 else None,
-                                'ph': extract_value(record[6]) if len(record) > 6 else None,
-                                'dissolved_oxygen': extract_value(record[7]) if len(record) > 7 else None,
-                                'conductivity': extract_value(record[8]) if len(record) > 8 else None,
-                                'turbidity': extract_value(record[9]) if len(record) > 9 else None,
-                                'cod_mn': extract_value(record[10]) if len(record) > 10 else None,
-                                'ammonia_nitrogen': extract_value(record[11]) if len(record) > 11 else None,
-                                'total_phosphorus': extract_value(record[12]) if len(record) > 12 else None,
-                                'total_nitrogen': extract_value(record[13]) if len(record) > 13 else None,
-                                'chla': extract_value(record[14]) if len(record) > 14 else None,
-                                'algae_density': extract_value(record[15]) if len(record) > 15 else None,
-                                'site_status': record[16].strip() if len(record) > 16 and record[16] is not None else "正常",
-                            }
+                            province = values['province']
+                            river_basin = values['river_basin']
+                            section_name = values['section_name']
                             
                             # 5. 处理监测点
                             site_key = (province, river_basin, section_name)
@@ -195,12 +120,12 @@ def import_water_quality_data():
                             # 6. 准备水质记录
                             records_to_insert.append((
                                 site_id,
-                                monitoring_date,
-                                monitoring_time,
+                                values['monitoring_date'],
+                                values['monitoring_time'],
                                 province,
                                 river_basin,
                                 section_name,
-                                water_grade,
+                                values['water_grade'],
                                 values['water_temp'],
                                 values['ph'],
                                 values['dissolved_oxygen'],
@@ -234,11 +159,18 @@ def import_water_quality_data():
                         ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
                         """
                         
-                        # 分批插入，每批次500条记录
+                        # 分批插入，每批次500条记录，插入完成后为本文件的新记录计算异常写入物化表
                         batch_size = 500
+                        first_record_id = None
                         for i in range(0, len(records_to_insert), batch_size):
                             batch = records_to_insert[i:i + batch_size]
                             cursor.executemany(insert_query, batch)
+                            if first_record_id is None:
+                                # 多行 INSERT 的 lastrowid 为本批次第一条记录的 ID，之后插入的记录 ID 都更大
+                                first_record_id = cursor.lastrowid
+                        materialize_records(cursor, file_path, first_record_id)
+                        # 按基础表重算本文件涉及的 (监测点, 月份) 的季节基线
+                        refresh_baselines(cursor, [(record[0], record[1].month) for record in records_to_insert if record[1]])
                         
                         inserted_count = len(records_to_insert)
                         total_records += inserted_count
@@ -275,6 +207,7 @@ def import_water_quality_data():
             conn.close()
             print("数据库连接已关闭")
 
+# 在 backend_flask 目录下以模块方式运行：python -m config.water_quality_bat
 if __name__ == "__main__":
     print("="*60)
     print(f"水质数据导入程序 - {datetime.now().strftime('%Y-%m-%d %H:%M')}")
@@ -190,12 +190,15 @@ CREATE TABLE `water_quality`  (
   `original_file` varchar(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NULL DEFAULT NULL,
   `created_at` timestamp NULL DEFAULT CURRENT_TIMESTAMP,
   PRIMARY KEY (`record_id`) USING BTREE,
-  INDEX `site_id`(`site_id` ASC) USING BTREE,
+  INDEX `idx_site_date`(`site_id` ASC, `monitoring_date` ASC) USING BTREE,
   CONSTRAINT `water_quality_ibfk_1` FOREIGN KEY (`site_id`) REFERENCES `monitoring_site` (`site_id`) ON DELETE RESTRICT ON UPDATE RESTRICT
 ) ENGINE = InnoDB AUTO_INCREMENT = 70581 CHARACTER SET = utf8mb4 COLLATE = utf8mb4_unicode_ci ROW_FORMAT = Dynamic;
 
 SET FOREIGN_KEY_CHECKS = 1;
 
+-- 已有数据库升级：用 (site_id, monitoring_date) 复合索引替换单列 site_id 索引
+-- ALTER TABLE `water_quality` ADD INDEX `idx_site_date`(`site_id`, `monitoring_date`), DROP INDEX `site_id`;
+
 -- 创建异常阈值表
 CREATE TABLE `anomaly_thresholds` (
   `id` INT AUTO_INCREMENT PRIMARY KEY,
@@ -214,4 +217,68 @@ VALUES
 ('ph', 6.5, 8.5),
 ('dissolved_oxygen', 4, 10),
 ('turbidity', 0, 50),
-('ammonia_nitrogen', 0, 0.2);
\ No newline at end of file
+('ammonia_nitrogen', 0, 0.2);
+
+-- ----------------------------
+-- Table structure for water_quality_anomalies
+-- 异常检测物化表：每条 (记录, 参数) 超出阈值时一行，导入数据和修改阈值时维护
+-- 首次部署后执行 python -m config.anomaly_store 回填历史数据；
+-- 回填前异常检测接口只应使用默认的 source=live，source=materialized 会返回空结果
+-- ----------------------------
+DROP TABLE IF EXISTS `water_quality_anomalies`;
+CREATE TABLE `water_quality_anomalies`  (
+  `record_id` bigint NOT NULL COMMENT '关联水质记录ID',
+  `parameter` varchar(50) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL COMMENT '超出阈值的参数',
+  `site_id` int NOT NULL COMMENT '监测点ID（冗余，便于按站点和日期查找）',
+  `monitoring_date` date NOT NULL COMMENT '监测日期（冗余）',
+  `value` double NULL DEFAULT NULL COMMENT '监测值',
+  `lower_threshold` float NULL DEFAULT NULL COMMENT '计算时的阈值下限',
+  `upper_threshold` float NULL DEFAULT NULL COMMENT '计算时的阈值上限',
+  `created_at` timestamp NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`record_id`, `parameter`) USING BTREE,
+  INDEX `idx_site_date`(`site_id` ASC, `monitoring_date` ASC) USING BTREE,
+  INDEX `idx_date`(`monitoring_date` ASC) USING BTREE,
+  INDEX `idx_parameter`(`parameter` ASC) USING BTREE,
+  CONSTRAINT `water_quality_anomalies_ibfk_1` FOREIGN KEY (`record_id`) REFERENCES `water_quality` (`record_id`) ON DELETE CASCADE ON UPDATE RESTRICT
+) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_unicode_ci COMMENT = '水质异常物化表' ROW_FORMAT = Dynamic;
+
+-- ----------------------------
+-- Table structure for water_quality_baselines
+-- 季节基线：按 (监测点, 月份, 参数) 保存样本数、和与平方和，导入数据后按基础表重算涉及的分组
+-- 首次部署后执行 python -m config.baseline_store 回填历史数据
+-- ----------------------------
+DROP TABLE IF EXISTS `water_quality_baselines`;
+CREATE TABLE `water_quality_baselines`  (
+  `site_id` int NOT NULL COMMENT '监测点ID',
+  `month` tinyint NOT NULL COMMENT '月份(1-12)',
+  `parameter` varchar(50) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL COMMENT '水质参数',
+  `sample_count` int NOT NULL DEFAULT 0 COMMENT '有效样本数',
+  `value_sum` double NOT NULL DEFAULT 0 COMMENT '监测值之和',
+  `value_sq_sum` double NOT NULL DEFAULT 0 COMMENT '监测值平方和',
+  `updated_at` timestamp NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`site_id`, `month`, `parameter`) USING BTREE,
+  INDEX `idx_month_parameter`(`month` ASC, `parameter` ASC) USING BTREE
+) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_unicode_ci COMMENT = '水质季节基线' ROW_FORMAT = Dynamic;
+
+-- ----------------------------
+-- Table structure for fish_species_stats
+-- 鱼种汇总：样本数、和、平方和与长度×宽度之和，导入观测数据后按基础表重算涉及的鱼种
+-- 首次部署后执行 python -m config.fish_stats 回填历史数据
+-- ----------------------------
+DROP TABLE IF EXISTS `fish_species_stats`;
+CREATE TABLE `fish_species_stats`  (
+  `species_id` int NOT NULL COMMENT '鱼种ID',
+  `sample_count` int NOT NULL DEFAULT 0 COMMENT '观测记录数',
+  `weight_count` int NOT NULL DEFAULT 0 COMMENT '有效体重记录数',
+  `weight_sum` double NOT NULL DEFAULT 0 COMMENT '体重之和',
+  `weight_sq_sum` double NOT NULL DEFAULT 0 COMMENT '体重平方和',
+  `pair_count` int NOT NULL DEFAULT 0 COMMENT '长度和宽度均有效的记录数',
+  `length_sum` double NOT NULL DEFAULT 0 COMMENT '长度之和',
+  `length_sq_sum` double NOT NULL DEFAULT 0 COMMENT '长度平方和',
+  `width_sum` double NOT NULL DEFAULT 0 COMMENT '宽度之和',
+  `width_sq_sum` double NOT NULL DEFAULT 0 COMMENT '宽度平方和',
+  `length_width_sum` double NOT NULL DEFAULT 0 COMMENT '长度×宽度之和',
+  `updated_at` timestamp NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`species_id`) USING BTREE,
+  CONSTRAINT `fish_species_stats_ibfk_1` FOREIGN KEY (`species_id`) REFERENCES `fish_species` (`species_id`) ON DELETE CASCADE ON UPDATE RESTRICT
+) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_unicode_ci COMMENT = '鱼种汇总' ROW_FORMAT = Dynamic;
@@ -0,0 +1,100 @@
+"""
+按日期范围读取多个水质数据文件
+/visualize-water 的 start_date / end_date / section_name 解析为跨月份目录的每日文件，
+在共享进程池（见 process_pool）中并行读取：每个工作进程只读取绘图需要的列，
+并在返回前按断面过滤，只有过滤后的少量行需要传回主进程拼接
+
+文件数很少或共享进程池未启动时直接在当前进程读取
+"""
+
+import datetime
+import json
+
+import pandas as pd
+
+from config.anomaly_detection import PARAMETER_COLUMNS
+from config.process_pool import shared_process_pool
+from config.water_cleaning import clean_column_name, infer_year, parse_water_tbody
+from config.water_store import MONITORING_AT_COLUMN, STORE_COLUMNS, load_water_frame
+
+# 绘图需要的列：断面、监测时间、水质类别和全部参数（不读取省份、流域和站点状态）
+RANGE_COLUMNS = ['section_name', MONITORING_AT_COLUMN, 'water_grade'] + PARAMETER_COLUMNS
+MIN_PARALLEL_FILES = 4  # 少于该文件数时在当前进程读取
+FILES_PER_TASK = 8  # 每个进程池任务读取的文件数，减少任务调度和结果传输的次数
+TAG_PATTERN = r'<[^>]*>'
+
+
+def _parse_json_part(file_path):
+    """未安装 pyarrow 或表头不是标准格式时直接解析 JSON，返回与 load_water_frame 相同的结构"""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    thead = data.get('thead')
+    tbody = data.get('tbody')
+    if not isinstance(thead, list) or not isinstance(tbody, list):
+        raise ValueError(f"JSON 中未找到 'thead' / 'tbody' 列表: {file_path}")
+
+    records = parse_water_tbody(tbody, infer_year(file_path))
+    frame = pd.DataFrame.from_records(records, columns=[
+        'section_name', 'monitoring_date', 'monitoring_time', 'water_grade', *PARAMETER_COLUMNS
+    ])
+    moments = [
+        datetime.datetime.combine(date, time) if date is not None else None
+        for date, time in zip(frame.pop('monitoring_date'), frame.pop('monitoring_time'))
+    ]
+    frame.insert(1, MONITORING_AT_COLUMN, pd.to_datetime(moments))
+    frame[PARAMETER_COLUMNS] = frame[PARAMETER_COLUMNS].astype('float64')
+    return frame, dict(zip(STORE_COLUMNS, [clean_column_name(col) for col in thead]))
+
+
+def load_range_part(file_paths, sections=None):
+    """
+    读取一组文件并按断面过滤（在工作进程中执行）
+
+    Args:
+        file_paths (list[str]): 水质 JSON 文件
+        sections (list[str]): 需要的断面名称，为 None 时保留全部
+
+    Returns:
+        tuple: (过滤后的 DataFrame 列表, {存储列名: 表头})，列名为 RANGE_COLUMNS
+    """
+    frames = []
+    names = None
+    for file_path in file_paths:
+        frame, file_names = load_water_frame(file_path, columns=RANGE_COLUMNS)
+        if frame is None:
+            frame, file_names = _parse_json_part(file_path)
+        # 断面名称单元格带有说明所在地市的 tooltip 标签，按去掉标签后的名称匹配和显示
+        frame['section_name'] = frame['section_name'].str.replace(TAG_PATTERN, '', regex=True).str.strip()
+        if sections is not None:
+            frame = frame[frame['section_name'].isin(sections)]
+        names = names or file_names
+        if not frame.empty:
+            frames.append(frame)
+    return frames, names
+
+
+class ParallelWaterLoader:
+    """在进程池中并行读取多个水质数据文件"""
+
+    def __init__(self, workers):
+        self.workers = workers
+
+    def load(self, file_paths, sections=None):
+        """
+        读取全部文件并拼接为一个 DataFrame（按文件顺序）
+
+        Returns:
+            tuple: (DataFrame, {存储列名: 表头})；没有匹配的行时 DataFrame 为空
+        """
+        executor = shared_process_pool()
+        if executor is None or self.workers <= 1 or len(file_paths) < MIN_PARALLEL_FILES:
+            parts = [load_range_part(file_paths, sections)]
+        else:
+            chunks = [file_paths[i:i + FILES_PER_TASK] for i in range(0, len(file_paths), FILES_PER_TASK)]
+            parts = list(executor.map(load_range_part, chunks, [sections] * len(chunks)))
+
+        frames = [frame for part_frames, _ in parts for frame in part_frames]
+        names = next((part_names for _, part_names in parts if part_names), None)
+        if not frames:
+            return pd.DataFrame(columns=RANGE_COLUMNS), names
+        return pd.concat(frames, ignore_index=True), names
@@ -0,0 +1,328 @@
+"""
+水质数据列式存储
+把 水质数据/YYYY-MM/YYYY-MM-DD.json 编译为按月分区的 Arrow IPC 文件
+（<WATER_STORE_DIR>/YYYY-MM/YYYY-MM-DD.arrow），每个 water_quality 字段一列并带类型：
+
+- 数值提取和监测时间解析只在编译时做一次，读取时不再处理 HTML 片段
+- 文件不压缩，读取时 memory_map，只物化调用方需要的列；按日期范围读取时
+  先按月份目录裁剪分区，再按文件名日期过滤
+- schema 元数据记录源 JSON 的修改时间和大小，读取时与源文件比对
+- 编译只在 compile_tree（命令行）中进行，请求路径只读取存储文件：新放入目录、
+  尚未编译或源文件已更新的文件，在重新编译之前由调用方直接解析 JSON
+
+存储目录由 WATER_STORE_DIR 环境变量指定，默认为用户缓存目录
+（$XDG_CACHE_HOME 或 ~/.cache 下的 smart-marine-ranch/water_arrow），不写入代码目录
+
+pyarrow 为可选依赖：未安装时 load_water_table / load_water_frame 返回 None，
+调用方回退到直接解析 JSON
+
+编译整个目录（在 backend_flask 目录下）:
+    python -m config.water_store
+    python -m config.water_store --force
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import os
+import re
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+except ImportError:  # pyarrow 为可选依赖，未安装时读取方直接解析 JSON
+    pa = None
+    ipc = None
+
+from config.anomaly_detection import PARAMETER_COLUMNS
+from config.water_cleaning import (
+    TBODY_FIELD_COUNT, TBODY_TEXT_FIELDS, clean_column_name, infer_year, parse_water_tbody
+)
+
+logger = logging.getLogger(__name__)
+
+WATER_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '软件工程大作业数据', '水质数据')
+CACHE_HOME = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+WATER_STORE_DIR = os.environ.get('WATER_STORE_DIR', os.path.join(CACHE_HOME, 'smart-marine-ranch', 'water_arrow'))
+STORE_SUFFIX = '.arrow'
+
+MONTH_DIR_PATTERN = re.compile(r"^\d{4}-\d{2}$")
+FILE_DATE_FORMAT = '%Y-%m-%d'
+
+# 存储列与 tbody / thead 的字段一一对应，监测时间合并为一个时间戳列
+MONITORING_AT_COLUMN = 'monitoring_at'
+STORE_COLUMNS = (
+    TBODY_TEXT_FIELDS + [MONITORING_AT_COLUMN, 'water_grade'] + PARAMETER_COLUMNS + ['site_status']
+)
+TEXT_COLUMNS = TBODY_TEXT_FIELDS + ['water_grade', 'site_status']
+
+# schema 元数据的键
+SOURCE_SIGNATURE_KEY = b'source_signature'
+SOURCE_ROWS_KEY = b'source_rows'
+DISPLAY_NAMES_KEY = b'display_names'
+
+
+def _store_schema():
+    fields = []
+    for col in STORE_COLUMNS:
+        if col == MONITORING_AT_COLUMN:
+            fields.append(pa.field(col, pa.timestamp('s')))
+        elif col in TEXT_COLUMNS:
+            fields.append(pa.field(col, pa.string()))
+        else:
+            fields.append(pa.field(col, pa.float64()))
+    return pa.schema(fields)
+
+
+def store_path(json_path, store_dir=None):
+    """JSON 文件对应的存储文件：<store_dir>/<月份目录>/<文件名>.arrow"""
+    json_path = os.path.abspath(json_path)
+    month = os.path.basename(os.path.dirname(json_path))
+    stem = os.path.splitext(os.path.basename(json_path))[0]
+    return os.path.join(store_dir or WATER_STORE_DIR, month, stem + STORE_SUFFIX)
+
+
+def source_signature(json_path):
+    """源文件签名 "修改时间:大小"，与存储文件中记录的不一致时需要重新编译"""
+    stat = os.stat(json_path)
+    return f"{stat.st_mtime_ns}:{stat.st_size}".encode('ascii')
+
+
+def build_water_table(json_path):
+    """
+    解析水质 JSON 文件并转换为 Arrow 表
+
+    Returns:
+        pyarrow.Table: 列为 STORE_COLUMNS；表头不是标准的 17 列格式时返回 None
+
+    Raises:
+        json.JSONDecodeError / ValueError: 文件格式不正确
+    """
+    signature = source_signature(json_path)
+    with open(json_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    thead = data.get('thead')
+    tbody = data.get('tbody')
+    if not isinstance(tbody, list):
+        raise ValueError("JSON 中未找到 'tbody' 列表")
+    if not isinstance(thead, list) or len(thead) != TBODY_FIELD_COUNT:
+        return None
+
+    records = parse_water_tbody(tbody, infer_year(json_path))
+    columns = {col: [record[col] for record in records] for col in TEXT_COLUMNS + PARAMETER_COLUMNS}
+    columns[MONITORING_AT_COLUMN] = [
+        datetime.datetime.combine(record['monitoring_date'], record['monitoring_time'])
+        if record['monitoring_date'] is not None else None
+        for record in records
+    ]
+
+    schema = _store_schema().with_metadata({
+        SOURCE_SIGNATURE_KEY: signature,
+        SOURCE_ROWS_KEY: str(len(tbody)).encode('ascii'),
+        DISPLAY_NAMES_KEY: json.dumps([clean_column_name(col) for col in thead], ensure_ascii=False).encode('utf-8'),
+    })
+    return pa.table([columns[col] for col in STORE_COLUMNS], schema=schema)
+
+
+def compile_water_file(json_path, store_dir=None):
+    """
+    编译单个 JSON 文件（由 compile_tree 调用），先写临时文件再替换，读取方不会看到写了一半的文件
+
+    Returns:
+        str: 存储文件路径；未安装 pyarrow 或表头不是标准格式时返回 None
+    """
+    if pa is None:
+        return None
+    table = build_water_table(json_path)
+    if table is None:
+        return None
+
+    path = store_path(json_path, store_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with pa.OSFile(tmp_path, 'wb') as sink, ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return path
+
+
+def _open_fresh(json_path, store_dir):
+    """内存映射打开与源文件一致的存储文件，不存在或已过期时返回 None"""
+    path = store_path(json_path, store_dir)
+    if not os.path.exists(path):
+        return None
+    try:
+        reader = ipc.open_file(pa.memory_map(path, 'r'))
+    except (OSError, pa.ArrowInvalid):
+        return None
+    metadata = reader.schema.metadata or {}
+    if metadata.get(SOURCE_SIGNATURE_KEY) != source_signature(json_path):
+        return None
+    return reader
+
+
+def load_water_table(json_path, columns=None, store_dir=None):
+    """
+    读取 JSON 文件对应的 Arrow 表
+
+    存储文件以内存映射方式读取，未选择的列不会被读入内存。这里不做编译，
+    存储文件不存在或与源文件不一致时返回 None，由调用方解析 JSON
+
+    Args:
+        json_path (str): 源 JSON 文件
+        columns (list[str]): 需要的列，为 None 时读取全部列
+
+    Returns:
+        pyarrow.Table: schema 元数据与存储文件相同；未安装 pyarrow、存储文件不存在或已过期时返回 None
+    """
+    if pa is None:
+        return None
+    reader = _open_fresh(json_path, store_dir)
+    if reader is None:
+        return None
+
+    if columns is None:
+        return reader.read_all()
+    indices = [reader.schema.get_field_index(col) for col in columns]
+    batches = [reader.get_batch(i).select(indices) for i in range(reader.num_record_batches)]
+    schema = pa.schema([reader.schema.field(i) for i in indices], metadata=reader.schema.metadata)
+    return pa.Table.from_batches(batches, schema=schema)
+
+
+def display_names(table):
+    """存储列名 -> 原始表头（已清理）的映射"""
+    names = json.loads(table.schema.metadata[DISPLAY_NAMES_KEY].decode('utf-8'))
+    return dict(zip(STORE_COLUMNS, names))
+
+
+def load_water_frame(json_path, columns=None, store_dir=None):
+    """
+    以 DataFrame 读取 JSON 文件对应的存储数据
+
+    Returns:
+        tuple: (pd.DataFrame, {存储列名: 原始表头})；无法使用存储时为 (None, None)
+    """
+    table = load_water_table(json_path, columns, store_dir)
+    if table is None:
+        return None, None
+    return table.to_pandas(), display_names(table)
+
+
+def read_water_records(json_path, default_date=None, store_dir=None):
+    """
+    入库用：读取 JSON 文件对应的记录，格式与 parse_water_tbody 相同
+
+    无法使用存储时直接解析 JSON
+
+    Args:
+        json_path (str): 源 JSON 文件
+        default_date (datetime.date): 监测时间缺失时使用的日期
+
+    Returns:
+        tuple: (记录列表, 源文件 tbody 行数)
+
+    Raises:
+        json.JSONDecodeError / ValueError: 文件格式不正确
+    """
+    table = load_water_table(json_path, store_dir=store_dir)
+    if table is None:
+        with open(json_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if not isinstance(data.get('tbody'), list):
+            raise ValueError("JSON 中未找到 'tbody' 列表")
+        tbody = data['tbody']
+        return parse_water_tbody(tbody, infer_year(json_path), default_date=default_date), len(tbody)
+
+    records = []
+    for row in table.to_pylist():
+        moment = row.pop(MONITORING_AT_COLUMN)
+        row['monitoring_date'] = moment.date() if moment is not None else default_date
+        row['monitoring_time'] = moment.time() if moment is not None else None
+        records.append(row)
+    return records, int(table.schema.metadata[SOURCE_ROWS_KEY])
+
+
+def _file_date(json_path):
+    try:
+        return datetime.datetime.strptime(os.path.splitext(os.path.basename(json_path))[0], FILE_DATE_FORMAT).date()
+    except ValueError:
+        return None
+
+
+def list_water_files(start_date=None, end_date=None, data_dir=None):
+    """
+    按日期范围列出水质 JSON 文件（按日期升序）
+
+    先按 YYYY-MM 月份目录裁剪，不在范围内的月份不会被遍历；文件名不是日期的文件
+    只在不限日期范围时返回
+
+    Args:
+        start_date / end_date (datetime.date): 闭区间，为 None 时不限制
+        data_dir (str): 水质数据目录，默认为自带的数据目录
+    """
+    data_dir = data_dir or WATER_DATA_DIR
+    first_month = start_date.strftime('%Y-%m') if start_date else None
+    last_month = end_date.strftime('%Y-%m') if end_date else None
+
+    files = []
+    for month in sorted(os.listdir(data_dir)):
+        month_path = os.path.join(data_dir, month)
+        if not MONTH_DIR_PATTERN.match(month) or not os.path.isdir(month_path):
+            continue
+        if (first_month and month < first_month) or (last_month and month > last_month):
+            continue
+        for name in sorted(os.listdir(month_path)):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(month_path, name)
+            if start_date or end_date:
+                file_date = _file_date(path)
+                if file_date is None or (start_date and file_date < start_date) or (end_date and file_date > end_date):
+                    continue
+            files.append(path)
+    return files
+
+
+def compile_tree(data_dir=None, store_dir=None, force=False):
+    """
+    编译整个水质数据目录，默认跳过已是最新的文件
+
+    Returns:
+        dict: {'compiled': 新编译数, 'skipped': 已是最新数, 'unsupported': 非标准格式数, 'failed': 失败数}
+    """
+    if pa is None:
+        raise RuntimeError("编译列式存储需要安装 pyarrow")
+
+    counts = {'compiled': 0, 'skipped': 0, 'unsupported': 0, 'failed': 0}
+    for json_path in list_water_files(data_dir=data_dir):
+        if not force and _open_fresh(json_path, store_dir) is not None:
+            counts['skipped'] += 1
+            continue
+        try:
+            if compile_water_file(json_path, store_dir) is None:
+                counts['unsupported'] += 1
+            else:
+                counts['compiled'] += 1
+        except (OSError, ValueError) as e:
+            logger.warning("编译失败 %s: %s", json_path, e)
+            counts['failed'] += 1
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="把水质 JSON 数据编译为 Arrow 列式存储")
+    parser.add_argument('--data-dir', default=WATER_DATA_DIR)
+    parser.add_argument('--store-dir', default=WATER_STORE_DIR)
+    parser.add_argument('--force', action='store_true', help="忽略已有的存储文件，全部重新编译")
+    args = parser.parse_args()
+
+    counts = compile_tree(args.data_dir, args.store_dir, force=args.force)
+    print(f"编译 {counts['compiled']} 个，已是最新 {counts['skipped']} 个，"
+          f"非标准格式 {counts['unsupported']} 个，失败 {counts['failed']} 个")
+    print(f"存储目录: {args.store_dir}")
@@ -4,10 +4,13 @@ User模型（适配MySQL）
 """
 
 from datetime import datetime
+import logging
 import re
 import mysql.connector
 from config.database import get_db_connection  # 假设数据库连接函数已修改
 
+logger = logging.getLogger(__name__)
+
 class User:
     table_name = "users"
     
@@ -36,10 +39,8 @@ class User:
         user = cursor.fetchone()
         cursor.close()
         conn.close()
-        if user:
-            print(f"找到用户: {user}")  # 添加调试信息
-        else :
-            print("未找到")
+        if not user:
+            logger.debug("未找到用户: %s", user_id)
         return user
     
     @classmethod
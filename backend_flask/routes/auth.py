@@ -7,12 +7,14 @@ from dotenv import load_dotenv
 import mysql.connector
 from mysql.connector import pooling
 from functools import wraps
+import logging
 
 # 加载环境变量
 load_dotenv()
 
 # 创建蓝图
 auth_bp = Blueprint('auth', __name__)
+logger = logging.getLogger(__name__)
 
 # MySQL 连接池配置
 DB_CONFIG = {
@@ -182,7 +184,7 @@ def register():
         }), 201
         
     except Exception as e:
-        print(f"注册错误: {str(e)}")
+        logger.error("注册错误: %s", e, exc_info=True)
         return jsonify({"message": f"服务器错误: {str(e)}"}), 500
 
 @auth_bp.route('/login', methods=['POST'])
@@ -292,7 +294,7 @@ def login():
         })
         
     except Exception as e:
-        print(f"登录错误: {str(e)}")
+        logger.error("登录错误: %s", e, exc_info=True)
         return jsonify({"message": "服务器错误"}), 500
 
 @auth_bp.route('/user', methods=['GET'])
@@ -322,7 +324,7 @@ def get_user():
         return jsonify(user_data)
         
     except Exception as e:
-        print(f"获取用户信息错误: {str(e)}")
+        logger.error("获取用户信息错误: %s", e, exc_info=True)
         return jsonify({"message": "服务器错误"}), 500
 
 @auth_bp.route('/logs', methods=['GET'])
@@ -343,7 +345,7 @@ def get_logs():
         return jsonify(logs)
         
     except Exception as e:
-        print(f"获取日志错误: {str(e)}")
+        logger.error("获取日志错误: %s", e, exc_info=True)
         return jsonify({"message": "服务器错误"}), 500
 
 @auth_bp.route('/users', methods=['GET'])
@@ -372,7 +374,7 @@ def get_users():
         return jsonify(result)
         
     except Exception as e:
-        print(f"获取用户列表错误: {str(e)}")
+        logger.error("获取用户列表错误: %s", e, exc_info=True)
         return jsonify({"message": "服务器错误"}), 500
 
 @auth_bp.route('/logout', methods=['POST'])
@@ -394,7 +396,7 @@ def logout():
         return jsonify({"message": "登出成功"})
         
     except Exception as e:
-        print(f"登出错误: {str(e)}")
+        logger.error("登出错误: %s", e, exc_info=True)
         return jsonify({"message": "服务器错误"}), 500
 
 @auth_bp.route('/users/<int:user_id>', methods=['PUT'])
@@ -462,7 +464,7 @@ def update_user(user_id):
         })
         
     except Exception as e:
-        print(f"更新用户错误: {str(e)}")
+        logger.error("更新用户错误: %s", e, exc_info=True)
         return jsonify({"message": f"服务器错误: {str(e)}"}), 500
 
 @auth_bp.route('/users/<int:user_id>/password', methods=['PUT'])
@@ -508,5 +510,5 @@ def update_password(user_id):
         return jsonify({"message": "密码更新成功"})
         
     except Exception as e:
-        print(f"密码修改错误: {str(e)}")
+        logger.error("密码修改错误: %s", e, exc_info=True)
         return jsonify({"message": f"服务器错误: {str(e)}"}), 500
\ No newline at end of file
@@ -0,0 +1,68 @@
+"""列式传输格式：编码后按前端的方式解码，应还原出原始数据"""
+
+import base64
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from config.chart_payload import (
+    FORMAT_COLUMNAR, encode_categories, encode_epochs, encode_float32, encode_frame
+)
+
+
+def _decode_float32(data):
+    # 与前端 new Float32Array(...) 相同：小端 float32
+    return np.frombuffer(base64.b64decode(data), dtype='<f4')
+
+
+def test_float32_round_trip():
+    values = [1.5, -2.25, 0.0, 1e6, 3.14159]
+    decoded = _decode_float32(encode_float32(values))
+    assert np.array_equal(decoded, np.array(values, dtype=np.float32))
+
+
+def test_float32_missing_and_non_numeric_values_become_nan():
+    decoded = _decode_float32(encode_float32([1.0, None, '异常', '2.5', float('nan')]))
+    assert decoded[0] == 1.0
+    assert decoded[3] == 2.5
+    assert np.isnan(decoded[[1, 2, 4]]).all()
+
+
+def test_float32_empty():
+    assert encode_float32([]) == ''
+
+
+def test_epochs_round_trip():
+    times = ['2021-01-01 00:00:00', '2021-01-01 04:00:00', None, 'not a time']
+    epochs = encode_epochs(times)
+    assert epochs[2] is None
+    assert epochs[3] is None
+    # 没有时区信息，按原样换算
+    assert epochs[0] == int(datetime.datetime(2021, 1, 1, tzinfo=datetime.timezone.utc).timestamp())
+    assert epochs[1] - epochs[0] == 4 * 3600
+
+
+def test_categories_round_trip():
+    values = ['鲈鱼', '鲤鱼', None, '鲈鱼']
+    encoded = encode_categories(values)
+    decoded = [encoded['labels'][code] if code >= 0 else None for code in encoded['codes']]
+    assert decoded == values
+
+
+def test_frame_round_trip():
+    frame = pd.DataFrame({
+        'Species': ['Bream', 'Roach', 'Bream'],
+        'Length1(cm)': [23.2, 19.0, np.nan],
+        'Width(cm)': [4.02, 3.3, 4.5],
+    })
+    encoded = encode_frame(frame)
+    assert encoded['format'] == FORMAT_COLUMNAR
+    assert encoded['length'] == 3
+
+    species = encoded['columns']['Species']
+    assert [species['labels'][code] for code in species['codes']] == frame['Species'].tolist()
+    for col in ('Length1(cm)', 'Width(cm)'):
+        decoded = _decode_float32(encoded['columns'][col])
+        expected = frame[col].to_numpy(dtype=np.float32)
+        assert np.array_equal(decoded, expected, equal_nan=True)
@@ -0,0 +1,98 @@
+"""折线图降采样：返回的下标范围、数量上限、升序和缺失值处理"""
+
+import numpy as np
+import pytest
+
+from config.downsampling import (
+    DOWNSAMPLE_LTTB, DOWNSAMPLE_METHODS, DOWNSAMPLE_MINMAX, downsample_indices, lttb_indices,
+    minmax_indices, thin_indices
+)
+
+
+def _series(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.cumsum(rng.normal(0, 1, n))
+
+
+def _assert_valid_indices(indices, count, max_points):
+    assert len(indices) <= max_points
+    assert np.all(np.diff(indices) > 0)
+    assert indices.min() >= 0
+    assert indices.max() < count
+
+
+@pytest.mark.parametrize('count, max_points', [(1000, 3), (1000, 100), (1001, 1000), (5000, 997)])
+def test_lttb_bounds(count, max_points):
+    y = _series(count)
+    indices = lttb_indices(y, max_points)
+    _assert_valid_indices(indices, count, max_points)
+    assert len(indices) == max_points
+    # 首尾两点固定保留
+    assert indices[0] == 0
+    assert indices[-1] == count - 1
+
+
+@pytest.mark.parametrize('count, max_points', [(1000, 2), (1000, 3), (1000, 100), (5000, 997)])
+def test_minmax_bounds(count, max_points):
+    y = _series(count)
+    indices = minmax_indices(y, max_points)
+    _assert_valid_indices(indices, count, max_points)
+
+
+def test_minmax_keeps_global_extremes():
+    y = _series(10000)
+    y[1234] = 100.0
+    y[8765] = -100.0
+    indices = minmax_indices(y, 50)
+    assert 1234 in indices
+    assert 8765 in indices
+
+
+@pytest.mark.parametrize('method', DOWNSAMPLE_METHODS)
+def test_short_series_is_not_downsampled(method):
+    y = _series(10)
+    assert np.array_equal(downsample_indices(y, 10, method), np.arange(10))
+    assert np.array_equal(lttb_indices(y, 20), np.arange(10))
+    assert np.array_equal(minmax_indices(y, 20), np.arange(10))
+
+
+@pytest.mark.parametrize('method', DOWNSAMPLE_METHODS)
+def test_missing_values_are_never_selected(method):
+    values = _series(3000).tolist()
+    for i in range(0, 3000, 7):
+        values[i] = None
+    indices = downsample_indices(values, 200, method)
+    _assert_valid_indices(indices, len(values), 200)
+    assert all(values[i] is not None for i in indices)
+
+
+def test_sparse_valid_values_are_returned_as_is():
+    values = np.full(1000, np.nan)
+    values[[3, 500, 998]] = [1.0, 2.0, 3.0]
+    for method in DOWNSAMPLE_METHODS:
+        assert downsample_indices(values, 10, method).tolist() == [3, 500, 998]
+
+
+def test_unknown_method_raises():
+    with pytest.raises(ValueError):
+        downsample_indices(_series(100), 10, 'average')
+
+
+@pytest.mark.parametrize('max_points', [1, 2, 3, 10, 99])
+def test_thin_indices_bounds(max_points):
+    indices = np.union1d(
+        downsample_indices(_series(5000, seed=1), 100, DOWNSAMPLE_LTTB),
+        downsample_indices(_series(5000, seed=2), 100, DOWNSAMPLE_MINMAX),
+    )
+    thinned = thin_indices(indices, max_points)
+    assert len(thinned) <= max_points
+    assert np.isin(thinned, indices).all()
+    assert np.all(np.diff(thinned) > 0)
+    if max_points >= 2:
+        assert thinned[0] == indices[0]
+        assert thinned[-1] == indices[-1]
+
+
+def test_thin_indices_short_input_unchanged():
+    indices = np.array([1, 5, 9])
+    assert np.array_equal(thin_indices(indices, 3), indices)
@@ -0,0 +1,80 @@
+"""体长批量预测的输入解析：JSON / CSV 的正常路径和各类错误信息"""
+
+import io
+import json
+
+import numpy as np
+import pytest
+
+from config import fish_length_batch
+from config.fish_length_batch import parse_csv_batch, parse_json_batch, stream_predictions
+
+
+def _csv(text):
+    return io.BytesIO(text.encode('utf-8'))
+
+
+def test_json_objects_arrays_and_items():
+    expected = np.array([[242.0, 11.52, 4.02], [290.0, 12.48, 4.3056]])
+    objects = [{'weight': 242, 'height': 11.52, 'width': 4.02},
+               {'weight': '290', 'height': 12.48, 'width': 4.3056}]
+    arrays = [[242, 11.52, 4.02], [290, 12.48, 4.3056]]
+    for payload in (objects, arrays, {'items': objects}):
+        features = parse_json_batch(payload)
+        assert features.dtype == np.float64
+        assert np.array_equal(features, expected)
+
+
+@pytest.mark.parametrize('payload, message', [
+    ({'weight': 1}, "请求体需要是 JSON 数组或包含 items 数组的对象"),
+    ('1,2,3', "请求体需要是 JSON 数组或包含 items 数组的对象"),
+    ([], "没有需要预测的数据"),
+    ([[1, 2, 3], [1, 2]], "第 2 条记录无效"),
+    ([[1, 2, 3], [1, 2, 3], {'weight': 'abc', 'height': 1, 'width': 1}], "第 3 条记录无效"),
+    ([[1, 2, 3], {'weight': 1, 'height': 2}], "第 2 条记录包含缺失值或非有限数值"),
+    ([[1, 2, 3], [1, 2, 3], [1, float('inf'), 3]], "第 3 条记录包含缺失值或非有限数值"),
+    ([[1, 2, 3], 'x'], "第 2 条记录无效"),
+])
+def test_json_errors(payload, message):
+    with pytest.raises(ValueError, match=message):
+        parse_json_batch(payload)
+
+
+def test_batch_row_limit(monkeypatch):
+    monkeypatch.setattr(fish_length_batch, 'MAX_BATCH_ROWS', 2)
+    with pytest.raises(ValueError, match="单次最多预测 2 条记录"):
+        parse_json_batch([[1, 2, 3]] * 3)
+    assert parse_json_batch([[1, 2, 3]] * 2).shape == (2, 3)
+
+
+def test_csv_with_fish_headers_and_bom():
+    stream = _csv("﻿Species,Weight(g),Length1(cm),Height(cm),Width(cm)\n"
+                  "Bream,242,23.2,11.52,4.02\n"
+                  "\n"
+                  "Bream,290,24,12.48,4.3056\n")
+    features = parse_csv_batch(stream)
+    assert np.array_equal(features, [[242, 11.52, 4.02], [290, 12.48, 4.3056]])
+
+
+@pytest.mark.parametrize('text, message', [
+    ("", "CSV文件为空"),
+    ("weight,height\n1,2\n", "CSV文件缺少必需列: width"),
+    ("weight,height,width\n", "没有需要预测的数据"),
+    ("weight,height,width\n1,2,3\n4,,6\n", "第 2 条记录包含缺失值或非有限数值"),
+    ("weight,height,width\n1,2,3\n4,5\n", "第 2 条记录无效"),
+    ("weight,height,width\n1,2,3\n1,2,3\nabc,2,3\n", "第 3 条记录无效"),
+])
+def test_csv_errors(text, message):
+    with pytest.raises(ValueError, match=message):
+        parse_csv_batch(_csv(text))
+
+
+def test_stream_predictions_is_valid_json():
+    predictions = np.arange(5, dtype=np.float64) / 4
+    body = ''.join(stream_predictions(predictions, 'v1', chunk_rows=2))
+    assert json.loads(body) == {
+        'count': 5, 'length_predictions': predictions.tolist(), 'model_version': 'v1'
+    }
+    assert json.loads(''.join(stream_predictions(np.array([])))) == {
+        'count': 0, 'length_predictions': [], 'model_version': None
+    }
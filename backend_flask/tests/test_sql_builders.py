@@ -0,0 +1,137 @@
+"""异常汇总、时间段聚合和异常检测的 SQL 构建：占位符与参数一一对应，标识符只来自白名单"""
+
+import pytest
+
+from config.anomaly_detection import (
+    SOURCE_MATERIALIZED, build_anomaly_query, build_violation_predicate, load_parameter_matrix
+)
+from config.anomaly_summary import (
+    build_live_summary_query, build_materialized_summary_query, parse_group_by, unpivot_live_summary
+)
+from config.water_aggregation import build_aggregate_query, parse_aggregates, parse_parameters
+
+THRESHOLDS = [
+    {'parameter': 'water_temp', 'lower_threshold': 15.0, 'upper_threshold': 30.0},
+    {'parameter': 'ph', 'lower_threshold': 6.5, 'upper_threshold': 8.5},
+    {'parameter': 'turbidity', 'lower_threshold': None, 'upper_threshold': 50.0},
+]
+
+
+def _assert_placeholders(query, params):
+    assert query.count('%s') == len(params)
+
+
+def test_parse_group_by():
+    assert parse_group_by('') == []
+    assert parse_group_by(None) == []
+    assert parse_group_by('date, site,date') == ['site', 'date']
+    assert parse_group_by('parameter,site') == ['site', 'parameter']
+    with pytest.raises(ValueError, match="不支持的分组维度: month"):
+        parse_group_by('site,month')
+
+
+def test_materialized_summary_query():
+    query, params = build_materialized_summary_query(
+        ['site', 'parameter', 'date'], 'week', '2021-01-01', '2021-02-01', 7
+    )
+    _assert_placeholders(query, params)
+    assert params == [7, '2021-01-01', '2021-02-01']
+    assert query.startswith("SELECT a.site_id, a.parameter, DATE_SUB(a.monitoring_date,")
+    assert "FROM water_quality_anomalies a WHERE a.site_id = %s" in query
+    assert query.endswith("GROUP BY a.site_id, a.parameter, period ORDER BY a.site_id, a.parameter, period")
+
+
+def test_materialized_summary_without_grouping():
+    query, params = build_materialized_summary_query([])
+    assert params == []
+    assert 'WHERE' not in query
+    assert 'GROUP BY' not in query
+
+
+def test_live_summary_query():
+    query, params, active_columns = build_live_summary_query(
+        THRESHOLDS, ['site'], start_date='2021-01-01', site_id=3
+    )
+    _assert_placeholders(query, params)
+    assert active_columns == ['water_temp', 'ph', 'turbidity']
+    assert "SUM((ph < %s OR ph > %s)) AS ph" in query
+    assert "SUM((turbidity > %s)) AS turbidity" in query
+    # 参数顺序：条件求和、过滤条件、任一超限谓词
+    assert params == [15.0, 30.0, 6.5, 8.5, 50.0, 3, '2021-01-01', 15.0, 30.0, 6.5, 8.5, 50.0]
+
+
+def test_live_summary_without_thresholds():
+    assert build_live_summary_query([], ['site']) == (None, [], [])
+
+
+def test_unpivot_live_summary():
+    rows = [{'site_id': 1, 'water_temp': 2, 'ph': 0, 'turbidity': None, 'record_count': 2}]
+    columns = ['water_temp', 'ph', 'turbidity']
+    assert unpivot_live_summary(rows, ['site', 'parameter'], columns) == [
+        {'site_id': 1, 'parameter': 'water_temp', 'anomaly_count': 2, 'record_count': 2}
+    ]
+    assert unpivot_live_summary(rows, ['site'], columns) == [
+        {'site_id': 1, 'anomaly_count': 2, 'record_count': 2}
+    ]
+
+
+def test_parse_aggregates_and_parameters():
+    assert parse_aggregates('') == ['mean']
+    assert parse_aggregates('max, mean,max') == ['mean', 'max']
+    with pytest.raises(ValueError, match="不支持的聚合函数: median"):
+        parse_aggregates('mean,median')
+    assert parse_parameters('ph,water_temp') == ['water_temp', 'ph']
+    assert len(parse_parameters(None)) == 11
+    with pytest.raises(ValueError, match="不支持的参数: ph; DROP TABLE water_quality"):
+        parse_parameters('ph; DROP TABLE water_quality')
+
+
+def test_aggregate_query():
+    query, params = build_aggregate_query('1d', ['mean', 'count'], ['ph'], '2021-01-01', None, 2)
+    _assert_placeholders(query, params)
+    assert params == [2, '2021-01-01']
+    assert query == (
+        "SELECT w.monitoring_date AS period, AVG(w.ph) AS ph__mean, COUNT(w.ph) AS ph__count"
+        " FROM water_quality w WHERE w.site_id = %s AND w.monitoring_date >= %s"
+        " GROUP BY period ORDER BY period"
+    )
+
+
+def test_aggregate_query_hour_bucket():
+    query, params = build_aggregate_query('1h', ['max'], ['water_temp', 'ph'])
+    assert params == []
+    assert "IFNULL(w.monitoring_time, '00:00:00')" in query
+    assert "MAX(w.water_temp) AS water_temp__max, MAX(w.ph) AS ph__max" in query
+
+
+def test_violation_predicate_skips_missing_bounds():
+    predicate, params = build_violation_predicate(THRESHOLDS, ['ph', 'turbidity', 'chla'])
+    assert predicate == "(ph < %s OR ph > %s) OR (turbidity > %s)"
+    assert params == [6.5, 8.5, 50.0]
+
+
+@pytest.mark.parametrize('source', ['live', SOURCE_MATERIALIZED])
+def test_anomaly_query(source):
+    query, params = build_anomaly_query(THRESHOLDS, '2021-01-01', '2021-01-31', after_record_id=100,
+                                        limit=500, source=source)
+    _assert_placeholders(query, params)
+    assert params[-1] == 500
+    assert query.startswith(
+        "SELECT record_id, site_id, monitoring_date, monitoring_time, section_name,"
+        " water_temp + 0E0 AS water_temp, ph + 0E0 AS ph, turbidity + 0E0 AS turbidity FROM water_quality"
+    )
+    assert query.endswith("ORDER BY record_id LIMIT %s")
+
+
+def test_load_parameter_matrix():
+    records = [{'ph': 7.1, 'chla': None}, {'ph': '7.3', 'chla': 0.02}, {'ph': '异常', 'chla': 0.01}]
+    matrix, all_numeric = load_parameter_matrix(records[:1], ['ph', 'chla'])
+    assert all_numeric
+    assert matrix.shape == (1, 2)
+    matrix, all_numeric = load_parameter_matrix(records, ['ph', 'chla'])
+    assert not all_numeric
+    assert matrix[1].tolist() == [7.3, 0.02]
+    assert matrix[2, 1] == 0.01
+    assert matrix[2, 0] != matrix[2, 0]
+    single, _ = load_parameter_matrix(records[:2], ['chla'])
+    assert single.shape == (2, 1)
@@ -0,0 +1,140 @@
+"""滚动 z 分数和 MAD：向量化实现与逐行循环的朴素实现对比"""
+
+import datetime
+
+import numpy as np
+import pytest
+
+from config.statistical_detection import (
+    MAD_SCALE, METHOD_ZSCORE, build_history_query, detect_statistical_anomalies, rolling_mad,
+    rolling_zscore
+)
+
+WINDOW = 8
+MIN_PERIODS = 4
+
+
+def _history(values, site_ids, i, window):
+    """第 i 行之前、同一监测点最近 window 次观测中的有效值"""
+    start = max(i - window, 0)
+    return [
+        values[k] for k in range(start, i)
+        if site_ids[k] == site_ids[i] and not np.isnan(values[k])
+    ]
+
+
+def naive_zscore(values, site_ids, window, min_periods):
+    n, width = values.shape
+    means = np.full((n, width), np.nan)
+    scores = np.full((n, width), np.nan)
+    for j in range(width):
+        for i in range(n):
+            history = _history(values[:, j], site_ids, i, window)
+            if not history:
+                continue
+            means[i, j] = np.mean(history)
+            if len(history) < min_periods or np.isnan(values[i, j]):
+                continue
+            std = np.std(history, ddof=1)
+            if std > 0:
+                scores[i, j] = (values[i, j] - means[i, j]) / std
+    return means, scores
+
+
+def naive_mad(values, site_ids, window, min_periods):
+    n, width = values.shape
+    medians = np.full((n, width), np.nan)
+    scores = np.full((n, width), np.nan)
+    for j in range(width):
+        for i in range(n):
+            history = _history(values[:, j], site_ids, i, window)
+            if not history:
+                continue
+            medians[i, j] = np.median(history)
+            mad = np.median(np.abs(np.array(history) - medians[i, j]))
+            if len(history) >= min_periods and mad > 0:
+                scores[i, j] = (values[i, j] - medians[i, j]) / (MAD_SCALE * mad)
+    return medians, scores
+
+
+@pytest.fixture
+def sample():
+    """三个监测点按 site_id 排序的观测，包含缺失值、常数段和大数值列"""
+    rng = np.random.default_rng(7)
+    site_ids = np.repeat([1, 2, 5], [40, 25, 30])
+    values = np.column_stack([
+        rng.normal(7.5, 0.3, len(site_ids)),
+        rng.normal(1e6, 2e5, len(site_ids)),
+        rng.normal(20, 3, len(site_ids)),
+    ])
+    values[rng.random(values.shape) < 0.1] = np.nan
+    values[45:60, 2] = 18.0  # 标准差 / MAD 为 0 的窗口
+    values[10, 0] = 12.0  # 离群值
+    return values, site_ids
+
+
+def test_rolling_zscore_matches_naive(sample):
+    values, site_ids = sample
+    means, scores = rolling_zscore(values, site_ids, WINDOW, MIN_PERIODS)
+    expected_means, expected_scores = naive_zscore(values, site_ids, WINDOW, MIN_PERIODS)
+
+    assert np.array_equal(np.isnan(scores), np.isnan(expected_scores))
+    np.testing.assert_allclose(scores, expected_scores, rtol=1e-6, equal_nan=True)
+    has_score = ~np.isnan(expected_scores)
+    np.testing.assert_allclose(means[has_score], expected_means[has_score], rtol=1e-9)
+
+
+def test_rolling_mad_matches_naive(sample):
+    values, site_ids = sample
+    medians, scores = rolling_mad(values, site_ids, WINDOW, MIN_PERIODS)
+    expected_medians, expected_scores = naive_mad(values, site_ids, WINDOW, MIN_PERIODS)
+
+    np.testing.assert_allclose(medians, expected_medians, rtol=1e-12, equal_nan=True)
+    np.testing.assert_allclose(scores, expected_scores, rtol=1e-12, equal_nan=True)
+
+
+def test_rolling_windows_do_not_cross_sites():
+    # 第二个监测点的前几行没有足够的历史，不能借用第一个监测点的观测
+    site_ids = np.repeat([1, 2], [20, 5])
+    values = np.arange(25, dtype=float)[:, None]
+    _, z_scores = rolling_zscore(values, site_ids, WINDOW, MIN_PERIODS)
+    _, mad_scores = rolling_mad(values, site_ids, WINDOW, MIN_PERIODS)
+    assert np.isnan(z_scores[20:24]).all()
+    assert np.isnan(mad_scores[20:24]).all()
+    assert not np.isnan(z_scores[24]).any()
+
+
+def test_empty_input():
+    values = np.empty((0, 2))
+    site_ids = np.empty(0, dtype=np.int64)
+    assert rolling_zscore(values, site_ids)[1].shape == (0, 2)
+    assert rolling_mad(values, site_ids)[1].shape == (0, 2)
+
+
+def test_detect_statistical_anomalies_flags_outlier():
+    base = datetime.date(2021, 3, 1)
+    records = [
+        {
+            'record_id': i + 1, 'site_id': 1, 'monitoring_date': base + datetime.timedelta(days=i),
+            'monitoring_time': None, 'section_name': '断面1', 'ph': 7.0 + 0.1 * (i % 3),
+        }
+        for i in range(30)
+    ]
+    records[25]['ph'] = 9.5
+    anomalies = detect_statistical_anomalies(records, METHOD_ZSCORE, window=10, columns=['ph'])
+    assert [a['record_id'] for a in anomalies] == [26]
+    assert anomalies[0]['parameters'] == {'ph': 9.5}
+    assert anomalies[0]['monitoring_time'] == ''
+
+    with pytest.raises(ValueError):
+        detect_statistical_anomalies(records, 'average', columns=['ph'])
+
+
+def test_history_query_reads_lookback_days():
+    query, params = build_history_query('2021-03-10', '2021-03-20', 3, lookback=6, columns=['ph'])
+    assert params == [3, '2021-03-04', '2021-03-20']
+    assert 'ph + 0E0 AS ph' in query
+    assert query.endswith('ORDER BY site_id, monitoring_date, monitoring_time, record_id')
+
+    with pytest.raises(ValueError):
+        build_history_query('2021/03/10', lookback=6)
@@ -3,7 +3,7 @@ import numpy as np
 from sklearn.model_selection import train_test_split
 from sklearn.linear_model import LinearRegression
 from sklearn.metrics import mean_squared_error, r2_score
-import joblib
+from config.model_registry import register_model
 
 
 # 读取数据
@@ -48,13 +48,15 @@ def train_model(X, y):
     print(f"均方误差 (MSE): {mse:.4f}")
     print(f"决定系数 (R²): {r2:.4f}")
 
-    return model
+    return model, {'mse': float(mse), 'r2': float(r2), 'train_size': len(X_train), 'test_size': len(X_test)}
 
 
-# 保存模型
-def save_model(model, model_path='fish_length_model.pkl'):
-    joblib.dump(model, model_path)
-    print(f"模型已保存至: {model_path}")
+# 保存模型：在注册表中创建新版本并设为当前版本，运行中的服务会在后台热加载
+def save_model(model, features, metrics, training_data):
+    version = register_model(model, features=features, metrics=metrics, training_data=training_data,
+                             target='Length3(cm)')
+    print(f"模型已注册，版本: {version}")
+    return version
 
 
 # 预测新数据
@@ -81,10 +83,10 @@ if df is None:
 X, y = preprocess_data(df)
 
 # 训练模型
-model = train_model(X, y)
+model, metrics = train_model(X, y)
 
 # 保存模型
-save_model(model)
+save_model(model, list(X.columns), metrics, file_path)
 
 # 示例预测
 example_weight = 300  # 克